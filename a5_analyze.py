@@ -3,36 +3,48 @@ Assignment 5(b) – Analyze your own YouTube hip hop dataset
 ----------------------------------------------------------
 
 This script:
-- Loads the JSON dataset produced by assignment5_collect_dataset.py
+- Streams the dataset produced by a5_collect.py (NDJSON, or the older
+  single-document JSON)
 - Extracts view counts
 - Produces two plots for Section 5(b):
 
   1) Popularity distribution (linear scale)
-  2) Rank vs popularity (log-log style, like Figure 18.4)
+  2) Rank vs popularity (log-log style, like Figure 18.4), with the
+     maximum-likelihood power-law fit from powerlaw_fit.py
 """
 
 import os
-import json
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-DATA_PATH = os.path.join("data", "my_hiphop_youtube_dataset.json")
+from powerlaw_fit import compare_alternatives, describe, fit_power_law
+from video_dataset import iter_videos, read_header
 
+DATA_PATH = os.path.join("data", "my_hiphop_youtube_dataset.ndjson")
+LEGACY_DATA_PATH = os.path.join("data", "my_hiphop_youtube_dataset.json")
 
-def load_view_counts(path=DATA_PATH):
+
+def load_view_counts(path=None):
+    """
+    View counts of all videos in the dataset, plus its header.
+
+    Videos are streamed one at a time; only the counts are kept.
+    Without `path`, the NDJSON dataset is used, or the legacy JSON file
+    if only that exists.
+    """
+    if path is None:
+        path = DATA_PATH if os.path.exists(DATA_PATH) else LEGACY_DATA_PATH
     if not os.path.exists(path):
         raise FileNotFoundError(
-            f"Dataset not found at {path}. Run assignment5_collect_dataset.py first."
+            f"Dataset not found at {path}. Run a5_collect.py first."
         )
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    items = data["items"]
-    view_counts = [v["viewCount"] for v in items if v.get("viewCount") is not None]
-
-    return np.array(view_counts), data
+    view_counts = np.fromiter(
+        (v["viewCount"] for v in iter_videos(path) if v.get("viewCount") is not None),
+        dtype=np.int64,
+    )
+    return view_counts, read_header(path)
 
 
 def plot_linear_distribution(view_counts, output_path):
@@ -58,15 +70,25 @@ def plot_linear_distribution(view_counts, output_path):
     plt.close()
 
 
-def plot_rank_popularity_loglog(view_counts, output_path):
+def plot_rank_popularity_loglog(view_counts, output_path, fit=None):
     """
     Plot rank vs popularity on a log-log scale, like Figure 18.4.
+
+    If a powerlaw_fit.PowerLawFit is given, the fitted tail is drawn
+    as a line: the r-th most viewed video of the tail is expected at
+    xmin * (r / n_tail) ** -s, with s the Zipf exponent.
     """
     sorted_views = np.sort(view_counts)[::-1]
     ranks = np.arange(1, len(sorted_views) + 1)
 
     plt.figure(figsize=(8, 5))
     plt.loglog(ranks, sorted_views, marker=".", linestyle="none")
+    if fit is not None and not np.isnan(fit.alpha[0]):
+        tail_ranks = np.arange(1, fit.n_tail[0] + 1)
+        expected = fit.xmin[0] * (tail_ranks / fit.n_tail[0]) ** -fit.zipf_exponent[0]
+        plt.loglog(tail_ranks, expected, linestyle="--",
+                   label=f"power-law fit (alpha = {fit.alpha[0]:.2f})")
+        plt.legend()
     plt.xlabel("Rank (log scale)")
     plt.ylabel("View count (log scale)")
     plt.title("Rank–popularity plot of hip hop videos (log–log)")
@@ -84,6 +106,9 @@ def main():
     print(f"Loaded dataset with {len(view_counts)} videos.")
     print(f"Query used: {meta.get('query')}")
 
+    fit = fit_power_law(view_counts)
+    print(f"Power-law fit: {describe(fit, compare_alternatives(view_counts, fit))}")
+
     plot_linear_distribution(
         view_counts,
         output_path=os.path.join("figures", "a5_linear_popularity.png"),
@@ -91,6 +116,7 @@ def main():
     plot_rank_popularity_loglog(
         view_counts,
         output_path=os.path.join("figures", "a5_rank_popularity_loglog.png"),
+        fit=fit,
     )
 
 
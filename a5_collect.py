@@ -3,18 +3,20 @@ Assignment 5(a) – Collect your own YouTube dataset (hip hop)
 ------------------------------------------------------------
 
 This script uses the YouTube Data API to collect at least 200 short
-music (category 10) videos related to hip hop and saves them as JSON.
+music (category 10) videos related to hip hop and saves them as
+newline-delimited JSON (see video_dataset.py).
 
 Figures / data from this script are used in:
 - Report Section 5(a)
 """
 
 import os
-import json
+import asyncio
 from datetime import datetime
 
-from dotenv import load_dotenv
-from googleapiclient.discovery import build
+from collect_journal import CollectJournal, CollectState
+from video_dataset import DatasetWriter, write_dataset
+from youtube_api import ApiError, AsyncYouTubeClient, HttpTransport, api_key_from_env
 
 # ================== CONFIGURATION ==================================== #
 
@@ -28,127 +30,198 @@ VIDEO_DURATION = "short"      # 'short' = < 4 minutes
 # How many videos we aim to collect in total (minimum 200)
 TARGET_VIDEO_COUNT = 200
 
-# Output path for the dataset
-OUTPUT_PATH = os.path.join("data", "my_hiphop_youtube_dataset.json")
+# Output path for the dataset (newline-delimited JSON, see video_dataset.py)
+OUTPUT_PATH = os.path.join("data", "my_hiphop_youtube_dataset.ndjson")
+
+# Parallel videos().list requests in the async collector
+MAX_CONCURRENT_REQUESTS = 8
+
+# Checkpoint journal of a running collection (removed once the dataset is saved)
+JOURNAL_PATH = OUTPUT_PATH + ".journal"
 
 # ===================================================================== #
 
-def get_youtube_client():
+def simplify_video(item):
     """
-    Build the YouTube API client using an API key stored in .env.
-
-    .env must contain:
-        YOUTUBE_API_KEY=your_real_key_here
+    Reduce a videos().list item to the fields we keep in the dataset.
     """
-    load_dotenv()
-    api_key = os.getenv("YOUTUBE_API_KEY")
-    if not api_key:
-        raise RuntimeError("YOUTUBE_API_KEY not found in environment (.env file).")
-    return build("youtube", "v3", developerKey=api_key)
+    snippet = item.get("snippet", {})
+    stats = item.get("statistics", {})
+    return {
+        "id": item.get("id"),
+        "title": snippet.get("title"),
+        "channelId": snippet.get("channelId"),
+        "channelTitle": snippet.get("channelTitle"),
+        "publishedAt": snippet.get("publishedAt"),
+        "viewCount": int(stats.get("viewCount", 0)),
+        "likeCount": int(stats.get("likeCount", 0)) if "likeCount" in stats else None,
+        "commentCount": int(stats.get("commentCount", 0)) if "commentCount" in stats else None,
+    }
 
 
-def search_video_ids(youtube):
-    """
-    Use youtube.search().list to collect video IDs matching the query.
+# ---------------------------------------------------------------------
+# Async collector (youtube_api.AsyncYouTubeClient)
+# ---------------------------------------------------------------------
 
-    Returns a list of unique video IDs (strings).
+async def search_video_ids_async(client, state, journal, target=TARGET_VIDEO_COUNT):
     """
-    video_ids = []
-    seen_ids = set()
-    page_token = None
+    Use search.list to collect video IDs matching the query, continuing
+    from `state` (see collect_journal). Every page is journaled.
 
-    while len(video_ids) < TARGET_VIDEO_COUNT:
-        request = youtube.search().list(
-            part="id",
+    Search pages depend on the previous page's token, so they are
+    requested one after another; the token bucket spaces them out by
+    their quota cost (100 units each).
+    """
+    while not state.search_done and len(state.video_ids) < target:
+        response = await client.search_page(
+            state.page_token,
             q=SEARCH_QUERY,
             type="video",
             videoCategoryId=VIDEO_CATEGORY_ID,
             videoDuration=VIDEO_DURATION,
-            maxResults=50,
-            pageToken=page_token,
         )
-        response = request.execute()
-
-        for item in response.get("items", []):
-            vid = item["id"]["videoId"]
-            if vid not in seen_ids:
-                seen_ids.add(vid)
-                video_ids.append(vid)
-
-        page_token = response.get("nextPageToken")
-        if not page_token:
+        page_ids = [item["id"]["videoId"] for item in response.get("items", [])]
+        for vid in page_ids:
+            if vid not in state.seen_ids:
+                state.seen_ids.add(vid)
+                state.video_ids.append(vid)
+
+        state.page_token = response.get("nextPageToken")
+        journal.search_page(page_ids, state.page_token)
+        if not state.page_token:
             # No more pages – stop even if we didn't reach TARGET_VIDEO_COUNT
+            state.search_done = True
             break
 
-        print(f"Collected {len(video_ids)} video IDs so far...")
+        print(f"Collected {len(state.video_ids)} video IDs so far...")
 
-    print(f"Total unique video IDs collected: {len(video_ids)}")
-    return video_ids
+    if not state.search_done:
+        journal.search_done()
+        state.search_done = True
 
+    print(f"Total unique video IDs collected: {len(state.video_ids)}")
+    return state.video_ids
 
-def fetch_video_details(youtube, video_ids):
-    """
-    Given a list of video IDs, fetch snippet + statistics for each video.
 
-    Returns a list of simplified dicts containing only the fields we need.
-    """
-    videos = []
-
-    # YouTube API allows up to 50 IDs per videos().list call
-    for i in range(0, len(video_ids), 50):
-        batch_ids = video_ids[i:i + 50]
-        request = youtube.videos().list(
-            part="snippet,statistics",
-            id=",".join(batch_ids),
-            maxResults=50,
-        )
-        response = request.execute()
-
-        for item in response.get("items", []):
-            snippet = item.get("snippet", {})
-            stats = item.get("statistics", {})
-            videos.append({
-                "id": item.get("id"),
-                "title": snippet.get("title"),
-                "channelId": snippet.get("channelId"),
-                "channelTitle": snippet.get("channelTitle"),
-                "publishedAt": snippet.get("publishedAt"),
-                "viewCount": int(stats.get("viewCount", 0)),
-                "likeCount": int(stats.get("likeCount", 0)) if "likeCount" in stats else None,
-                "commentCount": int(stats.get("commentCount", 0)) if "commentCount" in stats else None,
-            })
-
-    print(f"Fetched details for {len(videos)} videos.")
-    return videos
-
-
-def save_dataset(videos):
+async def fetch_video_details_async(client, state, journal, writer):
     """
-    Save the collected dataset as JSON.
+    Fetch snippet + statistics (videos.list, up to 50 IDs per call) for
+    the IDs without a journaled details batch. The batches are requested
+    concurrently (bounded by the client's concurrency and quota bucket).
+
+    Each batch is streamed into the dataset `writer` and checkpointed in
+    the journal as soon as it arrives, so no videos are kept in memory.
+    Videos are written in completion order. If a batch fails (e.g. with
+    QuotaExceeded), the batches already in flight still finish and are
+    journaled before the first error is raised, so a resumed run does
+    not fetch them again.
     """
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-
-    dataset = {
+    pending = state.pending_ids
+    if state.fetched_ids:
+        print(f"Resuming: {len(state.fetched_ids)} videos already fetched, {len(pending)} to go.")
+
+    async def fetch(batch_ids):
+        return batch_ids, await client.videos(batch_ids)
+
+    batches = [pending[i:i + 50] for i in range(0, len(pending), 50)]
+    error = None
+    for done in asyncio.as_completed([fetch(b) for b in batches]):
+        try:
+            batch_ids, items = await done
+        except (ApiError, OSError, asyncio.TimeoutError) as e:
+            error = error or e
+            continue
+        writer.write_many(simplify_video(item) for item in items)
+        end = writer.sync()
+        journal.details(batch_ids, len(items), end)
+        state.fetched_ids.update(batch_ids)
+        state.video_count += len(items)
+        state.dataset_end = end
+
+    if error is not None:
+        raise error
+    print(f"Fetched details for {state.video_count} videos.")
+    return state.video_count
+
+
+def _dataset_header():
+    return {
         "query": SEARCH_QUERY,
         "videoCategoryId": VIDEO_CATEGORY_ID,
         "videoDuration": VIDEO_DURATION,
         "collectedAt": datetime.utcnow().isoformat() + "Z",
-        "videoCount": len(videos),
-        "items": videos,
     }
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(dataset, f, ensure_ascii=False, indent=2)
 
-    print(f"Saved dataset with {len(videos)} videos to {OUTPUT_PATH}")
+def _journal_config():
+    return {
+        "query": SEARCH_QUERY,
+        "videoCategoryId": VIDEO_CATEGORY_ID,
+        "videoDuration": VIDEO_DURATION,
+        "target": TARGET_VIDEO_COUNT,
+    }
 
 
-def main():
-    youtube = get_youtube_client()
+async def collect_async(
+    transport,
+    concurrency=MAX_CONCURRENT_REQUESTS,
+    output_path=OUTPUT_PATH,
+    journal_path=JOURNAL_PATH,
+):
+    """
+    Search + fetch details with the async client and stream the videos
+    into the NDJSON dataset at `output_path`.
+
+    Until the run is complete, videos go to `<output_path>.part` and
+    progress is checkpointed to the journal at `journal_path`; an
+    interrupted run resumes from there. On success the partial file
+    replaces `output_path` and the journal is removed.
+    `transport` is an HttpTransport (or a fake with the same get() method).
 
-    video_ids = search_video_ids(youtube)
-    videos = fetch_video_details(youtube, video_ids)
-    save_dataset(videos)
+    Returns the number of videos in the dataset.
+    """
+    part_path = output_path + ".part"
+    journal = CollectJournal(journal_path, _journal_config())
+    state = journal.replay()
+    resumed = (bool(state.video_ids) or state.search_done) and (
+        state.dataset_end is None or os.path.exists(part_path)
+    )
+    if resumed:
+        print(f"Resuming from {journal_path}: {len(state.video_ids)} IDs, "
+              f"{len(state.fetched_ids)} fetched.")
+    else:
+        state = CollectState()
+    journal.open(resume=resumed)
+
+    client = AsyncYouTubeClient(transport, concurrency=concurrency)
+    writer = DatasetWriter(
+        part_path, _dataset_header(), resume_offset=state.dataset_end if resumed else None
+    )
+    try:
+        await search_video_ids_async(client, state, journal)
+        count = await fetch_video_details_async(client, state, journal, writer)
+    finally:
+        writer.close()
+        journal.close()
+        print(f"Quota units used: {client.units_used}")
+
+    os.replace(part_path, output_path)
+    journal.remove()
+    print(f"Saved dataset with {count} videos to {output_path}")
+    return count
+
+
+def save_dataset(videos, path=OUTPUT_PATH):
+    """
+    Save a collected dataset (any iterable of simplified videos) as NDJSON.
+    """
+    count = write_dataset(path, _dataset_header(), videos)
+    print(f"Saved dataset with {count} videos to {path}")
+
+
+def main():
+    transport = HttpTransport(api_key_from_env())
+    asyncio.run(collect_async(transport))
 
 
 if __name__ == "__main__":
@@ -4,25 +4,32 @@ Assignment 2 – Network Effects (Chapter 17)
 
 This script:
 - Reads the youtube_top100.zip dataset (date-labelled JSON files)
+  through the shared columnar store (snapshot_store.py)
+- Takes each song's series as a column of the days × videos panel (panel.py)
 - Builds a time series of view counts for a small set of songs
 - Produces a labelled plot "View count over time" for Section 2 of the report
+- Fits exponential / Bass / logistic growth models to every song
+  (growth_fit.py) and prints the parameters of the tracked songs
 
 Figures from this file are used in:
 - Report Section 2, Question 2(a), (b), (c)
 """
 
 import os
-import json
-import zipfile
-from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+import datasets
+from growth_fit import growth_table_for, to_frame
+from panel import Panel, load_panel
+
 # === CONFIGURATION ========================================================= #
 
-# Path to the ZIP file relative to the project root
-YOUTUBE_ZIP_PATH = os.path.join("data", "youtube_top100.zip")
+# The YouTube archive, from the dataset registry (datasets.json)
+YOUTUBE = datasets.get("youtube_top100")
+YOUTUBE_ZIP_PATH = YOUTUBE.path
 
 # OPTIONAL: if you want to fix the songs yourself, put titles here.
 # If this list is empty, the script will automatically pick the top_k
@@ -37,17 +44,7 @@ TOP_K_AUTOMATIC = 3  # how many songs to track if MANUAL_TITLES is empty
 
 # === HELPER FUNCTIONS ====================================================== #
 
-def parse_date_from_filename(name: str) -> datetime.date:
-    """
-    Filenames look like: 'youtube_top100/20151109_1800_data.json'
-    We extract the '20151109' part and turn it into a date.
-    """
-    base = os.path.basename(name)              # '20151109_1800_data.json'
-    date_str = base.split("_", 1)[0]           # '20151109'
-    return datetime.strptime(date_str, "%Y%m%d").date()
-
-
-def choose_target_titles(z: zipfile.ZipFile, json_names):
+def choose_target_titles(panel: Panel):
     """
     Decide which song titles to track.
     - If MANUAL_TITLES is non-empty, we use those.
@@ -58,16 +55,8 @@ def choose_target_titles(z: zipfile.ZipFile, json_names):
         print("Using manually specified titles.")
         return MANUAL_TITLES
 
-    first_name = sorted(json_names)[0]
-    with z.open(first_name) as f:
-        first_day_data = json.load(f)
-
-    pairs = [
-        (item["snippet"]["title"], int(item["statistics"]["viewCount"]))
-        for item in first_day_data
-    ]
-    pairs.sort(key=lambda x: -x[1])  # sort by viewCount descending
-    titles = [title for title, _ in pairs[:TOP_K_AUTOMATIC]]
+    top_ids = panel.top_k("views", day=0, k=TOP_K_AUTOMATIC)
+    titles = [panel.title_of(vid) for vid in top_ids]
 
     print("Automatically selected titles (top by view count on first day):")
     for t in titles:
@@ -76,31 +65,33 @@ def choose_target_titles(z: zipfile.ZipFile, json_names):
     return titles
 
 
-def load_view_time_series(zip_path: str):
+def load_view_time_series(zip_path: str, kind: str = "youtube"):
     """
     Load (date, title, views) rows for the selected songs from the ZIP file.
     Returns a pandas DataFrame with columns ['date', 'title', 'views']
     and the list of tracked titles.
     """
-    z = zipfile.ZipFile(zip_path)
-    json_names = [n for n in z.namelist() if n.endswith(".json")]
-
-    target_titles = choose_target_titles(z, json_names)
-
-    rows = []
-
-    for name in sorted(json_names):
-        date = parse_date_from_filename(name)
-        with z.open(name) as f:
-            day_data = json.load(f)
-
-        for item in day_data:
-            title = item["snippet"]["title"]
-            if title in target_titles:
-                views = int(item["statistics"]["viewCount"])
-                rows.append({"date": date, "title": title, "views": views})
+    panel = load_panel(zip_path, kind)
+
+    target_titles = choose_target_titles(panel)
+
+    # one column slice of the days × videos panel per tracked video
+    frames = []
+    for j in panel.columns_for_titles(target_titles):
+        rows = np.flatnonzero(~np.isnan(panel.views[:, j]))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "date": panel.dates[rows].astype(object),
+                    "title": str(panel.titles[j]),
+                    "views": panel.views[rows, j].astype(np.int64),
+                }
+            )
+        )
 
-    df = pd.DataFrame(rows)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["date", "title", "views"]
+    )
     return df, target_titles
 
 
@@ -134,20 +125,45 @@ def plot_views_over_time(df: pd.DataFrame, output_path: str | None = None):
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         plt.savefig(output_path, dpi=300)
         print(f"Saved figure to: {output_path}")
+        plt.close()
     else:
         plt.show()
 
 
+def report_growth_parameters(zip_path: str, titles=None, kind: str = "youtube") -> pd.DataFrame:
+    """
+    Update the growth parameter table of the archive (all songs) and
+    print the fitted parameters of `titles` (default: the tracked songs).
+    Returns the full table as a DataFrame.
+    """
+    panel = load_panel(zip_path, kind)
+    table, refitted = growth_table_for(panel, zip_path, kind)
+    params = to_frame(table)
+    print(f"Growth models: {len(params)} songs in the table, {refitted} refitted.")
+
+    if titles is None:
+        titles = choose_target_titles(panel)
+    cols = ["title", "n_obs", "exp_r", "bass_m", "bass_p", "bass_q", "log_K", "log_r", "log_t0"]
+    rows = params[params["title"].isin(titles)]
+    if not rows.empty:
+        with pd.option_context("display.width", 160, "display.max_columns", None):
+            print(rows[cols].to_string())
+    return params
+
+
 # === MAIN ================================================================== #
 
-def main():
+def check_input():
     if not os.path.exists(YOUTUBE_ZIP_PATH):
         raise FileNotFoundError(
             f"Could not find {YOUTUBE_ZIP_PATH}. "
             "Make sure youtube_top100.zip is in the data/ folder."
         )
 
-    df, titles = load_view_time_series(YOUTUBE_ZIP_PATH)
+
+def run_views_plot():
+    check_input()
+    df, titles = load_view_time_series(YOUTUBE_ZIP_PATH, YOUTUBE.kind)
     print(f"Loaded {len(df)} rows for {len(titles)} songs.")
     print("Songs in this plot:")
     for t in titles:
@@ -155,6 +171,17 @@ def main():
 
     # This image can be referenced as "Figure 2.1" in your report
     plot_views_over_time(df, output_path=os.path.join("figures", "a2_views_over_time.png"))
+    return titles
+
+
+def run_growth_report():
+    check_input()
+    return report_growth_parameters(YOUTUBE_ZIP_PATH, kind=YOUTUBE.kind)
+
+
+def main():
+    titles = run_views_plot()
+    report_growth_parameters(YOUTUBE_ZIP_PATH, titles, YOUTUBE.kind)
 
 
 if __name__ == "__main__":
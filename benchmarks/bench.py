@@ -0,0 +1,325 @@
+"""
+bench.py – offline benchmarks for ingest, mapping, correlation and plotting
+
+Generates synthetic archives (gen_data.py) for the requested size, then
+times each scenario and measures its peak Python memory:
+
+  ingest.build_youtube       decode the YouTube ZIP into a store (no caches)
+  ingest.build_spotify       same for Spotify
+  ingest.build_registry      build every registered archive that exists, concurrently
+  ingest.load_cached         load the YouTube store from its npz cache
+  ingest.s1_load_frame       s1.load_youtube_from_zip (store cache warm)
+  ingest.stream_sampled      stream 5 sampled days' view counts (iter_archive_days)
+  selection.presence_build   build the presence index of the YouTube store
+  selection.min_days_sweep   s1.pick_long_lived_songs for every threshold 1..days
+  mapping.cold               s3._build_spotify_youtube_mapping from scratch
+  mapping.warm               same with an up-to-date mapping table
+  turnover.build             chart_turnover.build_turnover on the Spotify store
+  correlation.rank_stats     Spearman + Kendall for every common day
+  correlation.bootstrap      bootstrap CIs for 5 days
+  plotting.s3a_render        s3 part 3a with an empty render cache
+  plotting.s3a_cached        s3 part 3a with a warm render cache
+
+Times are wall-clock seconds (best and median of --repeat runs); memory
+is the tracemalloc peak of one extra run, in MB (allocations in worker
+processes are not included). Each run is appended to a JSON-lines
+history together with the commit it was run on; --compare prints the
+change against the previous run with the same parameters.
+
+Everything runs offline in a scratch directory (benchmarks/.data):
+
+    python benchmarks/bench.py --days 365 --chart-size 100
+    python benchmarks/bench.py --only ingest,mapping --compare
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+
+import chart_turnover  # noqa: E402
+import datasets  # noqa: E402
+import s1  # noqa: E402
+import s3  # noqa: E402
+import snapshot_store  # noqa: E402
+from gen_data import generate  # noqa: E402
+from presence_index import build_presence_index, load_presence_index  # noqa: E402
+from rank_stats import bootstrap_ci, kendall_rows, spearman_rows  # noqa: E402
+from snapshot_store import (  # noqa: E402
+    build_store, evenly_spaced, get_store, invalidate_session, iter_archive_days, load_store,
+)
+from track_mapping import MAPPING_PATH  # noqa: E402
+
+SCRATCH_DIR = os.path.join(BENCH_DIR, ".data")
+HISTORY_PATH = os.path.join(BENCH_DIR, "results", "history.jsonl")
+
+# A scenario this much slower than the previous run is flagged.
+REGRESSION_RATIO = 1.2
+
+
+class Scenario(NamedTuple):
+    name: str
+    setup: Callable[[], None]   # bring caches into the state the scenario expects
+    run: Callable[[], object]
+
+
+# ---------------------------------------------------------------------
+# Cache states
+# ---------------------------------------------------------------------
+
+def _cold():
+    """No session store, no npz cache, no mapping table, no plots."""
+    invalidate_session()
+    shutil.rmtree(snapshot_store.CACHE_DIR, ignore_errors=True)
+    shutil.rmtree(s3.PLOTS_DIR, ignore_errors=True)
+
+
+def _disk_cache_only():
+    invalidate_session()
+    get_store(s3.YOUTUBE_ZIP, "youtube")
+    get_store(s3.SPOTIFY_ZIP, "spotify")
+    invalidate_session()
+
+
+def _warm():
+    get_store(s3.YOUTUBE_ZIP, "youtube")
+    get_store(s3.SPOTIFY_ZIP, "spotify")
+
+
+def _no_mapping():
+    _warm()
+    if os.path.exists(MAPPING_PATH):
+        os.remove(MAPPING_PATH)
+
+
+def _mapped():
+    _warm()
+    _build_mapping()
+
+
+def _no_render_cache():
+    _warm()
+    shutil.rmtree(s3.PLOTS_DIR, ignore_errors=True)
+
+
+def _rendered():
+    _warm()
+    s3.plot_viewcount_distributions(num_days=5)
+
+
+# ---------------------------------------------------------------------
+# Scenario bodies
+# ---------------------------------------------------------------------
+
+def _build_mapping():
+    yt, sp, dates = s3._load_common_days()
+    return s3._build_spotify_youtube_mapping(yt, sp, dates)
+
+
+def _stream_sampled():
+    n = 0
+    days = iter_archive_days(s3.YOUTUBE_ZIP, "youtube", days=evenly_spaced(5), fields=[s3.VIEW_COUNT])
+    for _date, columns in days:
+        n += len(columns[s3.VIEW_COUNT])
+    return n
+
+
+def _min_days_sweep():
+    index = load_presence_index(s3.YOUTUBE_ZIP)
+    return [s1.pick_long_lived_songs(index, n, 5) for n in range(1, index.num_dates + 1)]
+
+
+def _rank_stats():
+    yt, sp, dates = s3._load_common_days()
+    mapping = _build_mapping()
+    sp_ranks, yt_ranks, _, _ = s3._rank_matrices(yt, sp, dates, mapping)
+    return spearman_rows(sp_ranks, yt_ranks), kendall_rows(sp_ranks, yt_ranks)
+
+
+def _bootstrap():
+    yt, sp, dates = s3._load_common_days()
+    mapping = _build_mapping()
+    sp_ranks, yt_ranks, _, _ = s3._rank_matrices(yt, sp, dates, mapping)
+    return bootstrap_ci(sp_ranks[:5], yt_ranks[:5])
+
+
+def scenarios(workers: Optional[int]) -> List[Scenario]:
+    return [
+        Scenario("ingest.build_youtube", _cold, lambda: build_store(s3.YOUTUBE_ZIP, "youtube", workers)),
+        Scenario("ingest.build_spotify", _cold, lambda: build_store(s3.SPOTIFY_ZIP, "spotify", workers)),
+        Scenario("ingest.build_registry", _cold,
+                 lambda: datasets.load_stores(list(datasets.registry().values()), skip_missing=True)),
+        Scenario("ingest.load_cached", _disk_cache_only, lambda: load_store(s3.YOUTUBE_ZIP, "youtube")),
+        Scenario("ingest.s1_load_frame", _disk_cache_only, lambda: s1.load_youtube_from_zip(s3.YOUTUBE_ZIP)),
+        Scenario("ingest.stream_sampled", _disk_cache_only, _stream_sampled),
+        Scenario("selection.presence_build", _warm,
+                 lambda: build_presence_index(get_store(s3.YOUTUBE_ZIP, "youtube"))),
+        Scenario("selection.min_days_sweep", _warm, _min_days_sweep),
+        Scenario("mapping.cold", _no_mapping, _build_mapping),
+        Scenario("mapping.warm", _mapped, _build_mapping),
+        Scenario("turnover.build", _warm,
+                 lambda: chart_turnover.build_turnover(get_store(s3.SPOTIFY_ZIP, "spotify"))),
+        Scenario("correlation.rank_stats", _mapped, _rank_stats),
+        Scenario("correlation.bootstrap", _mapped, _bootstrap),
+        Scenario("plotting.s3a_render", _no_render_cache, lambda: s3.plot_viewcount_distributions(num_days=5)),
+        Scenario("plotting.s3a_cached", _rendered, lambda: s3.plot_viewcount_distributions(num_days=5)),
+    ]
+
+
+# ---------------------------------------------------------------------
+# Measuring
+# ---------------------------------------------------------------------
+
+def measure(scenario: Scenario, repeat: int) -> dict:
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            scenario.setup()
+            start = time.perf_counter()
+            scenario.run()
+            times.append(time.perf_counter() - start)
+
+        scenario.setup()
+        tracemalloc.start()
+        try:
+            scenario.run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "times_s": [round(t, 6) for t in times],
+        "best_s": round(min(times), 6),
+        "median_s": round(statistics.median(times), 6),
+        "peak_mb": round(peak / 1e6, 3),
+    }
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_data(days: int, chart_size: int, seed: int) -> str:
+    """Scratch working directory with generated archives (reused if present)."""
+    work_dir = os.path.join(SCRATCH_DIR, f"d{days}_c{chart_size}_s{seed}")
+    data_dir = os.path.join(work_dir, "data")
+    if not os.path.exists(os.path.join(data_dir, "spotify_top100.zip")):
+        generate(data_dir, days, chart_size, seed)
+    return work_dir
+
+
+# ---------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------
+
+def read_history(path: str = HISTORY_PATH) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(record: dict, path: str = HISTORY_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def compare(record: dict, history: List[dict]) -> None:
+    """Print the change of every scenario against the last run with the same params."""
+    previous = [h for h in history if h["params"] == record["params"]]
+    if not previous:
+        print("No earlier run with these parameters to compare against.")
+        return
+    base = previous[-1]
+    print(f"\nCompared with {base['commit'] or '?'} ({base['timestamp']}):")
+    for name, result in record["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        ratio = result["best_s"] / old["best_s"] if old["best_s"] else float("nan")
+        flag = "  <-- slower" if ratio > REGRESSION_RATIO else ""
+        print(f"  {name:<26} {old['best_s']:9.4f}s -> {result['best_s']:9.4f}s  x{ratio:5.2f}"
+              f"   mem {old['peak_mb']:8.1f} -> {result['peak_mb']:8.1f} MB{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--chart-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="decode workers for ingest")
+    parser.add_argument("--only", default="", help="comma-separated scenario name prefixes")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--compare", action="store_true", help="compare with the previous run")
+    args = parser.parse_args(argv)
+
+    history_path = os.path.abspath(args.history)
+    work_dir = prepare_data(args.days, args.chart_size, args.seed)
+    os.chdir(work_dir)
+
+    prefixes = [p for p in args.only.split(",") if p]
+    selected = [
+        sc for sc in scenarios(args.workers)
+        if not prefixes or any(sc.name.startswith(p) for p in prefixes)
+    ]
+
+    params = {
+        "days": args.days,
+        "chart_size": args.chart_size,
+        "seed": args.seed,
+        "workers": args.workers,
+    }
+    print(f"Benchmarking {len(selected)} scenarios on {params}")
+    results: Dict[str, dict] = {}
+    for sc in selected:
+        results[sc.name] = measure(sc, args.repeat)
+        r = results[sc.name]
+        print(f"  {sc.name:<26} best {r['best_s']:9.4f}s  median {r['median_s']:9.4f}s"
+              f"  peak {r['peak_mb']:8.1f} MB")
+
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if args.compare:
+        compare(record, read_history(history_path))
+    if not args.no_history:
+        append_history(record, history_path)
+        print(f"\nAppended results to {history_path}")
+
+
+if __name__ == "__main__":
+    main()
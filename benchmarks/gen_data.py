@@ -0,0 +1,119 @@
+"""
+gen_data.py – synthetic chart archives for the benchmarks
+
+Writes youtube_top100.zip and spotify_top100.zip with the same layout
+as the real archives:
+
+    youtube_top100/YYYYMMDD_1800_data.json   list of video resources
+    spotify_top100/YYYYMMDD_1800_data.json   {"tracks": {"items": [...]}}
+
+for a configurable number of days and chart size. Songs enter a growing
+pool over time, each day's chart is drawn from the pool weighted by a
+heavy-tailed popularity, and view counts grow from day to day, so the
+store, mapping, correlation and plotting code see realistic shapes. The
+YouTube titles are "<artist> - <song> (Official Video)" and the Spotify
+entries carry the same song and artist, so the title matcher finds most
+pairs. Every 7th Spotify day also has an extra 1328 snapshot, like the
+real archive. The output only depends on the arguments (and the seed).
+
+Usage:
+    python benchmarks/gen_data.py --days 365 --chart-size 100 --out /tmp/bench/data
+"""
+
+import os
+import json
+import zipfile
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+START_DATE = date(2015, 11, 9)
+
+WORDS = (
+    "love night fire dream heart gold city rain summer light wild young "
+    "money shadow river crazy lonely forever dance paradise storm sugar "
+    "thunder ocean diamond electric midnight sweet broken secret"
+).split()
+
+
+def _song_catalog(rng, num_songs):
+    """(video_id, spotify_id, song, artist) per song."""
+    catalog = []
+    for i in range(num_songs):
+        song = " ".join(rng.choice(WORDS, size=rng.integers(1, 4))).title()
+        artist = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+        catalog.append((f"yt{i:07d}", f"sp{i:07d}", f"{song} {i}", artist))
+    return catalog
+
+
+def generate(out_dir: str, days: int = 60, chart_size: int = 100, seed: int = 0):
+    """Write both archives to out_dir; returns their paths."""
+    rng = np.random.default_rng(seed)
+    # pool grows by ~chart_size/10 songs per day
+    num_songs = chart_size * 2 + days * max(1, chart_size // 10)
+    catalog = _song_catalog(rng, num_songs)
+    appeal = rng.pareto(1.2, size=num_songs) + 1.0
+    base_views = (appeal * 1e5).astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    yt_path = os.path.join(out_dir, "youtube_top100.zip")
+    sp_path = os.path.join(out_dir, "spotify_top100.zip")
+
+    with zipfile.ZipFile(yt_path, "w", zipfile.ZIP_DEFLATED) as yz, \
+            zipfile.ZipFile(sp_path, "w", zipfile.ZIP_DEFLATED) as sz:
+        for d in range(days):
+            stamp = (START_DATE + timedelta(days=d)).strftime("%Y%m%d")
+            pool = min(num_songs, chart_size * 2 + d * max(1, chart_size // 10))
+            weights = appeal[:pool] / appeal[:pool].sum()
+            chart = rng.choice(pool, size=min(chart_size, pool), replace=False, p=weights)
+
+            views = base_views[chart] * (1 + d) + rng.integers(0, 1000, size=len(chart))
+            likes = views // rng.integers(20, 200, size=len(chart))
+            dislikes = likes // rng.integers(5, 50, size=len(chart))
+            youtube = [
+                {
+                    "kind": "youtube#video",
+                    "id": catalog[i][0],
+                    "snippet": {"title": f"{catalog[i][3]} - {catalog[i][2]} (Official Video)"},
+                    "statistics": {
+                        "viewCount": str(v),
+                        "likeCount": str(lk),
+                        "dislikeCount": str(dk),
+                    },
+                }
+                for i, v, lk, dk in zip(chart.tolist(), views.tolist(), likes.tolist(), dislikes.tolist())
+            ]
+            yz.writestr(f"youtube_top100/{stamp}_1800_data.json", json.dumps(youtube))
+
+            # Spotify chart: same songs, ranked by a noisy version of appeal
+            order = chart[np.argsort(-(appeal[chart] * rng.lognormal(0, 0.5, size=len(chart))))]
+            spotify = {"tracks": {"items": [
+                {"track": {
+                    "id": catalog[i][1],
+                    "name": catalog[i][2],
+                    "artists": [{"name": catalog[i][3]}],
+                }}
+                for i in order.tolist()
+            ]}}
+            payload = json.dumps(spotify)
+            sz.writestr(f"spotify_top100/{stamp}_1800_data.json", payload)
+            if d % 7 == 0:
+                sz.writestr(f"spotify_top100/{stamp}_1328_data.json", payload)
+
+    return yt_path, sp_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic chart archives.")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--chart-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join("benchmarks", ".data", "data"))
+    args = parser.parse_args(argv)
+    for path in generate(args.out, args.days, args.chart_size, args.seed):
+        print(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
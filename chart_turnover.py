@@ -0,0 +1,304 @@
+"""
+chart_turnover.py – chart entries, exits, run survival and rank transitions
+
+Computed for a whole archive in one pass over the store rows (no loop
+over days or videos):
+
+- entries / exits per date: the items that joined the chart that day
+  (absent on the previous snapshot date) or dropped out of it (present
+  on the previous date, absent now), stored CSR-style per date
+- chart runs: maximal stretches of consecutive snapshot dates on which
+  an item was charted, with start, end and length; runs touching the
+  first or last date are flagged as left-/right-censored
+- Kaplan–Meier survival of run lengths: S(t) = P(run lasts > t days),
+  with right-censored runs (still charting at the end of the archive)
+  as censored observations
+- rank transitions: for every pair of consecutive dates, counts of
+  moves between rank buckets (1–10, 11–20, …) plus an OUT state for
+  entries and exits
+
+Dates are the store's distinct snapshot dates (presence_index.date_columns);
+if several snapshots share a date the last one is used. Ranks are the
+chart position for Spotify and the rank by view count for YouTube (as in
+s3 part 3d; ties broken by position).
+
+Usage:
+
+    t = turnover_for("data/spotify_top100.zip", "spotify")
+    t.entries_on("2016-11-25")
+    km = kaplan_meier_runs(t)
+    transition_probabilities(t.transitions.sum(axis=0))
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+import datasets
+import snapshot_schema
+from instrument import span
+from presence_index import date_columns
+from snapshot_store import SnapshotStore, get_store
+
+BUCKET_SIZE = 10
+
+
+# ---------------------------------------------------------------------
+# Containers
+# ---------------------------------------------------------------------
+
+@dataclass
+class Turnover:
+    """Entries, exits, runs and rank transitions of one archive (see module docstring)."""
+    dates: np.ndarray           # datetime64[D], distinct snapshot dates
+    item_ids: np.ndarray        # str, store dictionary
+    entry_offsets: np.ndarray   # int64, dates + 1: entries of date d are
+    entry_items: np.ndarray     #   entry_items[entry_offsets[d]:entry_offsets[d + 1]]
+    exit_offsets: np.ndarray
+    exit_items: np.ndarray
+    run_item: np.ndarray        # int32, one per run
+    run_start: np.ndarray       # int32, date index of the first day
+    run_length: np.ndarray      # int32, number of dates
+    left_censored: np.ndarray   # bool, run starts on the first date
+    right_censored: np.ndarray  # bool, run still charting on the last date
+    transitions: np.ndarray     # int64, (dates - 1) × states × states
+    bucket_size: int
+
+    @property
+    def num_dates(self) -> int:
+        return len(self.dates)
+
+    @property
+    def num_buckets(self) -> int:
+        return self.transitions.shape[1] - 1
+
+    @property
+    def state_labels(self) -> List[str]:
+        b = self.bucket_size
+        return [f"{k * b + 1}-{(k + 1) * b}" for k in range(self.num_buckets)] + ["out"]
+
+    @property
+    def entry_counts(self) -> np.ndarray:
+        return np.diff(self.entry_offsets)
+
+    @property
+    def exit_counts(self) -> np.ndarray:
+        return np.diff(self.exit_offsets)
+
+    def _date_index(self, date) -> int:
+        d = int(np.searchsorted(self.dates, np.datetime64(date, "D")))
+        if d >= self.num_dates or self.dates[d] != np.datetime64(date, "D"):
+            raise KeyError(f"No snapshot on {date}")
+        return d
+
+    def entries_on(self, date) -> List[str]:
+        d = self._date_index(date)
+        return self.item_ids[self.entry_items[self.entry_offsets[d]:self.entry_offsets[d + 1]]].tolist()
+
+    def exits_on(self, date) -> List[str]:
+        d = self._date_index(date)
+        return self.item_ids[self.exit_items[self.exit_offsets[d]:self.exit_offsets[d + 1]]].tolist()
+
+
+class KaplanMeier(NamedTuple):
+    time: np.ndarray        # distinct run lengths with at least one observation
+    at_risk: np.ndarray     # runs with length >= time
+    events: np.ndarray      # runs that ended after exactly `time` dates
+    survival: np.ndarray    # S(time) = P(length > time)
+    std_err: np.ndarray     # Greenwood standard error of S
+
+    def at(self, t: float) -> float:
+        """S(t): probability that a run lasts longer than t dates."""
+        k = int(np.searchsorted(self.time, t, side="right"))
+        return 1.0 if k == 0 else float(self.survival[k - 1])
+
+    def median(self) -> Optional[float]:
+        """Smallest length with S <= 0.5 (None if survival never drops that far)."""
+        below = np.flatnonzero(self.survival <= 0.5)
+        return float(self.time[below[0]]) if len(below) else None
+
+
+# ---------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------
+
+def _row_ranks(store: SnapshotStore, day_of_row: np.ndarray, rank_by: str) -> np.ndarray:
+    """1-based rank of every row within its snapshot."""
+    if rank_by == "position":
+        return store.position.astype(np.int64)
+    # views descending, missing views last, ties by position
+    views = np.where(store.views >= 0, store.views, -1)
+    order = np.lexsort((store.position, -views, day_of_row))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - store.day_offsets[day_of_row[order]] + 1
+    return ranks
+
+
+def _csr(groups: np.ndarray, values: np.ndarray, num_groups: int):
+    order = np.argsort(groups, kind="stable")
+    offsets = np.zeros(num_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(groups, minlength=num_groups), out=offsets[1:])
+    return offsets, values[order]
+
+
+def build_turnover(
+    store: SnapshotStore,
+    rank_by: Optional[str] = None,
+    bucket_size: int = BUCKET_SIZE,
+) -> Turnover:
+    """
+    Compute the turnover statistics of a store. `rank_by` is 'position'
+    or 'views' (default: position for Spotify, views for YouTube).
+    """
+    if rank_by is None:
+        rank_by = "position" if snapshot_schema.base_kind(store.kind) == "spotify" else "views"
+
+    with span("turnover.build", archive=os.path.basename(store.source)) as sp:
+        dates, col_of_day = date_columns(store)
+        num_dates = len(dates)
+        day_of_row = np.repeat(np.arange(store.num_days), np.diff(store.day_offsets))
+        ranks = _row_ranks(store, day_of_row, rank_by)
+
+        cols = col_of_day[day_of_row]
+        rows = np.flatnonzero((store.item >= 0) & (cols >= 0))
+        item, col, rank = store.item[rows], cols[rows], ranks[rows]
+
+        # one row per (item, date), sorted by item then date; on duplicate
+        # dates the later snapshot comes first and wins (within a snapshot,
+        # the first entry of an item)
+        order = np.lexsort((rows, -day_of_row[rows], col, item))
+        item, col, rank = item[order], col[order], rank[order]
+        first = np.ones(len(item), dtype=bool)
+        first[1:] = (item[1:] != item[:-1]) | (col[1:] != col[:-1])
+        item, col, rank = item[first], col[first], rank[first]
+
+        # runs: a row continues the previous one if same item and next date
+        cont = (item[1:] == item[:-1]) & (col[1:] == col[:-1] + 1)
+        starts = np.flatnonzero(np.concatenate([[True], ~cont])) if len(item) else np.empty(0, np.int64)
+        ends = np.flatnonzero(np.concatenate([~cont, [True]])) if len(item) else np.empty(0, np.int64)
+
+        entered = starts[col[starts] > 0]
+        exited = ends[col[ends] < num_dates - 1]
+        entry_offsets, entry_items = _csr(col[entered], item[entered], num_dates)
+        exit_offsets, exit_items = _csr(col[exited] + 1, item[exited], num_dates)
+
+        # rank transitions between consecutive dates
+        max_rank = int(rank.max()) if len(rank) else 1
+        num_buckets = max(1, -(-max_rank // bucket_size))
+        out = num_buckets
+        bucket = np.minimum((np.maximum(rank, 1) - 1) // bucket_size, num_buckets - 1)
+        moved = np.flatnonzero(cont)
+        day = np.concatenate([col[moved], col[exited], col[entered] - 1])
+        src = np.concatenate([bucket[moved], bucket[exited], np.full(len(entered), out)])
+        dst = np.concatenate([bucket[moved + 1], np.full(len(exited), out), bucket[entered]])
+        states = num_buckets + 1
+        flat = (day * states + src) * states + dst
+        transitions = np.bincount(flat, minlength=max(num_dates - 1, 0) * states * states)
+        transitions = transitions.reshape(max(num_dates - 1, 0), states, states)
+
+        turnover = Turnover(
+            dates=dates,
+            item_ids=store.item_ids,
+            entry_offsets=entry_offsets,
+            entry_items=entry_items,
+            exit_offsets=exit_offsets,
+            exit_items=exit_items,
+            run_item=item[starts].astype(np.int32),
+            run_start=col[starts].astype(np.int32),
+            run_length=(col[ends] - col[starts] + 1).astype(np.int32),
+            left_censored=col[starts] == 0,
+            right_censored=col[ends] == num_dates - 1,
+            transitions=transitions,
+            bucket_size=bucket_size,
+        )
+        sp.count(records=len(item), runs=len(starts), days=num_dates)
+    return turnover
+
+
+def turnover_for(zip_path: str, kind: str = "youtube", rank_by: Optional[str] = None) -> Turnover:
+    """Turnover statistics of an archive (store via the session cache)."""
+    return build_turnover(get_store(zip_path, kind), rank_by)
+
+
+# ---------------------------------------------------------------------
+# Survival and transition probabilities
+# ---------------------------------------------------------------------
+
+def kaplan_meier(durations: np.ndarray, observed: np.ndarray) -> KaplanMeier:
+    """
+    Kaplan–Meier estimate of P(duration > t). `observed` is False for
+    right-censored durations.
+    """
+    durations = np.asarray(durations)
+    observed = np.asarray(observed, dtype=bool)
+    time, inverse = np.unique(durations, return_inverse=True)
+    total = np.bincount(inverse, minlength=len(time))
+    events = np.bincount(inverse, weights=observed, minlength=len(time)).astype(np.int64)
+    at_risk = total[::-1].cumsum()[::-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        survival = np.cumprod(1.0 - events / at_risk)
+        terms = np.where(at_risk > events, events / (at_risk * (at_risk - events)), 0.0)
+        std_err = survival * np.sqrt(np.cumsum(terms))
+    return KaplanMeier(time, at_risk, events, survival, std_err)
+
+
+def kaplan_meier_runs(turnover: Turnover, include_left_censored: bool = False) -> KaplanMeier:
+    """
+    Survival of chart runs. Runs already charting on the first date have
+    an unknown start and are left out unless include_left_censored.
+    """
+    use = np.ones(len(turnover.run_length), dtype=bool)
+    if not include_left_censored:
+        use &= ~turnover.left_censored
+    return kaplan_meier(turnover.run_length[use], ~turnover.right_censored[use])
+
+
+def transition_probabilities(counts: np.ndarray) -> np.ndarray:
+    """Row-normalise transition counts (rows without moves stay 0)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+# ---------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------
+
+def print_report(turnover: Turnover, name: str) -> None:
+    print(f"\n{name}: {turnover.num_dates} dates, {len(turnover.run_length)} chart runs")
+    if turnover.num_dates > 1:
+        print(f"  entries per day: mean {turnover.entry_counts[1:].mean():.2f}, "
+              f"max {turnover.entry_counts[1:].max()}")
+        print(f"  exits per day:   mean {turnover.exit_counts[1:].mean():.2f}, "
+              f"max {turnover.exit_counts[1:].max()}")
+
+    km = kaplan_meier_runs(turnover)
+    if len(km.time):
+        median = km.median()
+        print(f"  run survival: S(7) = {km.at(7):.3f}, S(30) = {km.at(30):.3f}, median "
+              + (f"{median:.0f} dates" if median is not None else "not reached"))
+
+    probs = transition_probabilities(turnover.transitions.sum(axis=0))
+    labels = turnover.state_labels
+    print("  rank transitions (row: from, column: to, probability):")
+    print("  " + " " * 8 + "".join(f"{lab:>8}" for lab in labels))
+    for lab, row in zip(labels, probs):
+        print("  " + f"{lab:>8}" + "".join(f"{p:8.3f}" for p in row))
+
+
+def main(argv=None):
+    """Report on the named registry datasets (default: every dataset whose archive exists)."""
+    argv = sys.argv[1:] if argv is None else argv
+    selected = [datasets.get(name) for name in argv] if argv else list(datasets.registry().values())
+    stores = datasets.load_stores(selected, skip_missing=not argv)
+    for ds in selected:
+        if ds.name in stores:
+            print_report(build_turnover(stores[ds.name], ds.rank_by), ds.label)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+collect_journal.py – checkpoint journal for the a5 collector
+
+A collection run appends one JSON line per step to a journal file:
+
+    {"type": "header", "config": {...}}                  run settings
+    {"type": "search", "next": "<token>", "ids": [...]}  one search page
+    {"type": "search_done"}                              no more pages needed
+    {"type": "details", "ids": [...], "count": n, "end": <offset>}
+                                                         one videos().list batch
+
+The fetched videos themselves are streamed into the partial dataset file
+(video_dataset.DatasetWriter); a details record is only written after
+its batch has been synced there, and `end` is the dataset size at that
+point. Every journal line is flushed and fsync'ed before the collector
+moves on, so after a crash (quota error, network blip, Ctrl-C) the
+journal describes all completed work. replay() rebuilds the state from
+it; a rerun cuts the dataset back to the last `end`, continues from the
+last search page token and only requests the IDs that have no "details"
+record yet. A torn last line from a crash mid-write is ignored.
+
+A journal written with a different configuration (query, category, ...)
+is not resumed – the run starts from scratch.
+"""
+
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+
+@dataclass
+class CollectState:
+    """Progress reconstructed from a journal."""
+    video_ids: List[str] = field(default_factory=list)   # in search order
+    seen_ids: Set[str] = field(default_factory=set)
+    page_token: Optional[str] = None
+    search_done: bool = False
+    fetched_ids: Set[str] = field(default_factory=set)   # requested via videos().list
+    video_count: int = 0                                 # videos in the dataset
+    dataset_end: Optional[int] = None                    # dataset size at last checkpoint
+
+    @property
+    def pending_ids(self) -> List[str]:
+        return [vid for vid in self.video_ids if vid not in self.fetched_ids]
+
+
+class CollectJournal:
+    """Append-only JSONL journal of one collection run."""
+
+    def __init__(self, path: str, config: Dict[str, object]):
+        self.path = path
+        self.config = config
+        self._file = None
+        self._valid_end = 0     # end of the last complete record (see replay)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _records(self):
+        self._valid_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return  # torn write at the end of the file
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return
+                self._valid_end += len(line)
+                yield record
+
+    def replay(self) -> CollectState:
+        """
+        State of the previous run, or an empty state if there is no
+        journal or it belongs to a different configuration.
+        """
+        state = CollectState()
+        if not os.path.exists(self.path):
+            return state
+
+        records = self._records()
+        header = next(records, None)
+        if header is None or header.get("config") != self.config:
+            return CollectState()
+
+        for rec in records:
+            kind = rec.get("type")
+            if kind == "search":
+                for vid in rec["ids"]:
+                    if vid not in state.seen_ids:
+                        state.seen_ids.add(vid)
+                        state.video_ids.append(vid)
+                state.page_token = rec.get("next")
+                if not state.page_token:
+                    state.search_done = True
+            elif kind == "search_done":
+                state.search_done = True
+            elif kind == "details":
+                state.fetched_ids.update(rec["ids"])
+                state.video_count += rec["count"]
+                state.dataset_end = rec["end"]
+        return state
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def open(self, resume: bool) -> None:
+        """
+        Open for appending (after replay()); without `resume` any old
+        journal is replaced.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if resume and os.path.exists(self.path):
+            # drop a torn last line so new records start on a fresh line
+            with open(self.path, "r+b") as f:
+                f.truncate(self._valid_end)
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._append({"type": "header", "config": self.config})
+
+    def _append(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def search_page(self, ids: List[str], next_token: Optional[str]) -> None:
+        self._append({"type": "search", "next": next_token, "ids": ids})
+
+    def search_done(self) -> None:
+        self._append({"type": "search_done"})
+
+    def details(self, ids: List[str], count: int, end: int) -> None:
+        self._append({"type": "details", "ids": ids, "count": count, "end": end})
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        """Delete the journal (after the dataset has been saved)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
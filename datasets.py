@@ -0,0 +1,200 @@
+"""
+datasets.py – registry of the snapshot archives
+
+Which archives exist and how to read them is described once, in
+datasets.json next to this file (or the file named by the DATASETS
+environment variable):
+
+  {"version": 1,
+   "datasets": [
+     {"name": "radio3fm_megahit",          unique key
+      "label": "3FM Megahit",              for titles and reports
+      "path": "data/radio3fm_megahit.zip", relative to the working directory
+      "format": "youtube",                 base schema: 'youtube' or 'spotify'
+      "chart": "radio",                    chart type, used to pick groups
+      "rank_by": "views",                  'views' or 'position' (optional)
+      "id_paths": ["id.videoId"],          optional: own id extraction rule
+      "date_pattern": "^(?P<year>\\d{4})(?P<month>\\d{2})(?P<day>\\d{2})_"},
+                                           optional: date in the member names
+     ...]}
+
+A dataset with its own id_paths or date_pattern gets its own archive
+kind ('<format>-<name>', registered with snapshot_schema), and thus its
+own store cache. Others use the plain format as kind, so their caches
+are shared with code that still passes 'youtube' / 'spotify'.
+
+The assignments take their archives from here (s1 part 1b loops over
+the 'radio' charts, s3 uses 'youtube_top100' and 'spotify_top100'), so
+adding a chart is an edit to datasets.json. load_stores() loads several
+archives at once, each in its own thread (snapshot_store.get_store):
+the process pools decoding the archives run side by side and overlap
+with the serial parts of the others (reading the ZIP directory,
+assembling, writing the cache), instead of one archive after another.
+"""
+
+import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import snapshot_schema
+from instrument import span
+from snapshot_schema import DATE_PATTERN, ArchiveFormat
+from snapshot_store import SnapshotStore, cache_path_for, get_store
+
+REGISTRY_PATH = os.environ.get(
+    "DATASETS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "datasets.json")
+)
+REGISTRY_VERSION = 1
+
+# Archives loaded at the same time by load_stores(); each one decodes
+# in its own process pool, so keep this small.
+LOAD_WORKERS = 4
+
+RANK_BY = ("views", "position")
+
+
+class Dataset(NamedTuple):
+    name: str
+    label: str
+    path: str
+    format: str
+    chart: str
+    rank_by: str
+    id_paths: Tuple[str, ...] = ()
+    date_pattern: str = DATE_PATTERN
+
+    @property
+    def kind(self) -> str:
+        """Archive kind for snapshot_store (see module docstring)."""
+        if self.id_paths or self.date_pattern != DATE_PATTERN:
+            return f"{self.format}-{self.name}"
+        return self.format
+
+    @property
+    def archive_format(self) -> ArchiveFormat:
+        return ArchiveFormat(self.format, self.id_paths, self.date_pattern)
+
+
+# ---------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------
+
+def _parse_entry(entry: dict) -> Dataset:
+    try:
+        name, path, fmt = entry["name"], entry["path"], entry["format"]
+    except KeyError as e:
+        raise ValueError(f"Dataset entry {entry!r} lacks {e.args[0]!r}") from None
+    if fmt not in snapshot_schema.SCHEMAS:
+        raise ValueError(f"Dataset {name!r}: unknown format {fmt!r}")
+    rank_by = entry.get("rank_by", "position" if fmt == "spotify" else "views")
+    if rank_by not in RANK_BY:
+        raise ValueError(f"Dataset {name!r}: rank_by must be one of {RANK_BY}")
+    return Dataset(
+        name=name,
+        label=entry.get("label", name),
+        path=os.path.normpath(path),
+        format=fmt,
+        chart=entry.get("chart", ""),
+        rank_by=rank_by,
+        id_paths=tuple(entry.get("id_paths", ())),
+        date_pattern=entry.get("date_pattern", DATE_PATTERN),
+    )
+
+
+def load_registry(path: str = REGISTRY_PATH) -> Dict[str, Dataset]:
+    """
+    Read and validate a registry file, and register the archive kinds of
+    its datasets. Returns name -> Dataset in file order.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if config.get("version") != REGISTRY_VERSION:
+        raise ValueError(f"{path}: unsupported registry version {config.get('version')!r}")
+
+    registry: Dict[str, Dataset] = {}
+    for entry in config.get("datasets", []):
+        ds = _parse_entry(entry)
+        if ds.name in registry:
+            raise ValueError(f"{path}: dataset {ds.name!r} is defined twice")
+        snapshot_schema.register_format(ds.kind, ds.archive_format)
+        registry[ds.name] = ds
+    return registry
+
+
+_REGISTRY: Optional[Dict[str, Dataset]] = None
+
+
+def registry() -> Dict[str, Dataset]:
+    """The registry of REGISTRY_PATH (read once per process)."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = load_registry()
+    return _REGISTRY
+
+
+def get(name: str) -> Dataset:
+    try:
+        return registry()[name]
+    except KeyError:
+        raise KeyError(f"Unknown dataset {name!r}; known: {', '.join(registry())}") from None
+
+
+def select(chart: Optional[str] = None, format: Optional[str] = None) -> List[Dataset]:
+    """Datasets of a chart type and/or format, in registry order."""
+    return [
+        ds for ds in registry().values()
+        if (chart is None or ds.chart == chart) and (format is None or ds.format == format)
+    ]
+
+
+# ---------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------
+
+def load_store(ds: Dataset) -> SnapshotStore:
+    """The dataset's store, via the session cache."""
+    return get_store(ds.path, ds.kind)
+
+
+def load_stores(
+    selected: Sequence[Dataset],
+    skip_missing: bool = False,
+    workers: Optional[int] = None,
+) -> Dict[str, SnapshotStore]:
+    """
+    Load the stores of several datasets concurrently (see module
+    docstring). With skip_missing, datasets whose archive does not exist
+    are left out instead of raising FileNotFoundError.
+
+    Returns:
+        name -> store, in the order of `selected`
+    """
+    if skip_missing:
+        selected = [ds for ds in selected if os.path.exists(ds.path)]
+    if not selected:
+        return {}
+    workers = max(1, min(workers or LOAD_WORKERS, len(selected)))
+    with span("datasets.load", datasets=len(selected)):
+        if workers == 1:
+            stores = [load_store(ds) for ds in selected]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                stores = list(pool.map(load_store, selected))
+    return {ds.name: store for ds, store in zip(selected, stores)}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    chart = argv[0] if argv else None
+    print(f"Registry: {REGISTRY_PATH}")
+    for ds in select(chart):
+        status = "missing"
+        if os.path.exists(ds.path):
+            status = "cached" if os.path.exists(cache_path_for(ds.path, ds.kind)) else "not cached"
+        print(f"  {ds.name:<24} {ds.chart:<8} {ds.kind:<16} {status:<10} {ds.path}")
+
+
+if __name__ == "__main__":
+    main()
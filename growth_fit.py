@@ -0,0 +1,428 @@
+"""
+growth_fit.py – growth models for every video of an archive at once
+
+Assignment 2 only plots cumulative views. To compare the dynamics of
+songs, this module fits three growth models to the cumulative view
+series V(t) of every video in a panel (panel.py):
+
+- exponential   V(t) = a * exp(r t)
+                linear least squares on log V            -> exp_a, exp_r
+- Bass          n(t) = p m + (q - p) N - (q / m) N^2
+                with N the previous level and n the daily increment,
+                the discrete Bass (1969) regression      -> bass_m, bass_p, bass_q
+- logistic      V(t) = K / (1 + exp(-r (t - t0)))
+                nonlinear least squares (Levenberg-Marquardt)
+                                                         -> log_K, log_r, log_t0
+
+t is measured in days since the video's first observation. The two
+linear models are solved for all videos together as batched normal
+equations. The logistic fit is batched as well (one 3 × 3 system per
+video per iteration) and the videos are split over a process pool.
+
+Results go into a persistent parameter table (like track_mapping.py),
+
+  data/cache/growth_<archive>.json
+  {"version": 2, "source": "youtube_top100.zip", "days": "1c9a03f7",
+   "last_date": "2016-11-28",
+   "entries": {"<video id>": {"first_date": ..., "n_obs": ..., "exp_r": ..., ...}}}
+
+update_growth_table() only refits videos with observations after
+`last_date`, and starts their logistic fit from the stored parameters
+(warm start), which usually converges in a few iterations. `days` is
+the manifest CRC of the days up to `last_date` (snapshot_store.days_crc,
+as in track_mapping.py): if one of them is rewritten, or the archive is
+regenerated, the table is rebuilt. to_frame() turns the table into a
+DataFrame for querying.
+"""
+
+import os
+import json
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from instrument import span
+from panel import Panel
+from snapshot_store import CACHE_DIR, SnapshotStore, days_crc, get_store
+from utils import process_pool
+
+GROWTH_VERSION = 2
+
+# Minimum observations per model.
+MIN_POINTS_EXP = 3
+MIN_POINTS_BASS = 4
+MIN_POINTS_LOGISTIC = 5
+
+MAX_ITER = 200          # cold start
+MAX_ITER_WARM = 40      # warm start from the stored parameters
+TOLERANCE = 1e-10       # relative SSE improvement to stop
+
+# Below this many videos per worker, the logistic fit stays in-process.
+MIN_VIDEOS_PER_WORKER = 256
+
+
+def growth_path_for(zip_path: str) -> str:
+    stem = os.path.splitext(os.path.basename(zip_path))[0]
+    return os.path.join(CACHE_DIR, f"growth_{stem}.json")
+
+
+# ---------------------------------------------------------------------
+# Packing: days × videos -> videos × observations
+# ---------------------------------------------------------------------
+
+def _pack(panel: Panel, columns: np.ndarray):
+    """
+    Observed (day, views) pairs of the given columns, left-aligned:
+    returns t (days since first observation), v, mask – all videos ×
+    max_obs – plus the first observed date of each video.
+    """
+    views = panel.views[:, columns].T                # videos × days
+    present = ~np.isnan(views) & (views >= 0)
+    order = np.argsort(~present, axis=1, kind="stable")
+    v = np.take_along_axis(views, order, axis=1)
+    mask = np.take_along_axis(present, order, axis=1)
+    days = panel.dates.astype("datetime64[D]").astype(np.int64)
+    d = days[order]
+    n_max = max(int(mask.sum(axis=1).max(initial=0)), 1)
+    v, mask, d = v[:, :n_max], mask[:, :n_max], d[:, :n_max]
+    first = d[:, 0]
+    t = (d - first[:, None]).astype(float)
+    v = np.where(mask, v, np.nan)
+    t = np.where(mask, t, np.nan)
+    return t, v, mask, first.astype("datetime64[D]")
+
+
+def _lstsq_batched(X: np.ndarray, y: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Weighted least squares per row: X (c, n, k), y and 0/1 weights w (c, n)."""
+    Xw = X * w[..., None]
+    XtX = np.einsum("cnk,cnl->ckl", Xw, X)
+    Xty = np.einsum("cnk,cn->ck", Xw, np.nan_to_num(y))
+    k = X.shape[2]
+    ridge = 1e-12 * np.trace(XtX, axis1=1, axis2=2)[:, None, None] * np.eye(k) + 1e-300 * np.eye(k)
+    return np.linalg.solve(XtX + ridge, Xty[..., None])[..., 0]
+
+
+# ---------------------------------------------------------------------
+# Linear models
+# ---------------------------------------------------------------------
+
+def fit_exponential(t: np.ndarray, v: np.ndarray, mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """log V = log a + r t per video. Returns exp_a, exp_r, exp_r2."""
+    ok = mask & (v > 0)
+    logv = np.log(np.where(ok, v, 1.0))
+    tt = np.where(ok, t, 0.0)
+    X = np.stack([np.ones_like(tt), tt], axis=2)
+    beta = _lstsq_batched(X, logv, ok.astype(float))
+
+    n = ok.sum(axis=1)
+    fitted = beta[:, :1] + beta[:, 1:] * tt
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.sum(logv * ok, axis=1) / n
+        ss_res = np.sum(((logv - fitted) ** 2) * ok, axis=1)
+        ss_tot = np.sum(((logv - mean[:, None]) ** 2) * ok, axis=1)
+        r2 = np.where(ss_tot > 0, 1.0 - ss_res / ss_tot, np.nan)
+    bad = (n < MIN_POINTS_EXP) | (np.nanmax(np.where(ok, t, np.nan), axis=1, initial=0) <= 0)
+    a, r = np.exp(beta[:, 0]), beta[:, 1]
+    a[bad], r[bad], r2[bad] = np.nan, np.nan, np.nan
+    return {"exp_a": a, "exp_r": r, "exp_r2": r2}
+
+
+def fit_bass(t: np.ndarray, v: np.ndarray, mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Discrete Bass regression on consecutive observations:
+    (V_i - V_{i-1}) / (t_i - t_{i-1}) = b0 + b1 V_{i-1} + b2 V_{i-1}^2,
+    solved in units of each video's maximum views for conditioning.
+    Returns bass_m (market potential), bass_p (innovation), bass_q (imitation).
+    """
+    scale = np.nanmax(np.where(mask, v, np.nan), axis=1, initial=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    vs = v / scale[:, None]
+
+    prev, cur = vs[:, :-1], vs[:, 1:]
+    dt = t[:, 1:] - t[:, :-1]
+    ok = mask[:, 1:] & mask[:, :-1] & (dt > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(ok, (cur - prev) / dt, 0.0)
+    N = np.where(ok, prev, 0.0)
+    X = np.stack([np.ones_like(N), N, N * N], axis=2)
+    b = _lstsq_batched(X, rate, ok.astype(float))
+    b0, b1, b2 = b[:, 0], b[:, 1], b[:, 2]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        disc = b1 * b1 - 4.0 * b0 * b2
+        m = (-b1 - np.sqrt(disc)) / (2.0 * b2)
+        p = b0 / m
+        q = p + b1
+    bad = (ok.sum(axis=1) < MIN_POINTS_BASS - 1) | ~np.isfinite(m) | (m <= 0) | (p <= 0) | (q < 0)
+    m = m * scale
+    for arr in (m, p, q):
+        arr[bad] = np.nan
+    return {"bass_m": m, "bass_p": p, "bass_q": q}
+
+
+# ---------------------------------------------------------------------
+# Logistic (batched Levenberg-Marquardt)
+# ---------------------------------------------------------------------
+
+def _logistic(t, K, r, t0):
+    z = np.clip(-r[:, None] * (t - t0[:, None]), -700, 700)
+    s = 1.0 / (1.0 + np.exp(z))
+    return K[:, None] * s, s
+
+
+def _sse(t, y, w, P):
+    f, _ = _logistic(t, P[:, 0], P[:, 1], P[:, 2])
+    return np.sum(w * (np.nan_to_num(y) - np.nan_to_num(f)) ** 2, axis=1)
+
+
+def fit_logistic_chunk(t, y, w, P0, max_iter):
+    """
+    Levenberg-Marquardt for V = K / (1 + exp(-r (t - t0))) on a chunk of
+    videos. y must be scaled to O(1). Returns (params, sse, iterations).
+    Parameters stay in K > 0, r > 0 (steps leaving that region are rejected).
+    """
+    t = np.nan_to_num(t)
+    P = P0.copy()
+    lam = np.full(len(P), 1e-3)
+    sse = _sse(t, y, w, P)
+    active = np.ones(len(P), dtype=bool)
+    iters = np.zeros(len(P), dtype=np.int64)
+    eye = np.eye(3)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        a = np.flatnonzero(active)
+        Pa, ta, ya, wa = P[a], t[a], np.nan_to_num(y[a]), w[a]
+        f, s = _logistic(ta, Pa[:, 0], Pa[:, 1], Pa[:, 2])
+        ds = s * (1.0 - s)
+        dt = ta - Pa[:, 2:3]
+        J = np.stack([s, Pa[:, :1] * ds * dt, -Pa[:, :1] * ds * Pa[:, 1:2]], axis=2)
+        res = (ya - f) * wa
+        JtJ = np.einsum("cnk,cnl->ckl", J * wa[..., None], J)
+        g = np.einsum("cnk,cn->ck", J, res)
+        diag = np.einsum("ckk->ck", JtJ)[..., None] * eye + 1e-12 * eye
+        step = np.linalg.solve(JtJ + lam[a, None, None] * diag, g[..., None])[..., 0]
+
+        trial = Pa + step
+        valid = (trial[:, 0] > 0) & (trial[:, 1] > 0) & np.isfinite(trial).all(axis=1)
+        trial_sse = np.where(valid, _sse(ta, ya, wa, np.where(valid[:, None], trial, Pa)), np.inf)
+        better = trial_sse < sse[a]
+
+        improvement = np.where(better, (sse[a] - trial_sse) / np.maximum(sse[a], 1e-300), 0.0)
+        P[a[better]] = trial[better]
+        sse[a[better]] = trial_sse[better]
+        lam[a] = np.where(better, lam[a] / 10.0, lam[a] * 10.0)
+        iters[a] += 1
+
+        done = (better & (improvement < TOLERANCE)) | (lam[a] > 1e12)
+        active[a[done]] = False
+
+    return P, sse, iters
+
+
+def _fit_logistic_job(args):
+    return fit_logistic_chunk(*args)
+
+
+def fit_logistic(
+    t: np.ndarray,
+    v: np.ndarray,
+    mask: np.ndarray,
+    P0: Optional[np.ndarray] = None,
+    warm: Optional[np.ndarray] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Logistic fit per video. `P0` (videos × 3: K, r, t0 in real units)
+    gives starting values; rows of `warm` (bool) use MAX_ITER_WARM
+    iterations, the others MAX_ITER. Without P0 the start is
+    K = 1.5 × max, r = 0.1, t0 = last day.
+    """
+    c = len(v)
+    scale = np.nanmax(np.where(mask, v, np.nan), axis=1, initial=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    y = v / scale[:, None]
+    w = mask.astype(float)
+    t_last = np.nanmax(np.where(mask, t, np.nan), axis=1, initial=0)
+
+    start = np.column_stack([np.full(c, 1.5), np.full(c, 0.1), t_last])
+    if P0 is not None:
+        given = np.isfinite(P0).all(axis=1) & (P0[:, 0] > 0) & (P0[:, 1] > 0)
+        start[given] = np.column_stack([P0[given, 0] / scale[given], P0[given, 1], P0[given, 2]])
+    if warm is None:
+        warm = np.zeros(c, dtype=bool)
+
+    P = np.full((c, 3), np.nan)
+    sse = np.full(c, np.nan)
+    iters = np.zeros(c, dtype=np.int64)
+    fit_rows = np.flatnonzero(mask.sum(axis=1) >= MIN_POINTS_LOGISTIC)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    n_workers = max(1, min(workers, len(fit_rows) // MIN_VIDEOS_PER_WORKER))
+
+    # Warm and cold rows get separate jobs (different iteration budgets);
+    # a few jobs per worker even out chunks that converge at different speeds.
+    jobs, parts = [], []
+    for is_warm, max_iter in ((True, MAX_ITER_WARM), (False, MAX_ITER)):
+        rows = fit_rows[warm[fit_rows] == is_warm]
+        n_chunks = n_workers * 4 if n_workers > 1 else 1
+        for chunk in np.array_split(rows, min(n_chunks, max(len(rows), 1))):
+            if len(chunk):
+                parts.append(chunk)
+                jobs.append((t[chunk], y[chunk], w[chunk], start[chunk], max_iter))
+
+    if n_workers <= 1:
+        results = [_fit_logistic_job(job) for job in jobs]
+    else:
+        with process_pool(n_workers) as pool:
+            results = list(pool.map(_fit_logistic_job, jobs))
+
+    for rows, (P_rows, sse_rows, it_rows) in zip(parts, results):
+        P[rows], sse[rows], iters[rows] = P_rows, sse_rows, it_rows
+
+    n = mask.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.sqrt(sse / n) * scale
+    return {
+        "log_K": P[:, 0] * scale,
+        "log_r": P[:, 1],
+        "log_t0": P[:, 2],
+        "log_rmse": rmse,
+        "log_iters": iters,
+    }
+
+
+# ---------------------------------------------------------------------
+# Parameter table
+# ---------------------------------------------------------------------
+
+PARAMS = (
+    "exp_a", "exp_r", "exp_r2",
+    "bass_m", "bass_p", "bass_q",
+    "log_K", "log_r", "log_t0", "log_rmse", "log_iters",
+)
+
+
+def empty_table(store: Optional[SnapshotStore] = None) -> dict:
+    return {
+        "version": GROWTH_VERSION,
+        "source": os.path.basename(store.source) if store is not None else None,
+        "days": days_crc(store, None) if store is not None else None,
+        "last_date": None,
+        "entries": {},
+    }
+
+
+def load_growth_table(path: str, store: Optional[SnapshotStore] = None) -> dict:
+    """
+    Load a parameter table, or an empty one if missing, built from
+    another archive, or built from days of `store` that have changed since.
+    """
+    if not os.path.exists(path):
+        return empty_table(store)
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("version") != GROWTH_VERSION:
+        return empty_table(store)
+    if store is not None and (
+        table.get("source") != os.path.basename(store.source)
+        or table.get("days") != days_crc(store, table.get("last_date"))
+    ):
+        return empty_table(store)
+    return table
+
+
+def save_growth_table(table: dict, path: str) -> None:
+    """Write the table (atomically, via a temporary file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _clean(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def update_growth_table(panel: Panel, table: dict, workers: Optional[int] = None) -> int:
+    """
+    Refit every video of the panel that has observations after
+    table['last_date'] (all videos for an empty table). Videos whose
+    stored fit started on the same first date are warm-started.
+    Returns the number of refitted videos.
+    """
+    if not len(panel.dates):
+        return 0
+    entries = table["entries"]
+    last = table["last_date"]
+    if last is None:
+        columns = np.flatnonzero(panel.present.any(axis=0))
+    else:
+        new_days = panel.dates > np.datetime64(last, "D")
+        columns = np.flatnonzero(panel.present[new_days].any(axis=0))
+
+    if len(columns):
+        with span("growth.fit") as sp:
+            t, v, mask, first = _pack(panel, columns)
+            ids = panel.video_ids[columns].tolist()
+            first_str = [str(d) for d in first]
+
+            P0 = np.full((len(ids), 3), np.nan)
+            warm = np.zeros(len(ids), dtype=bool)
+            for i, (vid, fd) in enumerate(zip(ids, first_str)):
+                e = entries.get(vid)
+                if e is not None and e.get("first_date") == fd and e.get("log_K") is not None:
+                    P0[i] = (e["log_K"], e["log_r"], e["log_t0"])
+                    warm[i] = True
+
+            results = {}
+            results.update(fit_exponential(t, v, mask))
+            results.update(fit_bass(t, v, mask))
+            results.update(fit_logistic(t, v, mask, P0, warm, workers))
+            n_obs = mask.sum(axis=1)
+
+            for i, vid in enumerate(ids):
+                entries[vid] = {
+                    "title": panel.title_of(vid),
+                    "first_date": first_str[i],
+                    "n_obs": int(n_obs[i]),
+                    **{name: _clean(results[name][i]) for name in PARAMS},
+                }
+            sp.count(videos=len(ids), warm=int(warm.sum()), records=int(n_obs.sum()))
+
+    dated = panel.dates[~np.isnat(panel.dates)]
+    if len(dated):
+        table["last_date"] = np.datetime_as_string(dated.max(), unit="D")
+    return len(columns)
+
+
+def growth_table_for(
+    panel: Panel,
+    zip_path: str,
+    kind: str = "youtube",
+    workers: Optional[int] = None,
+) -> Tuple[dict, int]:
+    """
+    Load, update and save the parameter table of an archive (`panel` is
+    its panel, e.g. panel.load_panel(zip_path, kind)). Returns (table, refitted).
+    """
+    path = growth_path_for(zip_path)
+    store = get_store(zip_path, kind=kind)
+    table = load_growth_table(path, store)
+    refitted = update_growth_table(panel, table, workers)
+    table["days"] = days_crc(store, table["last_date"])
+    if refitted:
+        save_growth_table(table, path)
+    return table, refitted
+
+
+def to_frame(table: dict) -> pd.DataFrame:
+    """The table as a DataFrame indexed by video id (for filtering / sorting)."""
+    df = pd.DataFrame.from_dict(table["entries"], orient="index")
+    df.index.name = "video_id"
+    return df
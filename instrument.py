@@ -0,0 +1,238 @@
+"""
+instrument.py – lightweight timing spans and counters
+
+Usage in the analysis code:
+
+    from instrument import span
+
+    with span("store.decode", archive=name) as sp:
+        chunks = decode(...)
+        sp.count(records=n_rows, bytes=n_bytes)
+
+Spans nest (each event records its parent span) and carry counters such
+as records and bytes. Every finished span is passed to the active sink
+as a dict:
+
+    {"type": "span", "name": "store.decode", "parent": "store.build",
+     "start": 1700000000.12, "duration_s": 0.084, "pid": 1234,
+     "attrs": {"archive": "youtube_top100.zip"},
+     "counters": {"records": 36500, "bytes": 5120000}}
+
+Instrumentation is off by default. While it is off, span() returns one
+shared no-op object, so an instrumented block costs a function call and
+a flag check. Turn it on with enable(sink) or with the INSTRUMENT
+environment variable:
+
+    INSTRUMENT=1             JSON lines on stderr
+    INSTRUMENT=summary       one table per stage at exit
+    INSTRUMENT=<path>.jsonl  JSON lines appended to a file
+
+A sink is anything with emit(event: dict) and close(); JsonLinesSink,
+MemorySink and SummarySink cover the common cases.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+_ENABLED = False
+_SINK = None
+_LOCAL = threading.local()
+
+
+# ---------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------
+
+class JsonLinesSink:
+    """Write one JSON object per event to a stream or (appended) file."""
+
+    def __init__(self, target=None):
+        if isinstance(target, str):
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            self._stream = open(target, "a", encoding="utf-8")
+            self._owned = True
+        else:
+            self._stream = target or sys.stderr
+            self._owned = False
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict) -> None:
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def close(self) -> None:
+        if self._owned:
+            self._stream.close()
+
+
+class MemorySink:
+    """Keep all events in a list (for tests and ad-hoc inspection)."""
+
+    def __init__(self):
+        self.events: List[dict] = []
+
+    def emit(self, event: dict) -> None:
+        self.events.append(event)
+
+    def close(self) -> None:
+        pass
+
+
+class SummarySink:
+    """Aggregate per span name and print a table when closed."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.totals: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict) -> None:
+        with self._lock:
+            entry = self.totals.setdefault(
+                event["name"], {"calls": 0, "seconds": 0.0, "counters": defaultdict(int)}
+            )
+            entry["calls"] += 1
+            entry["seconds"] += event["duration_s"]
+            for key, value in event["counters"].items():
+                entry["counters"][key] += value
+
+    def close(self) -> None:
+        with self._lock:
+            totals = dict(self.totals)
+        if not totals:
+            return
+        print(f"{'stage':<32}{'calls':>7}{'seconds':>11}  counters", file=self.stream)
+        for name, entry in sorted(totals.items(), key=lambda kv: -kv[1]["seconds"]):
+            counters = ", ".join(f"{k}={v}" for k, v in sorted(entry["counters"].items()))
+            print(f"{name:<32}{entry['calls']:>7}{entry['seconds']:>11.4f}  {counters}", file=self.stream)
+
+
+# ---------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------
+
+class _NullSpan:
+    """Returned by span() while instrumentation is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, **counters) -> None:
+        pass
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "counters", "parent", "start", "_t0")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.counters: Dict[str, int] = {}
+        self.parent: Optional[str] = None
+
+    def __enter__(self):
+        stack = getattr(_LOCAL, "stack", None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        _LOCAL.stack.pop()
+        event = {
+            "type": "span",
+            "name": self.name,
+            "parent": self.parent,
+            "start": self.start,
+            "duration_s": round(duration, 6),
+            "pid": os.getpid(),
+            "attrs": self.attrs,
+            "counters": self.counters,
+        }
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        sink = _SINK
+        if sink is not None:
+            sink.emit(event)
+        return False
+
+    def count(self, **counters) -> None:
+        """Add to this span's counters, e.g. count(records=100, bytes=4096)."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + int(value)
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs):
+    """Time a block as stage `name` (a no-op while instrumentation is off)."""
+    if not _ENABLED:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+
+def enable(sink=None) -> None:
+    """Turn instrumentation on; events go to `sink` (default: JSON lines on stderr)."""
+    global _ENABLED, _SINK
+    if _SINK is not None and _SINK is not sink:
+        _SINK.close()
+    _SINK = sink if sink is not None else JsonLinesSink()
+    _ENABLED = True
+
+
+def disable() -> None:
+    """Turn instrumentation off and close the sink."""
+    global _ENABLED, _SINK
+    _ENABLED = False
+    if _SINK is not None:
+        _SINK.close()
+    _SINK = None
+
+
+def configure_from_env(var: str = "INSTRUMENT") -> None:
+    """Enable instrumentation according to the INSTRUMENT variable (see module docstring)."""
+    value = os.environ.get(var, "").strip()
+    if not value or value == "0":
+        return
+    if value == "1":
+        enable(JsonLinesSink())
+    elif value == "summary":
+        enable(SummarySink())
+    else:
+        enable(JsonLinesSink(value))
+    atexit.register(disable)
+
+
+configure_from_env()
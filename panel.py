@@ -0,0 +1,158 @@
+"""
+panel.py – days × videos matrices for the time-series analyses
+
+Assignments 1 and 2 look at one song at a time over all days. On the
+row-per-entry data that means filtering the whole table once per song.
+A Panel lays the same data out as dense 2-D arrays
+
+    views[day, video], likes[day, video], dislikes[day, video]
+
+(NaN where the video is not in the chart that day or the counter is
+missing), with `column` mapping video_id -> column. A song's series is
+then a column slice, and "top-k on day d" is one argsort of a row.
+
+Columns are the store's video dictionary codes, so building a panel is
+a single scatter of the store columns – no Python loop over rows.
+"""
+
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from instrument import span
+from snapshot_store import SnapshotStore, get_store
+
+METRICS = ("views", "likes", "dislikes", "diff")
+
+
+@dataclass
+class Panel:
+    """Dense days × videos view of one archive (see module docstring)."""
+    dates: np.ndarray       # datetime64[D], one per day (row)
+    video_ids: np.ndarray   # str, one per column
+    titles: np.ndarray      # str, title of each video when first seen
+    present: np.ndarray     # bool, days × videos: video charted that day
+    views: np.ndarray       # float64, days × videos, NaN = missing
+    likes: np.ndarray
+    dislikes: np.ndarray
+    column: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.column:
+            self.column = {vid: j for j, vid in enumerate(self.video_ids.tolist())}
+
+    @property
+    def shape(self):
+        return self.present.shape
+
+    @property
+    def diff(self) -> np.ndarray:
+        """likes - dislikes, days × videos."""
+        return self.likes - self.dislikes
+
+    def matrix(self, metric: str) -> np.ndarray:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+        return self.diff if metric == "diff" else getattr(self, metric)
+
+    def series(self, video_id: str, metric: str = "views") -> np.ndarray:
+        """Values of one video over all days (NaN where not charted)."""
+        j = self.column[video_id]
+        if metric == "diff":
+            return self.likes[:, j] - self.dislikes[:, j]
+        return self.matrix(metric)[:, j]
+
+    def title_of(self, video_id: str) -> str:
+        return str(self.titles[self.column[video_id]])
+
+    def columns_for_titles(self, titles: Sequence[str]) -> np.ndarray:
+        """Column indices of all videos whose title is in `titles`."""
+        return np.flatnonzero(np.isin(self.titles, list(titles)))
+
+    def top_k(self, metric: str = "views", day: int = 0, k: int = 10) -> List[str]:
+        """Video ids with the k highest values of `metric` on row `day`."""
+        row = self.matrix(metric)[day]
+        valid = np.flatnonzero(~np.isnan(row))
+        best = valid[np.argsort(-row[valid], kind="stable")[:k]]
+        return self.video_ids[best].tolist()
+
+    def to_frame(self, metric: str = "views", columns: Sequence[int] = None) -> pd.DataFrame:
+        """
+        Wide DataFrame: index = dates, one column per video (labelled by
+        video id). `columns` restricts it to the given column indices.
+        """
+        values = self.matrix(metric)
+        cols = np.arange(values.shape[1]) if columns is None else np.asarray(columns)
+        return pd.DataFrame(
+            values[:, cols],
+            index=pd.Index(self.dates, name="date"),
+            columns=self.video_ids[cols],
+        )
+
+
+def _counts(values: np.ndarray) -> np.ndarray:
+    return np.where(values >= 0, values, np.nan)
+
+
+def build_panel(store: SnapshotStore) -> Panel:
+    """Scatter the store's rows into days × videos matrices."""
+    with span("panel.build") as sp:
+        panel = _build_panel(store)
+        sp.count(records=store.num_rows)
+    return panel
+
+
+def _build_panel(store: SnapshotStore) -> Panel:
+    num_days, num_videos = store.num_days, len(store.item_ids)
+    day_of_row = np.repeat(np.arange(num_days), np.diff(store.day_offsets))
+    keep = store.item >= 0
+    rows, cols = day_of_row[keep], store.item[keep]
+
+    def scatter(values):
+        m = np.full((num_days, num_videos), np.nan)
+        m[rows, cols] = _counts(values[keep])
+        return m
+
+    present = np.zeros((num_days, num_videos), dtype=bool)
+    present[rows, cols] = True
+
+    # title of each video = title of its first row
+    _, first = np.unique(cols, return_index=True)
+    titles = np.empty(num_videos, dtype=store.titles.dtype)
+    titles[cols[first]] = store.titles[store.title[keep][first]]
+
+    return Panel(
+        dates=store.day_dates,
+        video_ids=store.item_ids,
+        titles=titles,
+        present=present,
+        views=scatter(store.views),
+        likes=scatter(store.likes),
+        dislikes=scatter(store.dislikes),
+    )
+
+
+# (abs zip path, kind) -> (weak reference to the store it was built from, panel)
+_PANELS: Dict[tuple, tuple] = {}
+
+
+def load_panel(zip_path: str, kind: str = "youtube") -> Panel:
+    """
+    Panel of a YouTube-style archive, via the shared session cache.
+
+    The panel is built once per store: as long as the session cache
+    returns the same store object, later calls return the same panel.
+    Treat it as read-only.
+    """
+    store = get_store(zip_path, kind=kind)
+    key = (os.path.abspath(zip_path), kind)
+    cached = _PANELS.get(key)
+    if cached is not None and cached[0]() is store:
+        return cached[1]
+    panel = build_panel(store)
+    _PANELS[key] = (weakref.ref(store), panel)
+    return panel
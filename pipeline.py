@@ -0,0 +1,231 @@
+"""
+pipeline.py – run the assignments as one dependency graph
+
+Instead of running s1.py, ass2.py, s3.py and a5_analyze.py as separate
+processes (each decoding the same archives again), this entry point
+describes every part as a stage with dependencies:
+
+    load.youtube ──> transform.youtube_panel ──> s1.1a, ass2.*, s3.powerlaw
+         │                                       s3.3a
+         └──────┬──> transform.mapping ──> s3.3d
+    load.spotify┘
+    load.radio ──> transform.radio_panels ──> s1.1b
+    load.youtube ──> metrics.velocity
+    load.* ──> metrics.turnover
+    a5.analyze
+
+Stages run in a thread pool as soon as their dependencies are done, so
+independent stages run in parallel. They share one process, so each
+archive is decoded once (snapshot_store.get_store) and each panel is
+built once (panel.load_panel). matplotlib is not thread-safe, so all
+drawing in this process is serialised by one lock: stages that draw
+with pyplot take PYPLOT_LOCK and run one at a time, and render_farm
+takes the same lock when a batch is too small for its process pool and
+is drawn in the stage's own thread. Figures are saved to files, never
+shown.
+
+Usage:
+
+    python pipeline.py                 # everything
+    python pipeline.py s3 ass2         # s3.* and ass2.*, plus their dependencies
+    python pipeline.py --list
+    python pipeline.py --jobs 1        # run stages one after another
+
+A failed stage is reported and its dependents are skipped; the other
+stages still run. The exit code is 1 if any stage failed.
+"""
+
+import os
+import sys
+import time
+import argparse
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import a5_analyze  # noqa: E402
+import ass2  # noqa: E402
+import chart_turnover  # noqa: E402
+import datasets  # noqa: E402
+import s1  # noqa: E402
+import s3  # noqa: E402
+import velocity_metrics  # noqa: E402
+from instrument import span  # noqa: E402
+from panel import load_panel  # noqa: E402
+from render_farm import DRAW_LOCK  # noqa: E402
+
+FIGURES_DIR = "figures"
+
+# radio charts from the dataset registry (datasets.json)
+RADIO = datasets.select(chart="radio")
+
+# shared with render_farm's in-process rendering (see module docstring)
+PYPLOT_LOCK = DRAW_LOCK
+
+
+class Stage(NamedTuple):
+    name: str
+    deps: Tuple[str, ...]
+    run: Callable[[], object]
+    uses_pyplot: bool = False
+
+
+def _with_pyplot(fn: Callable[[], object]) -> Callable[[], object]:
+    def run():
+        with PYPLOT_LOCK:
+            return fn()
+    return run
+
+
+def _mapping():
+    yt, sp, dates = s3._load_common_days()
+    return s3._build_spotify_youtube_mapping(yt, sp, dates)
+
+
+STAGES: List[Stage] = [
+    # load
+    Stage("load.youtube", (), lambda: datasets.load_store(s3.YOUTUBE)),
+    Stage("load.spotify", (), lambda: datasets.load_store(s3.SPOTIFY)),
+    Stage("load.radio", (), lambda: datasets.load_stores(RADIO)),
+    # transform
+    Stage("transform.youtube_panel", ("load.youtube",), lambda: load_panel(s3.YOUTUBE_ZIP, s3.YOUTUBE.kind)),
+    Stage("transform.radio_panels", ("load.radio",),
+          lambda: [load_panel(ds.path, ds.kind) for ds in RADIO]),
+    Stage("transform.mapping", ("load.youtube", "load.spotify"), _mapping),
+    # analyze + render
+    Stage("s1.1a", ("transform.youtube_panel",),
+          lambda: s1.run_assignment_1a(output_dir=FIGURES_DIR), uses_pyplot=True),
+    Stage("s1.1b", ("transform.radio_panels",),
+          lambda: s1.run_assignment_1b(output_dir=FIGURES_DIR), uses_pyplot=True),
+    Stage("ass2.views", ("transform.youtube_panel",), ass2.run_views_plot, uses_pyplot=True),
+    Stage("ass2.growth", ("transform.youtube_panel",), ass2.run_growth_report),
+    Stage("s3.3a", (), lambda: s3.plot_viewcount_distributions(num_days=5)),
+    Stage("s3.powerlaw", ("transform.youtube_panel",), s3.fit_viewcount_power_laws),
+    Stage("s3.3d", ("transform.mapping",), lambda: s3.compare_spotify_youtube_rankings(num_days=5)),
+    Stage("metrics.velocity", ("load.youtube",), lambda: velocity_metrics.main([])),
+    Stage("metrics.turnover", ("load.youtube", "load.spotify", "load.radio"),
+          lambda: chart_turnover.main([])),
+    Stage("a5.analyze", (), a5_analyze.main, uses_pyplot=True),
+]
+
+
+# ---------------------------------------------------------------------
+# Graph
+# ---------------------------------------------------------------------
+
+def stage_map(stages: Sequence[Stage] = STAGES) -> Dict[str, Stage]:
+    by_name = {st.name: st for st in stages}
+    for st in stages:
+        for dep in st.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage {st.name!r} depends on unknown stage {dep!r}")
+    return by_name
+
+
+def select(names: Sequence[str], stages: Sequence[Stage] = STAGES) -> List[str]:
+    """
+    Stages matching `names` plus everything they depend on, in
+    definition order. A name selects the stage of that name and all
+    stages below it ('s3' selects 's3.3a', 's3.powerlaw', 's3.3d').
+    """
+    by_name = stage_map(stages)
+    if not names:
+        return list(by_name)
+
+    wanted = set()
+    for name in names:
+        matches = [n for n in by_name if n == name or n.startswith(name + ".")]
+        if not matches:
+            raise ValueError(f"Unknown stage {name!r}; see --list")
+        wanted.update(matches)
+
+    todo = list(wanted)
+    while todo:
+        for dep in by_name[todo.pop()].deps:
+            if dep not in wanted:
+                wanted.add(dep)
+                todo.append(dep)
+    return [n for n in by_name if n in wanted]
+
+
+def run_stages(
+    names: Sequence[str],
+    jobs: int = 4,
+    stages: Sequence[Stage] = STAGES,
+) -> Dict[str, str]:
+    """
+    Run the named stages (dependencies must be included, see select())
+    in dependency order with up to `jobs` stages at a time.
+
+    Returns:
+        stage name -> 'ok' | 'failed' | 'skipped'
+    """
+    by_name = stage_map(stages)
+    pending = {n: set(by_name[n].deps) & set(names) for n in names}
+    status: Dict[str, str] = {}
+
+    def call(st: Stage):
+        run = _with_pyplot(st.run) if st.uses_pyplot else st.run
+        start = time.perf_counter()
+        with span(f"pipeline.{st.name}"):
+            run()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        running = {}
+        while pending or running:
+            for n in [n for n, deps in pending.items() if not deps]:
+                del pending[n]
+                print(f"[pipeline] start {n}")
+                running[pool.submit(call, by_name[n])] = n
+
+            if not running:
+                break  # only stages with failed dependencies are left
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                n = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception:
+                    status[n] = "failed"
+                    print(f"[pipeline] FAILED {n}:\n{traceback.format_exc()}", file=sys.stderr)
+                    continue
+                status[n] = "ok"
+                print(f"[pipeline] done  {n} ({seconds:.2f}s)")
+                for deps in pending.values():
+                    deps.discard(n)
+
+    for n in pending:
+        status[n] = "skipped"
+    return status
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the assignment stages as one pipeline.")
+    parser.add_argument("stages", nargs="*", help="stages or groups to run (default: all)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="stages to run at the same time")
+    parser.add_argument("--list", action="store_true", help="list the stages and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for st in STAGES:
+            deps = ", ".join(st.deps) or "-"
+            print(f"{st.name:<26} after: {deps}")
+        return 0
+
+    names = select(args.stages)
+    start = time.perf_counter()
+    status = run_stages(names, jobs=args.jobs)
+    print(f"\n[pipeline] {len(names)} stages in {time.perf_counter() - start:.2f}s")
+    for n in names:
+        print(f"  {status.get(n, 'skipped'):<8} {n}")
+    return 0 if all(status.get(n) == "ok" for n in names) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
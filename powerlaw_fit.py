@@ -0,0 +1,316 @@
+"""
+powerlaw_fit.py – maximum-likelihood power-law fits for popularity data
+
+The rank-popularity plots (a5_analyze, s3 part 3a) only show by eye
+whether view counts follow a power law. This module fits one, following
+Clauset, Shalizi & Newman (2009), "Power-law distributions in empirical
+data":
+
+- For every candidate lower bound xmin, the continuous MLE of the
+  exponent on the tail x >= xmin is
+
+      alpha = 1 + n / sum(log(x_i / xmin))
+
+  and the Kolmogorov-Smirnov distance D between the tail and the fitted
+  CDF is computed. The xmin with the smallest D is chosen.
+- The fitted tail is compared against an exponential and a lognormal
+  distribution (both truncated at the same xmin) with Vuong's
+  likelihood-ratio test: R > 0 favours the power law, and p says
+  whether the sign of R is significant.
+
+Everything works on a rows × values matrix with NaN padding – e.g. the
+days × videos view matrix of a panel.Panel – so all daily snapshots of
+an archive are fitted in one batch. View counts are large, so the
+continuous approximation is used throughout; the Zipf (rank) exponent
+of a fit is 1 / (alpha - 1).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+# Minimum number of values in the tail for a candidate xmin.
+MIN_TAIL = 10
+
+# At most this many xmin candidates per row (evenly spaced over the
+# sorted values); every value is a candidate when there are fewer.
+MAX_CANDIDATES = 200
+
+# Upper bound on the size of the rows × candidates × values temporaries.
+MAX_ELEMENTS = 1 << 23
+
+
+# ---------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------
+
+def _as_rows(x) -> np.ndarray:
+    """2-D float matrix; values <= 0 (and missing counters) become NaN."""
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    return np.where(x > 0, x, np.nan)
+
+
+def _log_erfc(z: np.ndarray) -> np.ndarray:
+    """
+    log(erfc(z)), stable for large z (Chebyshev fit from Numerical
+    Recipes, fractional error < 1.2e-7). numpy has no erfc and scipy
+    is not a dependency.
+    """
+    z = np.asarray(z, dtype=float)
+    a = np.abs(z)
+    t = 1.0 / (1.0 + 0.5 * a)
+    poly = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    log_pos = np.log(t) - a * a + poly
+    # erfc(-a) = 2 - erfc(a)
+    return np.where(z >= 0, log_pos, np.log(2.0 - np.exp(log_pos)))
+
+
+def _log_norm_sf(z: np.ndarray) -> np.ndarray:
+    """log(1 - Phi(z)) of the standard normal distribution."""
+    return _log_erfc(z / np.sqrt(2.0)) - np.log(2.0)
+
+
+# ---------------------------------------------------------------------
+# Power-law fit
+# ---------------------------------------------------------------------
+
+@dataclass
+class PowerLawFit:
+    """Best fit per row; NaN where a row has fewer than MIN_TAIL values."""
+    alpha: np.ndarray    # exponent of p(x) ~ x^-alpha
+    xmin: np.ndarray     # lower bound of the power-law tail
+    n_tail: np.ndarray   # number of values >= xmin
+    ks: np.ndarray       # KS distance of the tail to the fit
+
+    @property
+    def zipf_exponent(self) -> np.ndarray:
+        """Exponent s of the rank plot, views(rank) ~ rank^-s."""
+        return 1.0 / (self.alpha - 1.0)
+
+    def __len__(self) -> int:
+        return len(self.alpha)
+
+
+def _sorted_rows(x: np.ndarray):
+    """Sort rows ascending (NaN last), drop all-NaN columns, count values."""
+    xs = np.sort(x, axis=1)
+    nv = np.sum(~np.isnan(xs), axis=1)
+    return xs[:, : max(int(nv.max(initial=0)), 1)], nv
+
+
+def _candidates(xs: np.ndarray, nv: np.ndarray, min_tail: int, max_candidates: int) -> np.ndarray:
+    """
+    Candidate tail start indices, rows × C. Each index is moved to the
+    first occurrence of its value, so a tail always holds all x >= xmin.
+    """
+    rows, n = xs.shape
+    last = np.maximum(nv - min_tail, 0)
+    c = int(min(max_candidates, last.max(initial=0) + 1))
+    frac = np.linspace(0.0, 1.0, c)
+    k = np.floor(last[:, None] * frac[None, :]).astype(np.int64)
+
+    pos = np.arange(n)
+    starts = np.ones((rows, n), dtype=bool)
+    starts[:, 1:] = xs[:, 1:] != xs[:, :-1]
+    first = np.maximum.accumulate(np.where(starts, pos, 0), axis=1)
+    return np.take_along_axis(first, k, axis=1)
+
+
+def _fit_chunk(xs, nv, k):
+    """alpha and KS distance for every candidate start in k (rows × C)."""
+    logs = np.log(xs)
+    cum = np.zeros((xs.shape[0], xs.shape[1] + 1))
+    cum[:, 1:] = np.nancumsum(logs, axis=1)
+    total = cum[np.arange(len(xs)), nv]
+
+    n_tail = nv[:, None] - k
+    xmin = np.take_along_axis(xs, k, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = (total[:, None] - np.take_along_axis(cum, k, axis=1)) - n_tail * np.log(xmin)
+        alpha = 1.0 + n_tail / denom
+
+        j = np.arange(xs.shape[1])[None, None, :]
+        in_tail = (j >= k[..., None]) & (j < nv[:, None, None])
+        fitted = 1.0 - (xs[:, None, :] / xmin[..., None]) ** (1.0 - alpha[..., None])
+        rank = (j - k[..., None]) / n_tail[..., None]
+        step = 1.0 / n_tail[..., None]
+        gap = np.maximum(fitted - rank, rank + step - fitted)
+        ks = np.max(np.where(in_tail, gap, -np.inf), axis=2)
+
+    bad = ~np.isfinite(alpha) | (alpha <= 1.0)
+    ks[bad] = np.inf
+    return alpha, xmin, n_tail, ks
+
+
+def fit_power_law(
+    x,
+    min_tail: int = MIN_TAIL,
+    max_candidates: int = MAX_CANDIDATES,
+) -> PowerLawFit:
+    """
+    Fit a power-law tail to every row of `x` (rows × values, NaN = no
+    value; a 1-D input is one row). For each row, the xmin with the
+    smallest KS distance among the candidates is chosen.
+    """
+    xs, nv = _sorted_rows(_as_rows(x))
+    rows = len(xs)
+    out = PowerLawFit(
+        alpha=np.full(rows, np.nan),
+        xmin=np.full(rows, np.nan),
+        n_tail=np.zeros(rows, dtype=np.int64),
+        ks=np.full(rows, np.nan),
+    )
+    ok = np.flatnonzero(nv >= min_tail)
+    if not len(ok):
+        return out
+
+    k = _candidates(xs[ok], nv[ok], min_tail, max_candidates)
+    n = xs.shape[1]
+    row_step = max(1, MAX_ELEMENTS // (k.shape[1] * n))
+    cand_step = max(1, MAX_ELEMENTS // n)
+    for s in range(0, len(ok), row_step):
+        rows_idx = ok[s:s + row_step]
+        best_ks = np.full(len(rows_idx), np.inf)
+        # long rows: go through the candidates in chunks, keeping the best
+        width = max(1, cand_step // len(rows_idx))
+        for c in range(0, k.shape[1], width):
+            kc = k[s:s + row_step, c:c + width]
+            alpha, xmin, n_tail, ks = _fit_chunk(xs[rows_idx], nv[rows_idx], kc)
+            best = np.argmin(ks, axis=1)[:, None]
+            ks_best = np.take_along_axis(ks, best, axis=1)[:, 0]
+            better = ks_best < best_ks
+            idx = rows_idx[better]
+            best_ks[better] = ks_best[better]
+            out.alpha[idx] = np.take_along_axis(alpha, best, axis=1)[better, 0]
+            out.xmin[idx] = np.take_along_axis(xmin, best, axis=1)[better, 0]
+            out.n_tail[idx] = np.take_along_axis(n_tail, best, axis=1)[better, 0]
+            out.ks[idx] = ks_best[better]
+    return out
+
+
+# ---------------------------------------------------------------------
+# Alternatives and Vuong's test
+# ---------------------------------------------------------------------
+
+class Comparison(NamedTuple):
+    """Vuong test per row: R > 0 favours the power law, p = significance of the sign."""
+    R: np.ndarray   # normalized log-likelihood ratio
+    p: np.ndarray
+
+
+def _tail(x: np.ndarray, fit: PowerLawFit) -> np.ndarray:
+    """Values of each row's fitted tail (NaN elsewhere)."""
+    return np.where(x >= fit.xmin[:, None], x, np.nan)
+
+
+def _powerlaw_loglik(t: np.ndarray, fit: PowerLawFit) -> np.ndarray:
+    a, xmin = fit.alpha[:, None], fit.xmin[:, None]
+    return np.log(a - 1.0) - np.log(xmin) - a * np.log(t / xmin)
+
+
+def _exponential_loglik(t: np.ndarray, fit: PowerLawFit) -> np.ndarray:
+    """Exponential truncated at xmin; lambda = 1 / mean(x - xmin)."""
+    xmin = fit.xmin[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lam = 1.0 / np.nanmean(t - xmin, axis=1, keepdims=True)
+    return np.log(lam) - lam * (t - xmin)
+
+
+def _lognormal_loglik_from_stats(mu, sigma, n, s1, s2, log_xmin):
+    """Truncated-lognormal log-likelihood from the sufficient statistics."""
+    z = (log_xmin - mu) / sigma
+    sq = s2 - 2.0 * mu * s1 + n * mu * mu
+    return -s1 - n * np.log(sigma) - 0.5 * n * np.log(2 * np.pi) - sq / (2 * sigma ** 2) - n * _log_norm_sf(z)
+
+
+def fit_lognormal_tail(t: np.ndarray, xmin: np.ndarray, rounds: int = 12, grid: int = 21):
+    """
+    MLE (mu, sigma) of a lognormal truncated at xmin, per row of the
+    tail matrix t. The likelihood only depends on n, sum(log x) and
+    sum(log x ** 2), so all rows are optimized together by a grid
+    search that zooms in on the best point each round.
+    """
+    logs = np.log(t)
+    n = np.sum(~np.isnan(logs), axis=1)
+    s1 = np.nansum(logs, axis=1)
+    s2 = np.nansum(logs * logs, axis=1)
+    log_xmin = np.log(xmin)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m0 = s1 / n
+        sd0 = np.sqrt(np.maximum(s2 / n - m0 * m0, 1e-12))
+    mu_c, log_sigma_c = m0, np.log(sd0)
+    mu_w, log_sigma_w = 10.0 * sd0, np.full(len(n), np.log(20.0))
+
+    offsets = np.linspace(-1.0, 1.0, grid)
+    for _ in range(rounds):
+        shape = (len(n), grid, grid)
+        mu = np.broadcast_to(mu_c[:, None, None] + mu_w[:, None, None] * offsets[None, :, None], shape)
+        sigma = np.broadcast_to(
+            np.exp(log_sigma_c[:, None, None] + log_sigma_w[:, None, None] * offsets[None, None, :]), shape
+        )
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            ll = _lognormal_loglik_from_stats(
+                mu, sigma, n[:, None, None], s1[:, None, None], s2[:, None, None], log_xmin[:, None, None]
+            )
+        ll = np.where(np.isfinite(ll), ll, -np.inf).reshape(len(n), -1)
+        best = np.argmax(ll, axis=1)
+        mu_c = np.take_along_axis(mu.reshape(len(n), -1), best[:, None], axis=1)[:, 0]
+        log_sigma_c = np.log(np.take_along_axis(sigma.reshape(len(n), -1), best[:, None], axis=1)[:, 0])
+        mu_w, log_sigma_w = mu_w / 3.0, log_sigma_w / 3.0
+    return mu_c, np.exp(log_sigma_c)
+
+
+def _lognormal_loglik(t: np.ndarray, fit: PowerLawFit) -> np.ndarray:
+    mu, sigma = fit_lognormal_tail(t, fit.xmin)
+    mu, sigma = mu[:, None], sigma[:, None]
+    z = (np.log(fit.xmin)[:, None] - mu) / sigma
+    return (
+        -np.log(t) - np.log(sigma) - 0.5 * np.log(2 * np.pi)
+        - (np.log(t) - mu) ** 2 / (2 * sigma ** 2) - _log_norm_sf(z)
+    )
+
+
+ALTERNATIVES = {
+    "exponential": _exponential_loglik,
+    "lognormal": _lognormal_loglik,
+}
+
+
+def vuong(l1: np.ndarray, l2: np.ndarray) -> Comparison:
+    """Vuong's test on per-observation log-likelihoods (rows × values, NaN padded)."""
+    d = l1 - l2
+    n = np.sum(~np.isnan(d), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nansum(d, axis=1) / n
+        sd = np.sqrt(np.nansum((d - mean[:, None]) ** 2, axis=1) / n)
+        R = np.sqrt(n) * mean / sd
+        p = np.exp(_log_erfc(np.abs(R) / np.sqrt(2.0)))
+    R[(n < 2) | (sd == 0)] = np.nan
+    p[np.isnan(R)] = np.nan
+    return Comparison(R, p)
+
+
+def compare_alternatives(x, fit: PowerLawFit) -> Dict[str, Comparison]:
+    """Compare each row's power-law tail with the ALTERNATIVES on the same tail."""
+    t = _tail(_as_rows(x), fit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        l_pl = _powerlaw_loglik(t, fit)
+        return {name: vuong(l_pl, loglik(t, fit)) for name, loglik in ALTERNATIVES.items()}
+
+
+def describe(fit: PowerLawFit, comparisons: Dict[str, Comparison], i: int = 0) -> str:
+    """One-line summary of row i, for printing."""
+    parts = [
+        f"alpha={fit.alpha[i]:.3f}",
+        f"zipf s={fit.zipf_exponent[i]:.3f}",
+        f"xmin={fit.xmin[i]:.4g}",
+        f"n_tail={fit.n_tail[i]}",
+        f"KS={fit.ks[i]:.3f}",
+    ]
+    for name, c in comparisons.items():
+        parts.append(f"vs {name}: R={c.R[i]:+.2f} (p={c.p[i]:.3f})")
+    return ", ".join(parts)
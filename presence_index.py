@@ -0,0 +1,186 @@
+"""
+presence_index.py – which videos were in the chart on which days
+
+Picking "songs that were in the chart for at least N days" used to be a
+groupby over the whole row-per-entry table, repeated for every
+threshold. The packed chart-days bitmap is built at ingest, saved with
+the store cache and extended only for new days (snapshot_store.py:
+presence, presence_dates). A PresenceIndex wraps it with per-video
+counts and answers such questions without touching the rows again:
+
+    bits[video]          the video's chart days as a packed bitmap
+                         (np.packbits, one bit per snapshot date)
+    days_present[video]  number of dates in the chart
+    longest_run[video]   longest run of consecutive snapshot dates
+
+Videos are also kept sorted by days_present and by longest_run, so
+
+    index.videos_with_min_days(40)        -> a binary search
+    index.videos_with_min_run(14)         -> a binary search
+    index.present_between(start, end)     -> popcount over a byte range
+
+The counts are derived from the bitmap once per store object
+(load_presence_index), a block of videos at a time. Columns are the
+distinct snapshot dates of the archive; several snapshots on one date
+count once. A run is broken when the video is
+missing from a snapshot date (days without any snapshot do not break
+it). Archives without dates use one column per snapshot.
+"""
+
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from instrument import span
+from snapshot_store import SnapshotStore, get_store
+from snapshot_store import date_columns as _date_columns
+
+# videos unpacked at a time when deriving longest runs from the bitmap
+RUN_BLOCK = 4096
+
+# bits set in every byte value
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int32)
+
+
+@dataclass
+class PresenceIndex:
+    """Packed videos × dates presence bitmap of one archive (see module docstring)."""
+    dates: np.ndarray           # datetime64[D], distinct snapshot dates (NaT if undated)
+    video_ids: np.ndarray       # str, store dictionary order
+    bits: np.ndarray            # uint8, videos × ceil(dates / 8)
+    days_present: np.ndarray    # int32
+    longest_run: np.ndarray     # int32
+    by_days: np.ndarray = field(init=False)    # video order, most days first
+    by_run: np.ndarray = field(init=False)     # video order, longest run first
+    column: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        # stable sorts: ties keep the order of first appearance
+        self.by_days = np.argsort(-self.days_present, kind="stable")
+        self.by_run = np.argsort(-self.longest_run, kind="stable")
+        self.column = {vid: j for j, vid in enumerate(self.video_ids.tolist())}
+
+    @property
+    def num_dates(self) -> int:
+        return len(self.dates)
+
+    @property
+    def num_videos(self) -> int:
+        return len(self.video_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    # --- threshold queries -------------------------------------------
+
+    def _at_least(self, order: np.ndarray, values: np.ndarray, n: int, limit: Optional[int]) -> List[str]:
+        # values[order] is descending; count the entries >= n
+        k = int(np.searchsorted(-values[order], -n, side="right"))
+        if limit is not None:
+            k = min(k, limit)
+        return self.video_ids[order[:k]].tolist()
+
+    def videos_with_min_days(self, n: int, limit: Optional[int] = None) -> List[str]:
+        """Videos in the chart on at least `n` dates, most dates first."""
+        return self._at_least(self.by_days, self.days_present, n, limit)
+
+    def videos_with_min_run(self, n: int, limit: Optional[int] = None) -> List[str]:
+        """Videos with a run of at least `n` consecutive dates, longest first."""
+        return self._at_least(self.by_run, self.longest_run, n, limit)
+
+    # --- per video / date range ----------------------------------------
+
+    def present(self, video_id: str) -> np.ndarray:
+        """Boolean presence of one video per date."""
+        row = self.bits[self.column[video_id]]
+        return np.unpackbits(row, count=self.num_dates).astype(bool)
+
+    def _date_slice(self, start, end) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = self.num_dates if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return slice(lo, max(lo, hi))
+
+    def days_between(self, start=None, end=None) -> np.ndarray:
+        """Number of chart dates of every video within [start, end] (inclusive)."""
+        cols = self._date_slice(start, end)
+        if cols.start == cols.stop:
+            return np.zeros(self.num_videos, dtype=np.int32)
+        first, last = cols.start // 8, (cols.stop - 1) // 8
+        block = self.bits[:, first:last + 1].copy()
+        # mask the bits outside the range in the edge bytes (bit 7 = first date of a byte)
+        block[:, 0] &= np.uint8(0xFF >> (cols.start % 8))
+        block[:, -1] &= np.uint8((0xFF << (7 - (cols.stop - 1) % 8)) & 0xFF)
+        return _POPCOUNT[block].sum(axis=1, dtype=np.int32)
+
+    def present_between(self, start=None, end=None, min_days: int = 1) -> List[str]:
+        """Videos in the chart on at least `min_days` dates within [start, end]."""
+        counts = self.days_between(start, end)
+        return self.video_ids[counts >= min_days].tolist()
+
+
+# ---------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------
+
+def _longest_runs(present: np.ndarray) -> np.ndarray:
+    """Longest run of True per row of a boolean matrix."""
+    padded = np.zeros((present.shape[0], present.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = present
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    longest = np.zeros(present.shape[0], dtype=np.int32)
+    np.maximum.at(longest, rows, (ends - starts).astype(np.int32))
+    return longest
+
+
+def date_columns(store: SnapshotStore) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct snapshot dates of a store and the column of every store
+    day (-1 for undated days). Without any dates, every snapshot is its
+    own column.
+    """
+    return _date_columns(store.day_dates)
+
+
+def build_presence_index(store: SnapshotStore) -> PresenceIndex:
+    """Wrap the store's bitmap; counts via popcount, runs a block of videos at a time."""
+    with span("presence.build", archive=os.path.basename(store.source)) as sp:
+        bits, num_dates = store.presence, len(store.presence_dates)
+        longest = np.zeros(len(bits), dtype=np.int32)
+        for lo in range(0, len(bits), RUN_BLOCK):
+            block = np.unpackbits(bits[lo:lo + RUN_BLOCK], axis=1, count=num_dates).astype(bool)
+            longest[lo:lo + RUN_BLOCK] = _longest_runs(block)
+
+        index = PresenceIndex(
+            dates=store.presence_dates,
+            video_ids=store.item_ids,
+            bits=bits,
+            days_present=_POPCOUNT[bits].sum(axis=1, dtype=np.int32),
+            longest_run=longest,
+        )
+        sp.count(records=int(index.days_present.sum()), bytes=index.nbytes)
+    return index
+
+
+# (abs zip path, kind) -> (weak reference to the store it was built from, index)
+_INDEXES: Dict[tuple, tuple] = {}
+
+
+def load_presence_index(zip_path: str, kind: str = "youtube") -> PresenceIndex:
+    """
+    Presence index of a YouTube-style archive, via the shared session
+    cache. Built once per store object, like panel.load_panel.
+    """
+    store = get_store(zip_path, kind=kind)
+    key = (os.path.abspath(zip_path), kind)
+    cached = _INDEXES.get(key)
+    if cached is not None and cached[0]() is store:
+        return cached[1]
+    index = build_presence_index(store)
+    _INDEXES[key] = (weakref.ref(store), index)
+    return index
@@ -0,0 +1,218 @@
+"""
+rank_stats.py – vectorized rank correlation for days × songs matrices
+
+The 3d analysis compares two rankings (Spotify position, YouTube view
+rank) of the same songs, for many days. Here both are given as
+days × songs matrices with NaN where a song is not charted that day;
+every function works on all rows at once.
+
+- rankdata_rows:    average ranks per row (ties get the mean rank)
+- spearman_rows:    Spearman's rho per row, with proper tie handling
+- kendall_tau_b:    Kendall's tau-b of two vectors in O(n log n)
+- kendall_rows:     tau-b per row
+- bootstrap_ci:     percentile bootstrap confidence interval per row
+
+Only pairs where both values are present are used in a row.
+"""
+
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+# ---------------------------------------------------------------------
+# Ranking
+# ---------------------------------------------------------------------
+
+def rankdata_rows(a) -> np.ndarray:
+    """
+    Rank each row of `a` (1 = smallest). Ties get the average of the
+    ranks they span; NaN entries stay NaN and are not counted.
+    """
+    a = np.atleast_2d(np.asarray(a, dtype=float))
+    rows, n = a.shape
+    if n == 0:
+        return a.copy()
+
+    order = np.argsort(a, axis=1, kind="mergesort")  # NaN sorts last
+    s = np.take_along_axis(a, order, axis=1)
+    pos = np.broadcast_to(np.arange(1, n + 1, dtype=float), (rows, n))
+
+    starts = np.ones((rows, n), dtype=bool)
+    starts[:, 1:] = s[:, 1:] != s[:, :-1]
+    ends = np.ones((rows, n), dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+
+    first = np.maximum.accumulate(np.where(starts, pos, 0), axis=1)
+    last = np.minimum.accumulate(np.where(ends, pos, n + 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty_like(a)
+    np.put_along_axis(ranks, order, (first + last) / 2, axis=1)
+    ranks[np.isnan(a)] = np.nan
+    return ranks
+
+
+def _paired(x, y) -> Tuple[np.ndarray, np.ndarray]:
+    """Broadcast to 2-D and blank out entries missing in either input."""
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    if x.shape != y.shape:
+        raise ValueError(f"Shape mismatch: {x.shape} vs {y.shape}")
+    missing = np.isnan(x) | np.isnan(y)
+    return np.where(missing, np.nan, x), np.where(missing, np.nan, y)
+
+
+# ---------------------------------------------------------------------
+# Spearman
+# ---------------------------------------------------------------------
+
+def _pearson_rows(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation per row, ignoring NaN (x and y share their NaNs)."""
+    n = np.sum(~np.isnan(x), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - (np.nansum(x, axis=1) / n)[:, None]
+        dy = y - (np.nansum(y, axis=1) / n)[:, None]
+        num = np.nansum(dx * dy, axis=1)
+        den = np.sqrt(np.nansum(dx * dx, axis=1) * np.nansum(dy * dy, axis=1))
+        r = num / den
+    r[(n < 2) | (den == 0)] = np.nan
+    return r
+
+
+def spearman_rows(x, y) -> np.ndarray:
+    """
+    Spearman's rho between x[i] and y[i] for every row i.
+
+    Values are ranked per row over the pairs present in both inputs
+    (ties get average ranks), then correlated with Pearson's formula.
+    Rows with fewer than two pairs or a constant side give NaN.
+    """
+    x, y = _paired(x, y)
+    return _pearson_rows(rankdata_rows(x), rankdata_rows(y))
+
+
+# ---------------------------------------------------------------------
+# Kendall tau-b
+# ---------------------------------------------------------------------
+
+def _count_inversions(v: np.ndarray) -> int:
+    """
+    Number of pairs i < j with v[i] > v[j], by a bottom-up merge sort.
+
+    Each level handles all blocks at once: a value in the right half of
+    a block is compared against the (sorted) left half of the same block
+    with one global searchsorted over block-offset keys.
+    """
+    n = len(v)
+    if n < 2:
+        return 0
+    _, cur = np.unique(v, return_inverse=True)
+    cur = cur.astype(np.int64).ravel()
+    m = int(cur.max()) + 1
+    idx = np.arange(n, dtype=np.int64)
+    total = 0
+    width = 1
+    while width < n:
+        block = idx // (2 * width)
+        right = (idx % (2 * width)) >= width
+        offset = block * m
+
+        left_keys = (offset + cur)[~right]
+        r_block = block[right]
+        r_keys = (offset + cur)[right]
+
+        # left elements of the same block that are <= the right element
+        not_greater = (
+            np.searchsorted(left_keys, r_keys, side="right")
+            - np.searchsorted(left_keys, r_block * m, side="left")
+        )
+        left_size = np.minimum(width, n - r_block * 2 * width)
+        total += int(np.sum(left_size - not_greater))
+
+        cur = np.sort(offset + cur) - offset
+        width *= 2
+    return total
+
+
+def _tied_pairs(sorted_values: np.ndarray) -> int:
+    """Number of tied pairs in an already sorted vector."""
+    if len(sorted_values) == 0:
+        return 0
+    _, counts = np.unique(sorted_values, return_counts=True)
+    return int(np.sum(counts * (counts - 1) // 2))
+
+
+def kendall_tau_b(x, y) -> float:
+    """
+    Kendall's tau-b of two vectors (NaN pairs dropped), in O(n log n)
+    following Knight (1966): sort by (x, y), count the discordant pairs
+    as inversions of y, and correct for ties.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    n = len(x)
+    if n < 2:
+        return float("nan")
+
+    order = np.lexsort((y, x))
+    xs, ys = x[order], y[order]
+
+    n0 = n * (n - 1) // 2
+    n1 = _tied_pairs(xs)
+    n2 = _tied_pairs(np.sort(ys))
+    joint = np.unique(np.stack([xs, ys]), axis=1, return_counts=True)[1]
+    n3 = int(np.sum(joint * (joint - 1) // 2))
+    swaps = _count_inversions(ys)
+
+    den = np.sqrt(float(n0 - n1) * float(n0 - n2))
+    if den == 0:
+        return float("nan")
+    return float((n0 - n1 - n2 + n3 - 2 * swaps) / den)
+
+
+def kendall_rows(x, y) -> np.ndarray:
+    """Kendall's tau-b between x[i] and y[i] for every row i."""
+    x, y = _paired(x, y)
+    return np.array([kendall_tau_b(xr, yr) for xr, yr in zip(x, y)])
+
+
+# ---------------------------------------------------------------------
+# Bootstrap
+# ---------------------------------------------------------------------
+
+def bootstrap_ci(
+    x,
+    y,
+    statistic: Callable = spearman_rows,
+    n_boot: int = 1000,
+    alpha: float = 0.05,
+    seed: Optional[int] = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap confidence interval of a row statistic.
+
+    For each row, the present pairs are resampled with replacement
+    n_boot times; all resamples of a row are evaluated in one call of
+    `statistic` (which takes two B × n matrices, like spearman_rows).
+
+    Returns:
+        (low, high) arrays with one value per row.
+    """
+    x, y = _paired(x, y)
+    rng = np.random.default_rng(seed)
+    low = np.full(len(x), np.nan)
+    high = np.full(len(x), np.nan)
+
+    for i, (xr, yr) in enumerate(zip(x, y)):
+        keep = ~np.isnan(xr)
+        xr, yr = xr[keep], yr[keep]
+        if len(xr) < 3:
+            continue
+        sample = rng.integers(0, len(xr), size=(n_boot, len(xr)))
+        stats = statistic(xr[sample], yr[sample])
+        stats = stats[~np.isnan(stats)]
+        if len(stats):
+            low[i], high[i] = np.quantile(stats, [alpha / 2, 1 - alpha / 2])
+    return low, high
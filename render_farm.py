@@ -0,0 +1,250 @@
+"""
+render_farm.py – render batches of figures in parallel
+
+Drawing and saving PNGs is a large part of the s3 run time once every
+day gets its own figures. Instead of plotting in the main process, the
+analyses describe each figure as a RenderJob:
+
+    RenderJob(kind="line", data={"x": ..., "y": ...},
+              spec={"title": ..., "xlabel": ..., "loglog": True},
+              out_path="plots/....png")
+
+and render_jobs() draws them in a process pool. Workers draw on a bare
+Agg canvas (no pyplot, no GUI backend) and write every file atomically:
+the PNG goes to a temporary file in the target directory and is moved
+into place with os.replace(), so a reader never sees a half-written
+plot. The return value is a manifest of the files that were written.
+
+Rendering is skipped for figures whose inputs did not change. Each job
+gets a content key – a hash of its data arrays, its spec and the code
+of this module – that is stored per output directory in
+`.render_cache.json`. If the output file exists and its recorded key
+matches, the job is not rendered again. Pipeline stages render in
+threads of one process, so index updates are serialised by a lock and
+merge into the file as it is on disk (re-read, update, write).
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from instrument import span
+from utils import process_pool
+
+DEFAULT_DPI = 150
+
+# Below this many jobs per worker, rendering stays in-process.
+MIN_JOBS_PER_WORKER = 4
+
+CACHE_INDEX = ".render_cache.json"
+
+# held for the re-read -> merge -> write of an index
+_INDEX_LOCK = threading.Lock()
+
+# Held while drawing in this process. matplotlib (including mathtext,
+# used for log-axis tick labels) is not thread-safe, so in-process
+# rendering and pyplot code in other threads (pipeline.py) share it.
+DRAW_LOCK = threading.Lock()
+
+
+class RenderJob(NamedTuple):
+    kind: str       # key into RENDERERS
+    data: dict      # arrays / lists to plot
+    spec: dict      # labels, scales, dpi, ...
+    out_path: str
+
+
+# ---------------------------------------------------------------------
+# Renderers: draw `data` onto `ax` according to `spec`
+# ---------------------------------------------------------------------
+
+def _apply_labels(ax, spec: dict) -> None:
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_ylabel(spec.get("ylabel", ""))
+    ax.set_title(spec.get("title", ""))
+    if spec.get("invert_x"):
+        ax.invert_xaxis()
+    if spec.get("invert_y"):
+        ax.invert_yaxis()
+    if spec.get("grid"):
+        ax.grid(True, which="both", linestyle="--", linewidth=0.5)
+
+
+def render_line(ax, data: dict, spec: dict) -> None:
+    """x/y line plot; spec['loglog'] switches both axes to log scale."""
+    plot = ax.loglog if spec.get("loglog") else ax.plot
+    plot(
+        data["x"],
+        data["y"],
+        marker=spec.get("marker", "o"),
+        linestyle=spec.get("linestyle", "-"),
+    )
+    _apply_labels(ax, spec)
+
+
+def render_scatter(ax, data: dict, spec: dict) -> None:
+    ax.scatter(data["x"], data["y"])
+    _apply_labels(ax, spec)
+
+
+RENDERERS: Dict[str, Callable] = {
+    "line": render_line,
+    "scatter": render_scatter,
+}
+
+
+# ---------------------------------------------------------------------
+# Workers
+# ---------------------------------------------------------------------
+
+def render_one(job: RenderJob) -> dict:
+    """Draw one job and write its PNG atomically. Returns its manifest entry."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=job.spec.get("figsize"))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    RENDERERS[job.kind](ax, job.data, job.spec)
+    fig.tight_layout()
+
+    out_dir = os.path.dirname(job.out_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = os.path.join(
+        out_dir, f".{os.path.basename(job.out_path)}.{os.getpid()}.tmp"
+    )
+    try:
+        fig.savefig(tmp_path, dpi=job.spec.get("dpi", DEFAULT_DPI), format="png")
+        os.replace(tmp_path, job.out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {
+        "path": job.out_path,
+        "kind": job.kind,
+        "bytes": os.path.getsize(job.out_path),
+    }
+
+
+# ---------------------------------------------------------------------
+# Content-addressed cache
+# ---------------------------------------------------------------------
+
+def _code_version() -> str:
+    """Hash of this module's source: changing a renderer invalidates all keys."""
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+def job_key(job: RenderJob) -> str:
+    """Content key of a job: its data, its spec and the renderer code."""
+    h = hashlib.sha256()
+    h.update(CODE_VERSION.encode())
+    h.update(job.kind.encode())
+    h.update(json.dumps(job.spec, sort_keys=True, default=str).encode())
+    for name in sorted(job.data):
+        values = np.asarray(job.data[name])
+        h.update(name.encode())
+        h.update(str(values.dtype).encode())
+        h.update(str(values.shape).encode())
+        h.update(np.ascontiguousarray(values).tobytes())
+    return h.hexdigest()
+
+
+def _read_index(out_dir: str) -> Dict[str, str]:
+    path = os.path.join(out_dir, CACHE_INDEX)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_index(out_dir: str, updates: Dict[str, str]) -> None:
+    """Merge `updates` into the index on disk, keeping keys written by others."""
+    path = os.path.join(out_dir, CACHE_INDEX)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with _INDEX_LOCK:
+        index = _read_index(out_dir)
+        index.update(updates)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def render_jobs(
+    jobs: Sequence[RenderJob],
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[dict]:
+    """
+    Render all jobs whose output is missing or out of date, in a process
+    pool when there are enough of them.
+
+    Returns:
+        manifest – one entry {'path', 'kind', 'bytes', 'key', 'cached'}
+        per job, in job order ('cached' is True if it was not re-rendered).
+    """
+    jobs = list(jobs)
+    keys = [job_key(job) for job in jobs]
+    indexes: Dict[str, Dict[str, str]] = {}
+    manifest: List[Optional[dict]] = [None] * len(jobs)
+    todo = []
+
+    for i, (job, key) in enumerate(zip(jobs, keys)):
+        out_dir = os.path.dirname(job.out_path) or "."
+        if out_dir not in indexes:
+            indexes[out_dir] = _read_index(out_dir)
+        name = os.path.basename(job.out_path)
+        if use_cache and indexes[out_dir].get(name) == key and os.path.exists(job.out_path):
+            manifest[i] = {
+                "path": job.out_path,
+                "kind": job.kind,
+                "bytes": os.path.getsize(job.out_path),
+            }
+        else:
+            todo.append(i)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(todo) // MIN_JOBS_PER_WORKER))
+    with span("render.jobs", workers=workers) as sp:
+        if workers <= 1:
+            with DRAW_LOCK:
+                rendered = [render_one(jobs[i]) for i in todo]
+        else:
+            with process_pool(workers) as pool:
+                rendered = list(pool.map(render_one, [jobs[i] for i in todo]))
+        sp.count(
+            jobs=len(jobs),
+            rendered=len(todo),
+            bytes=sum(entry["bytes"] for entry in rendered),
+        )
+
+    updates: Dict[str, Dict[str, str]] = {}
+    for i, entry in zip(todo, rendered):
+        manifest[i] = entry
+        out_dir = os.path.dirname(jobs[i].out_path) or "."
+        updates.setdefault(out_dir, {})[os.path.basename(jobs[i].out_path)] = keys[i]
+
+    rendered_set = set(todo)
+    for i, entry in enumerate(manifest):
+        entry["key"] = keys[i]
+        entry["cached"] = i not in rendered_set
+    for out_dir, index_updates in updates.items():
+        _update_index(out_dir, index_updates)
+    return manifest
@@ -10,32 +10,32 @@ This script does:
     and plot the same metric for the songs that were NOT in Spotify top-100.
 
 It reads JSON files directly from ZIP archives, so you do NOT need
-to unzip anything.
+to unzip anything. The parsed snapshots are cached in data/cache/
+(see snapshot_store.py).
 
-Expected layout:
-
-week3-4-project-network-dynamics/
-  s1.py
-  data/
-    youtube_top100.zip
-    radio3fm_megahit.zip
-    radio538_alarmschijf.zip
+The archives come from the dataset registry (datasets.json): 1a uses
+'youtube_top100', 1b every dataset with chart type 'radio'. The radio
+archives are loaded concurrently before plotting.
 """
 
 import os
-import json
-from datetime import datetime
-import zipfile
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+import datasets
+from instrument import span
+from panel import Panel, load_panel
+from presence_index import PresenceIndex, load_presence_index
+from snapshot_store import get_store
+
 
 # ==========================
 #  Helper: load from ZIP
 # ==========================
 
-def load_youtube_from_zip(zip_path: str) -> pd.DataFrame:
+def load_youtube_from_zip(zip_path: str, kind: str = "youtube") -> pd.DataFrame:
     """
     Load YouTube JSON snapshots from a ZIP file.
 
@@ -44,88 +44,41 @@ def load_youtube_from_zip(zip_path: str) -> pd.DataFrame:
     - data/radio3fm_megahit.zip
     - data/radio538_alarmschijf.zip
 
+    The archive is read through the shared columnar store
+    (snapshot_store.py), so the JSON is only parsed the first time.
+
     Returns DataFrame with columns:
       date, video_id, title, likes, dislikes, diff
     """
-    if not os.path.exists(zip_path):
-        raise FileNotFoundError(f"ZIP file not found: {zip_path}")
-
-    rows = []
-
-    print(f"[DEBUG] Opening ZIP: {zip_path}")
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        # all JSON members
-        json_files = [name for name in zf.namelist() if name.lower().endswith(".json")]
-        print(f"[DEBUG]  found {len(json_files)} JSON files in ZIP")
-        if json_files:
-            print("[DEBUG]  first few entries:")
-            for name in json_files[:5]:
-                print(f"         {name}")
-
-        if not json_files:
-            raise FileNotFoundError(f"No JSON files inside ZIP: {zip_path}")
-
-        for name in json_files:
-            filename = os.path.basename(name)
-
-            # Try to extract a date from the filename, e.g. 20151109_1800_data.json
-            date_part = filename.split("_")[0]
-            if date_part.isdigit() and len(date_part) == 8:
-                try:
-                    date = datetime.strptime(date_part, "%Y%m%d").date()
-                except ValueError:
-                    # fallback: ignore date parsing problems
-                    date = None
-            else:
-                date = None
-
-            # Open and parse JSON
-            with zf.open(name) as f:
-                # bytes -> text
-                data = json.load(f)
-
-            if not isinstance(data, list):
-                raise TypeError(f"Expected list at top level in {name}, got {type(data)}")
-
-            for item in data:
-                # ---- video_id extraction ----
-                raw_id = item.get("id")
-                if isinstance(raw_id, dict) and "videoId" in raw_id:
-                    video_id = raw_id["videoId"]
-                elif "resourceId" in item and isinstance(item["resourceId"], dict) and "videoId" in item["resourceId"]:
-                    video_id = item["resourceId"]["videoId"]
-                else:
-                    video_id = raw_id  # fallback
-
-                snippet = item.get("snippet", {})
-                title = snippet.get("title", "Unknown title")
-
-                stats = item.get("statistics", {})
-                likes = int(stats.get("likeCount", 0))
-                dislikes = int(stats.get("dislikeCount", 0))
-
-                rows.append(
-                    {
-                        "date": date,
-                        "video_id": video_id,
-                        "title": title,
-                        "likes": likes,
-                        "dislikes": dislikes,
-                        "diff": likes - dislikes,
-                    }
-                )
-
-    df = pd.DataFrame(rows)
-    print(f"[DEBUG] DataFrame from {os.path.basename(zip_path)}: shape={df.shape}")
-    print(f"[DEBUG] Columns: {list(df.columns)}")
+    with span("s1.load_frame", archive=os.path.basename(zip_path)) as sp:
+        store = get_store(zip_path, kind=kind)
+
+        df = store.to_frame()[["date", "video_id", "title", "likes", "dislikes"]]
+        # missing counters are stored as -1; the plots treat them as 0
+        df["likes"] = df["likes"].clip(lower=0)
+        df["dislikes"] = df["dislikes"].clip(lower=0)
+        df["diff"] = df["likes"] - df["dislikes"]
+        sp.count(days=store.num_days, records=len(df))
     return df
 
 
-def pick_long_lived_songs(df: pd.DataFrame, min_days: int, max_songs: int):
+def pick_long_lived_songs(index: PresenceIndex, min_days: int, max_songs: int):
     """
-    Select video_ids that appear in the dataset at least `min_days` times
-    (on different dates). Limit to at most `max_songs` IDs.
+    Select video_ids that appear in the dataset on at least `min_days`
+    different dates, most dates first. Limit to at most `max_songs` IDs.
+
+    Answered from the archive's presence index (presence_index.py), so
+    trying several thresholds costs nothing extra. This used to take the
+    DataFrame of load_youtube_from_zip(); such a frame is still accepted
+    (and counted with a groupby, as before).
     """
+    if isinstance(index, pd.DataFrame):
+        return _pick_long_lived_songs_from_frame(index, min_days, max_songs)
+    return index.videos_with_min_days(min_days, limit=max_songs)
+
+
+def _pick_long_lived_songs_from_frame(df: pd.DataFrame, min_days: int, max_songs: int):
+    df = df[df["video_id"].notna()]
     # If dates are None (couldn't parse), treat them as one "date"
     if df["date"].isna().all():
         # no meaningful dates; just count occurrences
@@ -137,107 +90,123 @@ def pick_long_lived_songs(df: pd.DataFrame, min_days: int, max_songs: int):
               .nunique()
               .sort_values(ascending=False)
         )
-
-    selected_ids = counts[counts >= min_days].index[:max_songs]
-    return list(selected_ids)
+    return list(counts[counts >= min_days].index[:max_songs])
 
 
-def plot_diff_over_time(df: pd.DataFrame, video_ids, title_prefix: str):
+def plot_diff_over_time(panel: Panel, video_ids, title_prefix: str, output_path: str = None):
     """
     Plot (likes - dislikes) over time for the given list of video_ids.
 
-    Each song becomes one line in the plot.
+    Each song becomes one line in the plot. Series are column slices
+    of the days × videos panel (panel.py). With `output_path` the figure
+    is saved there instead of shown.
     """
+    has_dates = not np.isnat(panel.dates).all()
+
     plt.figure()
     for vid in video_ids:
-        sub = df[df["video_id"] == vid].copy()
-        # if we have dates, sort by date
-        if "date" in sub.columns and not sub["date"].isna().all():
-            sub = sub.sort_values("date")
-            x = sub["date"]
+        j = panel.column.get(vid)
+        if j is None:
+            continue
+        rows = np.flatnonzero(panel.present[:, j])
+        if len(rows) == 0:
+            continue
+
+        # missing like/dislike counts count as 0
+        diff = np.nan_to_num(panel.likes[rows, j]) - np.nan_to_num(panel.dislikes[rows, j])
+        if has_dates:
+            x = panel.dates[rows]
         else:
             # fallback: just use index
-            x = range(len(sub))
-
-        if sub.empty:
-            continue
+            x = range(len(rows))
 
-        label = sub["title"].iloc[0]
+        label = panel.title_of(vid)
         if len(label) > 40:
             label = label[:37] + "..."
-        plt.plot(x, sub["diff"], marker="o", label=label)
+        plt.plot(x, diff, marker="o", label=label)
 
-    plt.xlabel("Date" if "date" in df.columns and not df["date"].isna().all() else "Observation index")
+    plt.xlabel("Date" if has_dates else "Observation index")
     plt.ylabel("Likes − Dislikes")
     plt.title(f"{title_prefix} – evolution of likes − dislikes")
     plt.legend()
     plt.tight_layout()
-    plt.show()
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        plt.savefig(output_path, dpi=300)
+        print(f"Saved figure to: {output_path}")
+        plt.close()
+    else:
+        plt.show()
 
 
 # ==========================
 #  Assignment 1a
 # ==========================
 
-def run_assignment_1a():
+def run_assignment_1a(output_dir: str = None):
     """
     1a) Plot difference over time between likes and dislikes of songs in YouTube top-100.
-    """
-    yt_zip = os.path.join("data", "youtube_top100.zip")
-    print(f"Loading YouTube top-100 from ZIP: {yt_zip}")
-    df_yt = load_youtube_from_zip(yt_zip)
 
-    # Filter out rows where video_id is missing
-    df_yt = df_yt[df_yt["video_id"].notna()]
-    print(f"After dropping missing video_id: {len(df_yt)} rows, {df_yt['video_id'].nunique()} unique videos.")
+    With `output_dir` the plot is saved there instead of shown.
+    """
+    yt = datasets.get("youtube_top100")
+    print(f"Loading {yt.label} from ZIP: {yt.path}")
+    index = load_presence_index(yt.path, yt.kind)
+    print(f"{index.num_videos} unique videos on {index.num_dates} dates.")
 
     # Songs that appear on many different dates in the top-100
-    long_ids = pick_long_lived_songs(df_yt, min_days=40, max_songs=5)
+    long_ids = pick_long_lived_songs(index, min_days=40, max_songs=5)
     if not long_ids:
         print("[WARN] No songs found with >= 40 distinct dates; lowering threshold to 10.")
-        long_ids = pick_long_lived_songs(df_yt, min_days=10, max_songs=5)
+        long_ids = pick_long_lived_songs(index, min_days=10, max_songs=5)
 
+    panel = load_panel(yt.path, yt.kind)
     print("Selected video IDs for plotting (1a):")
     for vid in long_ids:
-        title = df_yt[df_yt["video_id"] == vid]["title"].iloc[0]
-        print(f"  {vid} – {title}")
+        print(f"  {vid} – {panel.title_of(vid)}")
 
-    plot_diff_over_time(df_yt, long_ids, title_prefix="YouTube Top-100")
+    plot_diff_over_time(
+        panel, long_ids, title_prefix=yt.label,
+        output_path=os.path.join(output_dir, "s1a_youtube_top100_diff.png") if output_dir else None,
+    )
 
 
 # ==========================
 #  Assignment 1b
 # ==========================
 
-def run_assignment_1b():
+def run_assignment_1b(output_dir: str = None):
     """
     1b) Plot difference over time between likes and dislikes of megahit
         and alarmschijf songs (not in Spotify top-100 at the time).
-    """
-    radio_zips = [
-        (os.path.join("data", "radio3fm_megahit.zip"), "3FM Megahit"),
-        (os.path.join("data", "radio538_alarmschijf.zip"), "Radio 538 Alarmschijf"),
-    ]
 
-    for zip_path, nice_name in radio_zips:
-        print(f"\nLoading {nice_name} from ZIP: {zip_path}")
-        df_radio = load_youtube_from_zip(zip_path)
+    With `output_dir` the plots are saved there instead of shown.
+    """
+    radios = datasets.select(chart="radio")
+    datasets.load_stores(radios)
 
-        df_radio = df_radio[df_radio["video_id"].notna()]
-        print(f"  After dropping missing video_id: {len(df_radio)} rows, {df_radio['video_id'].nunique()} unique videos.")
+    for ds in radios:
+        nice_name = ds.label
+        print(f"\n{nice_name} from ZIP: {ds.path}")
+        index = load_presence_index(ds.path, ds.kind)
+        print(f"  {index.num_videos} unique videos on {index.num_dates} dates.")
 
         # These are tracked for only ~2 weeks → lower min_days
-        long_ids = pick_long_lived_songs(df_radio, min_days=5, max_songs=5)
+        long_ids = pick_long_lived_songs(index, min_days=5, max_songs=5)
         if not long_ids:
             print(f"  [WARN] No songs found with >= 5 distinct dates for {nice_name}; lowering threshold to 2.")
-            long_ids = pick_long_lived_songs(df_radio, min_days=2, max_songs=5)
+            long_ids = pick_long_lived_songs(index, min_days=2, max_songs=5)
 
+        panel = load_panel(ds.path, ds.kind)
         print(f"  Selected video IDs for plotting ({nice_name}):")
         for vid in long_ids:
-            title = df_radio[df_radio["video_id"] == vid]["title"].iloc[0]
-            print(f"    {vid} – {title}")
+            print(f"    {vid} – {panel.title_of(vid)}")
 
-        plot_diff_over_time(df_radio, long_ids, title_prefix=nice_name)
+        plot_diff_over_time(
+            panel, long_ids, title_prefix=nice_name,
+            output_path=os.path.join(output_dir, f"s1b_{ds.name}_diff.png") if output_dir else None,
+        )
 
 
 # ==========================
@@ -4,37 +4,57 @@ s3.py – Assignment 3: Rich-Get-Richer (Popularity) Effects
 This script does the following:
 
 3a) For several days, plots the distribution of YouTube view counts
-    among all songs (rank vs views) in linear and log-log scales.
+    among all songs (rank vs views) in linear and log-log scales, and
+    fits a power law to the view counts of every day (powerlaw_fit.py).
 
 3b) (Theory, no code): exponential growth argument – write in report.
 
 3c) (Uses plots from Assignment 2; optional helper here if needed).
 
 3d) Compares rankings of songs in Spotify (top-100 position) with
-    rankings in YouTube (by view count) for several days.
-
-Datasets expected:
-  data/youtube_top100.zip
-  data/spotify_top100.zip
+    rankings in YouTube (by view count): Spearman / Kendall for every
+    day, scatter plots for several days.
+
+Datasets (from the registry, datasets.json):
+  youtube_top100   data/youtube_top100.zip
+  spotify_top100   data/spotify_top100.zip
+
+Both archives are read through the shared columnar store
+(snapshot_store.py) instead of parsing the JSON on every run, and all
+parts share the store's session cache, so each archive is decoded at
+most once per process. Part 3a only needs a few sampled days and
+streams them straight from the archive instead.
 """
 
 import os
-import json
-import math
-import zipfile
-from datetime import datetime
-from typing import List, Dict, Tuple, Iterable
-
-import matplotlib.pyplot as plt
+from typing import List, Dict, Optional, Sequence, Tuple, Iterable
+
+import numpy as np
+
+import datasets
+from instrument import span
+from panel import load_panel
+from powerlaw_fit import compare_alternatives, fit_power_law
+from rank_stats import bootstrap_ci, kendall_rows, rankdata_rows, spearman_rows
+from snapshot_schema import to_count
+from snapshot_store import (
+    SnapshotStore,
+    evenly_spaced,
+    iter_archive_days,
+)
+from render_farm import RenderJob, render_jobs
+from track_mapping import as_dict, load_mapping, save_mapping, update_mapping
+from utils import evenly_spaced_indices
 
 
 # ---------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------
 
-DATA_DIR = "data"
-YOUTUBE_ZIP = os.path.join(DATA_DIR, "youtube_top100.zip")
-SPOTIFY_ZIP = os.path.join(DATA_DIR, "spotify_top100.zip")
+YOUTUBE = datasets.get("youtube_top100")
+SPOTIFY = datasets.get("spotify_top100")
+YOUTUBE_ZIP = YOUTUBE.path
+SPOTIFY_ZIP = SPOTIFY.path
 PLOTS_DIR = "plots"
 
 
@@ -48,27 +68,25 @@ def ensure_dir(path: str) -> None:
         os.makedirs(path, exist_ok=True)
 
 
-def evenly_spaced_indices(n: int, k: int) -> List[int]:
-    """
-    Pick k indices evenly spaced from range(0, n).
-    Assumes k <= n and k >= 1.
-    """
-    if k == 1:
-        return [0]
-    return [round(i * (n - 1) / (k - 1)) for i in range(k)]
-
-
-def clear_plots(prefix: str) -> None:
+def clear_plots(prefix: str, manifest: Iterable[dict] = ()) -> None:
     """
     Delete old plot files in PLOTS_DIR whose filename starts with prefix.
     Example prefixes: 's3a_', 's3d_'.
+
+    Files listed in `manifest` (as returned by render_farm.render_jobs)
+    are kept, so calling this after rendering only removes stale plots
+    and never a file before its replacement has been written.
     """
     if not os.path.isdir(PLOTS_DIR):
         return
+    keep = {os.path.abspath(entry["path"]) for entry in manifest}
     for fname in os.listdir(PLOTS_DIR):
+        path = os.path.join(PLOTS_DIR, fname)
+        if os.path.abspath(path) in keep:
+            continue
         if fname.startswith(prefix) and fname.endswith(".png"):
             try:
-                os.remove(os.path.join(PLOTS_DIR, fname))
+                os.remove(path)
             except OSError:
                 pass
 
@@ -77,122 +95,43 @@ def clear_plots(prefix: str) -> None:
 # Helpers: YouTube data
 # ---------------------------------------------------------------------
 
-def iter_youtube_days(zip_path: str) -> Iterable[Tuple[datetime, List[dict]]]:
-    """
-    Iterate over all days in the YouTube dataset.
+VIEW_COUNT = "statistics.viewCount"
 
-    Yields:
-        (date, videos)
-    where
-        date   = datetime.date object
-        videos = list of video dicts for that day
-    """
-    with zipfile.ZipFile(zip_path, "r") as z:
-        json_files = sorted(
-            name for name in z.namelist() if name.endswith(".json")
-        )
 
-        for name in json_files:
-            base = os.path.basename(name)  # e.g. 20151109_1800_data.json
-            date_str = base.split("_")[0]  # '20151109'
-            date = datetime.strptime(date_str, "%Y%m%d").date()
+def iter_youtube_days(
+    zip_path: str, kind: str = "youtube", days=None, fields: Optional[Sequence[str]] = None,
+) -> Iterable[Tuple[object, Dict[str, list]]]:
+    """
+    Iterate over the days in the YouTube dataset (see iter_archive_days).
 
-            data = json.loads(z.read(name).decode("utf-8"))
-            # data is a list of 100 YouTube video objects
-            yield date, data
+    Yields (date, columns) with columns = {field: [value per video]};
+    only the video ids unless `fields` asks for more.
+    """
+    return iter_archive_days(zip_path, kind=kind, days=days, fields=fields)
 
 
-def get_youtube_view_counts_for_day(videos: List[dict]) -> List[int]:
-    """Return list of view counts for one day from YouTube daily data."""
-    views = []
-    for v in videos:
-        stats = v.get("statistics", {})
-        vc = stats.get("viewCount")
-        if vc is not None:
-            try:
-                views.append(int(vc))
-            except ValueError:
-                # Just skip malformed entries
-                continue
-    return views
+def get_youtube_view_counts_for_day(columns: Dict[str, list]) -> List[int]:
+    """Return list of view counts for one day streamed by iter_archive_days."""
+    # missing / malformed view counts become -1 – skip them
+    counts = [to_count(v) for v in columns[VIEW_COUNT]]
+    return [v for v in counts if v >= 0]
 
 
 # ---------------------------------------------------------------------
 # Helpers: Spotify data
 # ---------------------------------------------------------------------
 
-def _spotify_json_files(zip_path: str) -> List[str]:
-    """Return sorted list of Spotify JSON filenames inside the zip."""
-    with zipfile.ZipFile(zip_path, "r") as z:
-        all_json = [n for n in z.namelist() if n.endswith(".json")]
-    return sorted(all_json)
-
-
-def _pick_spotify_file_for_date(files: List[str], date_str: str) -> str:
+def iter_spotify_days(
+    zip_path: str, kind: str = "spotify", days=None, fields: Optional[Sequence[str]] = None,
+) -> Iterable[Tuple[object, Dict[str, list]]]:
     """
-    For a given date string 'YYYYMMDD', choose the most appropriate Spotify file.
+    Iterate over the days in the Spotify dataset (see iter_archive_days).
 
-    The zip sometimes has multiple files for the same date (e.g., 1328 and 1800).
-    We prefer the one containing '1800' in the filename if it exists,
-    otherwise we take the first matching file.
+    The zip sometimes has multiple files for the same date (e.g., 1328
+    and 1800); the '_1800_' one is used to align with YouTube time.
+    Yields (date, columns) with columns = {field: [value per track]}.
     """
-    candidates = [f for f in files if date_str in os.path.basename(f)]
-    if not candidates:
-        raise FileNotFoundError(f"No Spotify JSON for date {date_str}")
-    for c in candidates:
-        if "_1800_" in c:
-            return c
-    # Fallback: just the first
-    return sorted(candidates)[0]
-
-
-def iter_spotify_days(zip_path: str) -> Iterable[Tuple[datetime, List[dict]]]:
-    """
-    Iterate over all days in the Spotify dataset.
-
-    Yields:
-        (date, tracks)
-    where
-        date   = datetime.date object
-        tracks = list of track-info dicts:
-                 {
-                   'id': str,
-                   'name': str,
-                   'artists': str,
-                   'position': int  (1..100)
-                 }
-    """
-    files = _spotify_json_files(zip_path)
-    with zipfile.ZipFile(zip_path, "r") as z:
-        # Get all unique dates present in the filenames
-        dates = sorted(
-            sorted({
-                os.path.basename(f).split("_")[0]  # '20151109'
-                for f in files
-            })
-        )
-
-        for date_str in dates:
-            # Try to align with YouTube time (prefer *_1800_ if present)
-            fname = _pick_spotify_file_for_date(files, date_str)
-            payload = json.loads(z.read(fname).decode("utf-8"))
-            items = payload["tracks"]["items"]
-
-            date = datetime.strptime(date_str, "%Y%m%d").date()
-            tracks = []
-            for pos, item in enumerate(items, start=1):
-                t = item["track"]
-                artists = ", ".join(a["name"] for a in t["artists"])
-                tracks.append(
-                    {
-                        "id": t["id"],
-                        "name": t["name"],
-                        "artists": artists,
-                        "position": pos,
-                    }
-                )
-
-            yield date, tracks
+    return iter_archive_days(zip_path, kind=kind, days=days, fields=fields)
 
 
 # ---------------------------------------------------------------------
@@ -207,251 +146,302 @@ def plot_viewcount_distributions(num_days: int = 5) -> None:
     - linear scale
     - log-log scale
 
-    Saves plots into PLOTS_DIR.
+    The days are streamed from the archive (iter_archive_days): only
+    the sampled members are decoded, projected to their view counts,
+    and dropped before the next one, so memory does not grow with the
+    length of the archive. The figures are rendered in parallel by
+    render_farm and saved into PLOTS_DIR; old 3a plots are removed
+    afterwards.
     """
     ensure_dir(PLOTS_DIR)
 
-    # clear old 3a plots so they don't multiply
-    clear_plots("s3a_")
-
-    yt_days = list(iter_youtube_days(YOUTUBE_ZIP))
-    if not yt_days:
-        print("No YouTube data found. Check your YOUTUBE_ZIP path.")
-        return
-
-    num_days = min(num_days, len(yt_days))
-    indices = evenly_spaced_indices(len(yt_days), num_days)
-
-    for idx in indices:
-        date, videos = yt_days[idx]
+    jobs = []
+    num_sampled = 0
+    days = iter_archive_days(YOUTUBE_ZIP, YOUTUBE.kind, days=evenly_spaced(num_days), fields=[VIEW_COUNT])
+    for date, columns in days:
+        num_sampled += 1
         date_str = date.strftime("%Y%m%d")
 
-        views = get_youtube_view_counts_for_day(videos)
+        views = get_youtube_view_counts_for_day(columns)
         if not views:
             continue
 
         views_sorted = sorted(views, reverse=True)
         ranks = list(range(1, len(views_sorted) + 1))
+        data = {"x": ranks, "y": views_sorted}
 
         # --- Linear plot ---
-        plt.figure()
-        plt.plot(ranks, views_sorted, marker="o")
-        plt.xlabel("Rank (1 = most viewed)")
-        plt.ylabel("View count")
-        plt.title(f"YouTube view distribution (linear) – {date}")
-        plt.tight_layout()
-        out_path = os.path.join(
-            PLOTS_DIR, f"s3a_views_rank_linear_{date_str}.png"
-        )
-        plt.savefig(out_path, dpi=150)
-        plt.close()
+        jobs.append(RenderJob(
+            "line", data,
+            {
+                "xlabel": "Rank (1 = most viewed)",
+                "ylabel": "View count",
+                "title": f"YouTube view distribution (linear) – {date}",
+            },
+            os.path.join(PLOTS_DIR, f"s3a_views_rank_linear_{date_str}.png"),
+        ))
 
         # --- Log-log plot ---
-        plt.figure()
-        plt.loglog(ranks, views_sorted, marker="o", linestyle="none")
-        plt.xlabel("Rank (log scale)")
-        plt.ylabel("View count (log scale)")
-        plt.title(f"YouTube view distribution (log-log) – {date}")
-        plt.tight_layout()
-        out_path = os.path.join(
-            PLOTS_DIR, f"s3a_views_rank_loglog_{date_str}.png"
-        )
-        plt.savefig(out_path, dpi=150)
-        plt.close()
+        jobs.append(RenderJob(
+            "line", data,
+            {
+                "loglog": True,
+                "linestyle": "none",
+                "xlabel": "Rank (log scale)",
+                "ylabel": "View count (log scale)",
+                "title": f"YouTube view distribution (log-log) – {date}",
+            },
+            os.path.join(PLOTS_DIR, f"s3a_views_rank_loglog_{date_str}.png"),
+        ))
+
+    if not num_sampled:
+        print("No YouTube data found. Check your YOUTUBE_ZIP path.")
+        return
+
+    manifest = render_jobs(jobs)
+    # clear old 3a plots so they don't multiply
+    clear_plots("s3a_", manifest)
+    rendered = sum(not entry["cached"] for entry in manifest)
+    print(f"[3a] {len(manifest)} plots for {len(jobs) // 2} days ({rendered} re-rendered).")
+
+
+def fit_viewcount_power_laws() -> None:
+    """
+    Fit a power law (MLE exponent, KS-selected xmin) to the view counts
+    of every day in the archive in one batch, compare each fit with
+    lognormal and exponential alternatives, and plot the exponent over
+    time.
+    """
+    ensure_dir(PLOTS_DIR)
+
+    panel = load_panel(YOUTUBE_ZIP, YOUTUBE.kind)
+    if not len(panel.dates):
+        print("No YouTube data found. Check your YOUTUBE_ZIP path.")
+        return
 
-        print(f"[3a] Saved plots for {date}.")
+    with span("powerlaw.fit") as sp_fit:
+        fit = fit_power_law(panel.views)
+        comparisons = compare_alternatives(panel.views, fit)
+        sp_fit.count(days=len(panel.dates), records=int(np.sum(~np.isnan(panel.views))))
+
+    fitted = ~np.isnan(fit.alpha)
+    print(f"[3a] power-law fits for {int(fitted.sum())} of {len(panel.dates)} days:")
+    if fitted.any():
+        print(f"     alpha median {np.nanmedian(fit.alpha):.3f} "
+              f"(range {np.nanmin(fit.alpha):.3f} – {np.nanmax(fit.alpha):.3f}), "
+              f"median KS {np.nanmedian(fit.ks):.3f}")
+    for name, c in comparisons.items():
+        significant = c.p < 0.1
+        print(f"     vs {name}: power law favoured on {int(np.sum(significant & (c.R > 0)))} days, "
+              f"{name} on {int(np.sum(significant & (c.R < 0)))} days, "
+              f"inconclusive on {int(np.sum(fitted & ~significant))} days")
+
+    job = RenderJob(
+        "line",
+        {"x": panel.dates, "y": fit.alpha},
+        {
+            "marker": ".",
+            "xlabel": "Date",
+            "ylabel": "Power-law exponent alpha",
+            "title": "YouTube view counts: fitted power-law exponent per day",
+            "grid": True,
+        },
+        os.path.join(PLOTS_DIR, "s3p_powerlaw_alpha.png"),
+    )
+    manifest = render_jobs([job])
+    clear_plots("s3p_", manifest)
 
 
 # ---------------------------------------------------------------------
 # Part 3d – Compare Spotify rank vs YouTube rank
 # ---------------------------------------------------------------------
 
-def _build_spotify_youtube_mapping() -> Dict[str, str]:
+def _load_common_days() -> Tuple[SnapshotStore, SnapshotStore, List]:
+    """
+    Load both datasets and find the dates they have in common.
+
+    Returns:
+        (yt, sp, common_dates)
+    The stores come from the session cache, so calling this from
+    several parts decodes each archive only once per process. Use
+    store.day_on(date) to materialize just the days you need.
+    """
+    stores = datasets.load_stores([YOUTUBE, SPOTIFY])
+    yt, sp = stores[YOUTUBE.name], stores[SPOTIFY.name]
+    common_dates = sorted((set(yt.dates()) & set(sp.dates())) - {None})
+    return yt, sp, common_dates
+
+
+def _build_spotify_youtube_mapping(
+    yt: SnapshotStore, sp: SnapshotStore, common_dates: List
+) -> Dict[str, str]:
     """
     Build a mapping from Spotify track ID -> YouTube video ID.
 
-    We use a single reference day (the first one where both datasets
-    are available) and match based on:
+    The mapping is kept in a persistent table (track_mapping.py). Each
+    run only processes the common days that are newer than the table,
+    and on each day only matches tracks that were not mapped before,
+    based on:
       - track name
       - artist names
-    and the YouTube video title.
+    and the YouTube video title of that day, using the scored
+    inverted-index matcher in title_matcher.py.
 
     Returns:
         dict: spotify_id -> youtube_video_id
     """
-    # Grab first matching day that exists in BOTH zips
-    yt_days = list(iter_youtube_days(YOUTUBE_ZIP))
-    sp_days = list(iter_spotify_days(SPOTIFY_ZIP))
-
-    yt_by_date = {d: vids for d, vids in yt_days}
-    sp_by_date = {d: tracks for d, tracks in sp_days}
-    common_dates = sorted(set(yt_by_date.keys()) & set(sp_by_date.keys()))
     if not common_dates:
         print("No overlapping dates between Spotify and YouTube datasets.")
         return {}
 
-    ref_date = common_dates[0]
-    print(f"Building Spotify–YouTube mapping using reference date {ref_date}")
-
-    yt_videos = yt_by_date[ref_date]
-    sp_tracks = sp_by_date[ref_date]
-
-    mapping: Dict[str, str] = {}  # spotify_id -> youtube_id
-
-    for t in sp_tracks:
-        spotify_id = t["id"]
-        track_name = t["name"].lower()
-        artist_tokens = [a.strip().lower() for a in t["artists"].split(",")]
-
-        best_yt_id = None
-
-        # First pass: require both track name and at least one artist in title
-        for v in yt_videos:
-            title = v["snippet"]["title"].lower()
-            if track_name in title and any(a in title for a in artist_tokens):
-                best_yt_id = v["id"]
-                break
-
-        # Second pass: just track name
-        if best_yt_id is None:
-            for v in yt_videos:
-                title = v["snippet"]["title"].lower()
-                if track_name in title:
-                    best_yt_id = v["id"]
-                    break
-
-        if best_yt_id is not None:
-            mapping[spotify_id] = best_yt_id
+    table = load_mapping(stores=[yt, sp])
+    before, last_date = len(table["entries"]), table["last_date"]
+    with span("mapping.update") as sp_mapping:
+        added = update_mapping(table, yt, sp, common_dates)
+        if table["last_date"] != last_date:
+            save_mapping(table)
+        sp_mapping.count(days=len(common_dates), added=added, records=len(table["entries"]))
 
+    entries = table["entries"].values()
+    mean_score = sum(e["score"] for e in entries) / len(entries) if entries else 0.0
     print(
-        f"Mapped {len(mapping)} of {len(sp_tracks)} Spotify tracks "
-        "to YouTube videos on the reference day."
+        f"Spotify–YouTube mapping: {len(entries)} tracks mapped "
+        f"({before} cached, {added} new, up to {table['last_date']}; "
+        f"mean confidence {mean_score:.2f})."
     )
-    return mapping
+    return as_dict(table)
 
 
-def _spearman_correlation(xs: List[float], ys: List[float]) -> float:
+def _rank_matrices(
+    yt: SnapshotStore, sp: SnapshotStore, dates: List, mapping: Dict[str, str]
+) -> Tuple[np.ndarray, np.ndarray, List[str], Dict[str, Tuple[str, str]]]:
     """
-    Compute Spearman (actually Pearson on ranks) correlation coefficient.
-    xs and ys are already ranks in our case, so this is just Pearson.
+    Build days × songs rank matrices for the mapped Spotify tracks.
 
     Returns:
-        correlation in [-1, 1]
+        (sp_ranks, yt_ranks, sp_ids, names)
+    sp_ranks[d, j] is the Spotify position of track sp_ids[j] on
+    dates[d], yt_ranks[d, j] the rank of its YouTube video by view count
+    among all videos of that day (1 = most viewed, ties averaged). NaN
+    where the track or its video is not charted that day. `names` maps
+    spotify_id -> (track name, artists).
     """
-    if len(xs) != len(ys) or len(xs) == 0:
-        return float("nan")
-
-    n = len(xs)
-    mean_x = sum(xs) / n
-    mean_y = sum(ys) / n
-
-    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
-    den_x = math.sqrt(sum((x - mean_x) ** 2 for x in xs))
-    den_y = math.sqrt(sum((y - mean_y) ** 2 for y in ys))
+    sp_ids = sorted(mapping)
+    col = {sp_id: j for j, sp_id in enumerate(sp_ids)}
+    sp_ranks = np.full((len(dates), len(sp_ids)), np.nan)
+    yt_ranks = np.full((len(dates), len(sp_ids)), np.nan)
+    names: Dict[str, Tuple[str, str]] = {}
+
+    for d, date in enumerate(dates):
+        yt_day = yt.day_on(date)
+        sp_day = sp.day_on(date)
+
+        views = np.where(yt_day.views >= 0, yt_day.views, np.nan)
+        ranks = rankdata_rows(-views)[0]
+        yt_rank = dict(zip(yt_day.ids.tolist(), ranks.tolist()))
+
+        for sp_id, pos, name, artists in zip(
+            sp_day.ids.tolist(), sp_day.positions.tolist(),
+            sp_day.titles.tolist(), sp_day.artists.tolist(),
+        ):
+            j = col.get(sp_id)
+            if j is None:
+                continue
+            names.setdefault(sp_id, (name, artists))
+            r = yt_rank.get(mapping[sp_id])
+            if r is not None:
+                sp_ranks[d, j] = pos
+                yt_ranks[d, j] = r
 
-    if den_x == 0 or den_y == 0:
-        return float("nan")
-    return num / (den_x * den_y)
+    return sp_ranks, yt_ranks, sp_ids, names
 
 
 def compare_spotify_youtube_rankings(num_days: int = 5) -> None:
     """
-    For several days, compare Spotify ranking (top-100 position) with
-    YouTube ranking (by view count) for songs that we can match in
-    both datasets.
+    Compare Spotify ranking (top-100 position) with YouTube ranking (by
+    view count) for songs that we can match in both datasets.
 
-    For each day:
-      - compute rank on Spotify (position 1..100)
-      - compute rank on YouTube (sort viewCount descending)
-      - compute correlation and save a scatter plot
+    Correlations are computed for EVERY common day at once from
+    days × songs rank matrices (rank_stats.py):
+      - rank on Spotify (position 1..100)
+      - rank on YouTube (viewCount descending, ties averaged)
+      - Spearman's rho and Kendall's tau-b per day
 
-    Plots are saved into PLOTS_DIR.
+    For `num_days` evenly spaced days we also print a bootstrap 95%
+    confidence interval and save a scatter plot into PLOTS_DIR.
     """
     ensure_dir(PLOTS_DIR)
 
-    # clear old 3d plots so they don't multiply
-    clear_plots("s3d_")
+    yt, sp, common_dates = _load_common_days()
 
     # Build mapping once (Spotify track ID -> YouTube video ID)
-    mapping = _build_spotify_youtube_mapping()
+    mapping = _build_spotify_youtube_mapping(yt, sp, common_dates)
     if not mapping:
         return
 
-    yt_days = list(iter_youtube_days(YOUTUBE_ZIP))
-    sp_days = list(iter_spotify_days(SPOTIFY_ZIP))
-
-    yt_by_date = {d: vids for d, vids in yt_days}
-    sp_by_date = {d: tracks for d, tracks in sp_days}
-    common_dates = sorted(set(yt_by_date.keys()) & set(sp_by_date.keys()))
-    if not common_dates:
-        print("No overlapping dates between Spotify and YouTube datasets.")
-        return
+    with span("correlation.rank_stats") as sp_corr:
+        sp_ranks, yt_ranks, sp_ids, names = _rank_matrices(yt, sp, common_dates, mapping)
+        rho = spearman_rows(sp_ranks, yt_ranks)
+        tau = kendall_rows(sp_ranks, yt_ranks)
+        sp_corr.count(days=len(common_dates), records=int(np.sum(~np.isnan(sp_ranks))))
+    if not np.isnan(rho).all():
+        print(
+            f"[3d] {len(common_dates)} days: mean Spearman {np.nanmean(rho):.3f} "
+            f"(min {np.nanmin(rho):.3f}, max {np.nanmax(rho):.3f}), "
+            f"mean Kendall tau-b {np.nanmean(tau):.3f}"
+        )
 
-    num_days = min(num_days, len(common_dates))
-    indices = evenly_spaced_indices(len(common_dates), num_days)
-    selected_dates = [common_dates[i] for i in indices]
+    selected = evenly_spaced_indices(len(common_dates), min(num_days, len(common_dates)))
+    with span("correlation.bootstrap") as sp_boot:
+        ci_low, ci_high = bootstrap_ci(sp_ranks[selected], yt_ranks[selected])
+        sp_boot.count(days=len(selected))
 
-    for date in selected_dates:
-        yt_videos = yt_by_date[date]
-        sp_tracks = sp_by_date[date]
+    jobs = []
+    for k, d in enumerate(selected):
+        date = common_dates[d]
         date_str = date.strftime("%Y%m%d")
 
-        # Build YouTube rank dict: video_id -> rank
-        yt_sorted = sorted(
-            yt_videos,
-            key=lambda v: int(v["statistics"]["viewCount"]),
-            reverse=True,
-        )
-        yt_rank = {v["id"]: rank for rank, v in enumerate(yt_sorted, start=1)}
-
-        # Collect matched pairs: (spotify_rank, youtube_rank)
-        xs = []  # Spotify ranks
-        ys = []  # YouTube ranks
-        names = []
-
-        for t in sp_tracks:
-            sp_id = t["id"]
-            sp_rank = t["position"]
-            yt_id = mapping.get(sp_id)
-            if yt_id is None:
-                continue
-            if yt_id not in yt_rank:
-                continue
-            ys.append(yt_rank[yt_id])
-            xs.append(sp_rank)
-            names.append((t["name"], t["artists"]))
+        present = ~np.isnan(sp_ranks[d])
+        xs = sp_ranks[d, present].astype(int).tolist()  # Spotify ranks
+        ys = yt_ranks[d, present].tolist()               # YouTube ranks
+        labels = [names[sp_ids[j]] for j in np.flatnonzero(present)]
 
         if not xs:
             print(f"[3d] No matched tracks for date {date}.")
             continue
 
-        corr = _spearman_correlation(xs, ys)
+        corr = rho[d]
         print(
             f"[3d] Date {date}: matched {len(xs)} tracks. "
-            f"Spearman correlation (Spotify vs YouTube rank): {corr:.3f}"
+            f"Spearman correlation (Spotify vs YouTube rank): {corr:.3f} "
+            f"[95% CI {ci_low[k]:.3f}, {ci_high[k]:.3f}], "
+            f"Kendall tau-b: {tau[d]:.3f}"
         )
 
         # Scatter plot
-        plt.figure()
-        plt.scatter(xs, ys)
-        plt.xlabel("Spotify rank (1 = best)")
-        plt.ylabel("YouTube rank (1 = most viewed)")
-        plt.title(f"Spotify vs YouTube ranks – {date}\nSpearman ≈ {corr:.3f}")
-        plt.gca().invert_xaxis()  # optional, so "better" ranks are on the left
-        plt.gca().invert_yaxis()  # "better" ranks at top
-        plt.tight_layout()
-
-        out_path = os.path.join(
-            PLOTS_DIR, f"s3d_rank_scatter_{date_str}.png"
-        )
-        plt.savefig(out_path, dpi=150)
-        plt.close()
+        jobs.append(RenderJob(
+            "scatter", {"x": xs, "y": ys},
+            {
+                "xlabel": "Spotify rank (1 = best)",
+                "ylabel": "YouTube rank (1 = most viewed)",
+                "title": f"Spotify vs YouTube ranks – {date}\nSpearman ≈ {corr:.3f}",
+                "invert_x": True,  # optional, so "better" ranks are on the left
+                "invert_y": True,  # "better" ranks at top
+            },
+            os.path.join(PLOTS_DIR, f"s3d_rank_scatter_{date_str}.png"),
+        ))
 
         print("   Example matched songs (Spotify rank -> YouTube rank):")
         for (sp_r, yt_r, (name, artists)) in list(
-            sorted(zip(xs, ys, names), key=lambda t: t[0])
+            sorted(zip(xs, ys, labels), key=lambda t: t[0])
         )[:5]:
-            print(f"   - {name} – {artists}: Spotify {sp_r}, YouTube {yt_r}")
+            print(f"   - {name} – {artists}: Spotify {sp_r}, YouTube {yt_r:g}")
+
+    manifest = render_jobs(jobs)
+    # clear old 3d plots so they don't multiply
+    clear_plots("s3d_", manifest)
+    rendered = sum(not entry["cached"] for entry in manifest)
+    print(f"[3d] {len(manifest)} scatter plots ({rendered} re-rendered).")
 
 
 # ---------------------------------------------------------------------
@@ -462,6 +452,7 @@ def main():
     print("Running Assignment 3 (Rich-Get-Richer) analyses...")
     print("Part 3a: plotting view-count distributions")
     plot_viewcount_distributions(num_days=5)
+    fit_viewcount_power_laws()
 
     # 3b and 3c are mainly theoretical / interpretative – handled in report.
 
@@ -0,0 +1,229 @@
+"""
+snapshot_daemon.py – collect daily chart snapshots into a ZIP archive
+
+The analyses (s1.py, s3.py, ass2.py) read archives of time-stamped
+snapshots such as
+
+    youtube_top100/20151109_1800_data.json
+
+where each member is the JSON list of video resources (snippet +
+statistics) in chart order. This daemon produces archives in exactly
+that format for a tracked set of video IDs: on a schedule it refreshes
+the statistics of all tracked videos through youtube_api (videos.list,
+50 IDs per call, 1 quota unit each), orders them by view count and
+appends the result as a new member to the archive (ZIP append mode –
+existing members are never rewritten).
+
+The snapshot store picks new members up incrementally (see
+snapshot_store.update_store), so the analyses only parse the new days.
+
+Usage:
+
+    python snapshot_daemon.py --ids tracked_ids.txt --archive data/hiphop_tracked.zip
+    python snapshot_daemon.py --ids data/my_hiphop_youtube_dataset.ndjson --at 06:00 --at 18:00
+    python snapshot_daemon.py --ids ids.txt --once --base-url http://127.0.0.1:8000
+
+`--base-url` points the client at another server, e.g. a local fake API.
+"""
+
+import os
+import json
+import asyncio
+import zipfile
+import argparse
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Sequence
+
+from youtube_api import API_BASE, ApiError, AsyncYouTubeClient, HttpTransport, api_key_from_env
+from video_dataset import iter_videos
+
+ARCHIVE_PATH = os.path.join("data", "youtube_tracked.zip")
+
+# Snapshot times (local time); 18:00 matches the existing archives.
+SNAPSHOT_TIMES = ("18:00",)
+
+SNAPSHOT_PARTS = "snippet,statistics"
+
+# Member names have minute resolution, so shorter intervals would only
+# produce snapshots that cannot be stored.
+MIN_INTERVAL_SECONDS = 60
+
+
+# ---------------------------------------------------------------------
+# Tracked IDs
+# ---------------------------------------------------------------------
+
+def load_tracked_ids(path: str) -> List[str]:
+    """
+    Video IDs to track, from a text file (one ID per line, '#' comments)
+    or from an a5 dataset (NDJSON or legacy JSON). Duplicates are dropped.
+    """
+    if path.endswith((".json", ".ndjson")):
+        ids = (v["id"] for v in iter_videos(path))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            ids = [line.split("#")[0].strip() for line in f]
+    return list(dict.fromkeys(vid for vid in ids if vid))
+
+
+# ---------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------
+
+def member_name(prefix: str, taken_at: datetime) -> str:
+    """Member name in the loaders' format: '<prefix>/YYYYMMDD_HHMM_data.json'."""
+    return f"{prefix}/{taken_at:%Y%m%d_%H%M}_data.json"
+
+
+def archive_prefix(zip_path: str) -> str:
+    """Folder inside the archive: the archive's file name without extension."""
+    return os.path.splitext(os.path.basename(zip_path))[0]
+
+
+def has_member(zip_path: str, name: str) -> bool:
+    if not os.path.exists(zip_path):
+        return False
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        return name in zf.namelist()
+
+
+def append_member(zip_path: str, name: str, items: list) -> bool:
+    """
+    Add one snapshot member to the archive (created if needed).
+    Returns False if a member of that name already exists.
+    """
+    os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
+    with zipfile.ZipFile(zip_path, "a", compression=zipfile.ZIP_DEFLATED) as zf:
+        if name in zf.namelist():
+            return False
+        zf.writestr(name, json.dumps(items, ensure_ascii=False))
+    return True
+
+
+def _view_count(item: dict) -> int:
+    try:
+        return int(item.get("statistics", {}).get("viewCount", -1))
+    except (TypeError, ValueError):
+        return -1
+
+
+async def take_snapshot(client: AsyncYouTubeClient, video_ids: Sequence[str]) -> list:
+    """
+    Current snippet + statistics of all tracked videos, most viewed first.
+    Videos the API no longer returns (deleted, private) are left out.
+    """
+    items = await client.videos_batched(list(video_ids), part=SNAPSHOT_PARTS)
+    items.sort(key=_view_count, reverse=True)
+    return items
+
+
+async def snapshot_once(
+    client: AsyncYouTubeClient,
+    video_ids: Sequence[str],
+    zip_path: str,
+    taken_at: datetime,
+) -> Optional[str]:
+    """
+    Take one snapshot and append it. Returns the member name (None if it
+    existed). The archive is checked first, so a snapshot that could not
+    be stored costs no quota.
+    """
+    name = member_name(archive_prefix(zip_path), taken_at)
+    if has_member(zip_path, name):
+        print(f"[daemon] {name} already in {zip_path}, skipped.")
+        return None
+    items = await take_snapshot(client, video_ids)
+    if not append_member(zip_path, name, items):
+        print(f"[daemon] {name} already in {zip_path}, skipped.")
+        return None
+    print(f"[daemon] {name}: {len(items)} of {len(video_ids)} videos.")
+    return name
+
+
+# ---------------------------------------------------------------------
+# Schedule
+# ---------------------------------------------------------------------
+
+def next_run(now: datetime, times: Sequence[str] = SNAPSHOT_TIMES) -> datetime:
+    """The first scheduled 'HH:MM' time strictly after `now`."""
+    candidates = []
+    for day in (now.date(), now.date() + timedelta(days=1)):
+        for t in times:
+            hour, minute = map(int, t.split(":"))
+            at = datetime(day.year, day.month, day.day, hour, minute)
+            if at > now:
+                candidates.append(at)
+    return min(candidates)
+
+
+async def run_daemon(
+    transport,
+    video_ids: Sequence[str],
+    zip_path: str = ARCHIVE_PATH,
+    times: Sequence[str] = SNAPSHOT_TIMES,
+    interval: Optional[float] = None,
+    max_snapshots: Optional[int] = None,
+    clock: Callable[[], datetime] = datetime.now,
+) -> List[str]:
+    """
+    Take snapshots until stopped (or `max_snapshots` were written):
+    at the given daily `times`, or every `interval` seconds if set.
+    A failed snapshot is logged and the daemon waits for the next slot.
+    Returns the names of the members written.
+    """
+    client = AsyncYouTubeClient(transport)
+    written: List[str] = []
+    while max_snapshots is None or len(written) < max_snapshots:
+        now = clock()
+        due = now + timedelta(seconds=interval) if interval else next_run(now, times)
+        await asyncio.sleep(max(0.0, (due - now).total_seconds()))
+        try:
+            name = await snapshot_once(client, video_ids, zip_path, due)
+        except (ApiError, OSError) as e:
+            # retries are exhausted or the quota is used up: skip this slot
+            print(f"[daemon] snapshot at {due:%Y-%m-%d %H:%M} failed: {e}")
+            continue
+        if name is not None:
+            written.append(name)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append scheduled YouTube snapshots to a ZIP archive.")
+    parser.add_argument("--ids", required=True, help="text file of video IDs, or an a5 dataset")
+    parser.add_argument("--archive", default=ARCHIVE_PATH)
+    parser.add_argument("--at", action="append", dest="times", help="daily snapshot time HH:MM (repeatable)")
+    parser.add_argument("--interval", type=float, help="seconds between snapshots instead of --at")
+    parser.add_argument("--once", action="store_true", help="take one snapshot now and exit")
+    parser.add_argument("--base-url", default=API_BASE, help="API base URL (e.g. a local fake server)")
+    parser.add_argument("--api-key", default=None, help="defaults to YOUTUBE_API_KEY from .env")
+    args = parser.parse_args(argv)
+    if args.interval is not None and args.interval < MIN_INTERVAL_SECONDS:
+        parser.error(f"--interval must be at least {MIN_INTERVAL_SECONDS} seconds (one snapshot per minute)")
+
+    video_ids = load_tracked_ids(args.ids)
+    transport = HttpTransport(args.api_key or api_key_from_env(), base_url=args.base_url)
+    print(f"[daemon] tracking {len(video_ids)} videos -> {args.archive}")
+
+    if args.once:
+        async def once():
+            client = AsyncYouTubeClient(transport)
+            await snapshot_once(client, video_ids, args.archive, datetime.now())
+
+        asyncio.run(once())
+        return
+
+    try:
+        asyncio.run(run_daemon(
+            transport,
+            video_ids,
+            args.archive,
+            times=args.times or SNAPSHOT_TIMES,
+            interval=args.interval,
+        ))
+    except KeyboardInterrupt:
+        print("[daemon] stopped.")
+
+
+if __name__ == "__main__":
+    main()
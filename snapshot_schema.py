@@ -0,0 +1,265 @@
+"""
+snapshot_schema.py – which fields we read from the snapshot JSON, and how
+
+Every loader only needs a handful of fields per chart entry (id, title,
+artists and the statistics counters), but the snapshots carry full API
+objects with descriptions, thumbnails, tags, ... This module declares
+the fields once, per archive kind, and extracts just those as columns.
+
+Dotted paths ('statistics.viewCount') are compiled to getter functions
+once, so extraction is a list comprehension per field. A field may list
+several paths; the first one that is present wins. That is how the
+YouTube id fallback works:
+
+    id.videoId  ->  resourceId.videoId  ->  id
+
+(search results carry {'id': {'videoId': ...}}, playlist items carry
+'resourceId', and videos().list results have a plain string id).
+
+An archive kind names an ArchiveFormat: the base schema ('youtube' or
+'spotify', which also fixes where the entries sit in the JSON), an
+optional override of the id paths and the pattern that finds the date
+in a member name. The dataset registry (datasets.py) registers extra
+kinds for sources that need their own id rule or date pattern.
+
+If orjson is installed it is used to parse the members, otherwise the
+standard json module.
+"""
+
+import re
+import json
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+MISSING = -1
+
+
+# ---------------------------------------------------------------------
+# JSON parsing
+# ---------------------------------------------------------------------
+
+def loads(raw: bytes):
+    """Parse one member's bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+# ---------------------------------------------------------------------
+# Paths
+# ---------------------------------------------------------------------
+
+def compile_path(path: str) -> Callable[[dict], object]:
+    """
+    Turn 'a.b.c' into a getter returning record['a']['b']['c'], or None
+    as soon as a level is missing or not a dict.
+
+    A segment ending in '[]' maps the rest of the path over a list:
+    'track.artists[].name' returns the list of artist names.
+    """
+    head, sep, rest = path.partition("[].")
+    if sep:
+        get_list = compile_path(head)
+        get_item = compile_path(rest)
+
+        def get_each(record):
+            values = get_list(record)
+            if not isinstance(values, list):
+                return None
+            return [get_item(v) for v in values]
+        return get_each
+
+    keys = path.split(".")
+    if len(keys) == 1:
+        (key,) = keys
+        return lambda record: record.get(key) if isinstance(record, dict) else None
+
+    def get(record):
+        value = record
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get
+
+
+def _first_of(getters: List[Callable]) -> Callable[[dict], object]:
+    if len(getters) == 1:
+        return getters[0]
+
+    def get(record):
+        for getter in getters:
+            value = getter(record)
+            if value is not None:
+                return value
+        return None
+    return get
+
+
+# ---------------------------------------------------------------------
+# Converters
+# ---------------------------------------------------------------------
+
+def to_count(value) -> int:
+    """API counters are strings; missing or malformed ones become -1."""
+    if value is None:
+        return MISSING
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def to_id(value) -> Optional[str]:
+    """Ids must be strings; anything else counts as missing."""
+    return value if isinstance(value, str) else None
+
+
+def join_names(value) -> str:
+    if not value:
+        return ""
+    return ", ".join(v for v in value if v is not None)
+
+
+def _default(fallback):
+    return lambda value: fallback if value is None else value
+
+
+# ---------------------------------------------------------------------
+# Schemas
+# ---------------------------------------------------------------------
+
+class Field(NamedTuple):
+    name: str
+    paths: Tuple[str, ...]
+    convert: Callable[[object], object]
+
+
+# Column order matches the store: id, title, artists, views, likes, dislikes
+SCHEMAS: Dict[str, Tuple[Field, ...]] = {
+    "youtube": (
+        Field("id", ("id.videoId", "resourceId.videoId", "id"), to_id),
+        Field("title", ("snippet.title",), _default("Unknown title")),
+        Field("artists", (), _default("")),
+        Field("views", ("statistics.viewCount",), to_count),
+        Field("likes", ("statistics.likeCount",), to_count),
+        Field("dislikes", ("statistics.dislikeCount",), to_count),
+    ),
+    "spotify": (
+        Field("id", ("track.id",), to_id),
+        Field("title", ("track.name",), _default("")),
+        Field("artists", ("track.artists[].name",), join_names),
+        Field("views", (), to_count),
+        Field("likes", (), to_count),
+        Field("dislikes", (), to_count),
+    ),
+}
+
+
+# ---------------------------------------------------------------------
+# Archive formats
+# ---------------------------------------------------------------------
+
+# Member names start with the snapshot date: 'youtube_top100/20151109_1800_data.json'
+DATE_PATTERN = r"^(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})_"
+
+
+class ArchiveFormat(NamedTuple):
+    base: str                       # key into SCHEMAS
+    id_paths: Tuple[str, ...] = ()  # replaces the base schema's id paths if given
+    date_pattern: str = DATE_PATTERN  # regex on the member's base name, with
+                                      # groups year, month, day
+
+
+FORMATS: Dict[str, ArchiveFormat] = {base: ArchiveFormat(base) for base in SCHEMAS}
+
+
+def register_format(kind: str, fmt: ArchiveFormat) -> None:
+    """
+    Make `kind` usable as an archive kind. Registering the same format
+    again is a no-op; redefining a kind raises ValueError.
+    """
+    fmt = ArchiveFormat(fmt.base, tuple(fmt.id_paths), fmt.date_pattern)
+    if fmt.base not in SCHEMAS:
+        raise ValueError(f"Unknown base schema {fmt.base!r}; expected one of {tuple(SCHEMAS)}")
+    missing = {"year", "month", "day"} - set(re.compile(fmt.date_pattern).groupindex)
+    if missing:
+        raise ValueError(f"Date pattern {fmt.date_pattern!r} lacks groups {sorted(missing)}")
+    existing = FORMATS.get(kind)
+    if existing is not None and existing != fmt:
+        raise ValueError(f"Archive kind {kind!r} is already registered with a different format")
+    FORMATS[kind] = fmt
+
+
+def format_of(kind: str) -> ArchiveFormat:
+    try:
+        return FORMATS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown archive kind {kind!r}; expected one of {tuple(FORMATS)}") from None
+
+
+def base_kind(kind: str) -> str:
+    return format_of(kind).base
+
+
+def fields_of(kind: str) -> Tuple[Field, ...]:
+    fmt = format_of(kind)
+    fields = SCHEMAS[fmt.base]
+    if not fmt.id_paths:
+        return fields
+    return tuple(f._replace(paths=fmt.id_paths) if f.name == "id" else f for f in fields)
+
+
+def records_of(kind: str, data, name: str = "") -> list:
+    """Return the list of chart entries inside one member's JSON."""
+    if base_kind(kind) == "spotify":
+        return data["tracks"]["items"]
+    if not isinstance(data, list):
+        raise TypeError(f"Expected list at top level in {name}, got {type(data)}")
+    return data
+
+
+_COMPILED: Dict[str, List[Tuple[Callable, Callable, bool]]] = {}
+
+
+def _compiled(kind: str) -> List[Tuple[Callable, Callable, bool]]:
+    compiled = _COMPILED.get(kind)
+    if compiled is None:
+        compiled = _COMPILED[kind] = [
+            (_first_of([compile_path(p) for p in f.paths]), f.convert, bool(f.paths))
+            for f in fields_of(kind)
+        ]
+    return compiled
+
+
+def extract_columns(kind: str, data, name: str = "") -> List[list]:
+    """
+    Extract the schema fields of `kind` from one parsed member.
+
+    Returns one list per field, in SCHEMAS order.
+    """
+    records = records_of(kind, data, name)
+    columns = []
+    for get, convert, has_paths in _compiled(kind):
+        if has_paths:
+            columns.append([convert(get(r)) for r in records])
+        else:
+            columns.append([convert(None)] * len(records))
+    return columns
+
+
+def project(kind: str, data, paths: Sequence[str], name: str = "") -> Dict[str, list]:
+    """Extract arbitrary dotted `paths` (raw values) from one parsed member."""
+    records = records_of(kind, data, name)
+    getters = {path: compile_path(path) for path in paths}
+    return {path: [get(r) for r in records] for path, get in getters.items()}
@@ -0,0 +1,875 @@
+"""
+snapshot_store.py – shared columnar store for the daily snapshot archives
+
+All assignments read the same ZIP archives of daily JSON snapshots
+(youtube_top100.zip, spotify_top100.zip and the two radio archives).
+Parsing those JSON files is by far the most expensive part of every run,
+so this module converts an archive ONCE into a compact columnar store
+and caches it next to the data:
+
+  data/cache/<archive name>.npz
+
+One row per (day, chart entry). Columns:
+  date      datetime64[D]   snapshot date (NaT if the filename has none)
+  item      int32           code into `item_ids` (video / track id), -1 = missing
+  title     int32           code into `titles`
+  artists   int32           code into `artists_dict` (Spotify only, else "")
+  position  int32           1-based position inside the day's JSON list
+  views     int64           viewCount   (-1 = missing)
+  likes     int64           likeCount   (-1 = missing)
+  dislikes  int64           dislikeCount (-1 = missing)
+
+Rows are grouped per day; `day_offsets[i]:day_offsets[i + 1]` is the row
+range of day i, so selecting a single day is a slice.
+
+The store also keeps which items were charted on which date, as a
+packed bitmap (presence_index.py answers its queries):
+  presence_dates  datetime64[D]   distinct snapshot dates (one column
+                                  per snapshot if the archive has no dates)
+  presence        uint8           items × ceil(dates / 8), np.packbits
+                                  layout (bit 7 of byte 0 = first date)
+It is built while assembling the store and, when new days only add
+later dates, extended with just those days.
+
+Next to the columns the store keeps a manifest of the members it was
+built from (name, CRC and size, per day). When the collector adds new
+daily files, load_store() parses only those members and appends them,
+so a daily refresh costs time proportional to the new data.
+
+JSON decoding is spread over a process pool (one ZipFile handle per
+worker); the decoded days are merged back in date order. Which fields
+are read from each entry is declared in snapshot_schema.py.
+"""
+
+import os
+import re
+import zlib
+import zipfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import snapshot_schema
+from instrument import span
+from snapshot_schema import MISSING
+from utils import evenly_spaced_indices, process_pool
+
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+
+CACHE_DIR = os.path.join("data", "cache")
+
+# Bump when the on-disk layout changes so old caches are rebuilt.
+STORE_VERSION = 3
+
+# Built-in archive kinds; datasets.py registers more (snapshot_schema.register_format).
+KINDS = ("youtube", "spotify")
+
+# Number of processes used to decode JSON members (None = one per CPU).
+DECODE_WORKERS = None
+
+# Below this many members per worker, decoding stays in-process.
+MIN_MEMBERS_PER_WORKER = 8
+
+# Upper bound for the stores kept by the session cache (see get_store).
+SESSION_MEMORY_BUDGET = 1024 ** 3
+
+
+# ---------------------------------------------------------------------
+# Day selection
+# ---------------------------------------------------------------------
+
+# A day selector gets the dates of all days of an archive (datetime.date,
+# or None for undated members) and returns the sorted indices to keep.
+# Selection only needs the member names, so it happens before any JSON
+# is decoded.
+DaySelector = Callable[[List], List[int]]
+
+
+def evenly_spaced(k: int) -> DaySelector:
+    """Selector for k days spread evenly over the archive (fewer if it is shorter)."""
+    def select(dates: List) -> List[int]:
+        if not dates:
+            return []
+        return evenly_spaced_indices(len(dates), min(k, len(dates)))
+    return select
+
+
+def date_range(start=None, end=None) -> DaySelector:
+    """Selector for the days with start <= date <= end (either bound optional)."""
+    def select(dates: List) -> List[int]:
+        return [
+            i for i, d in enumerate(dates)
+            if d is not None
+            and (start is None or d >= start)
+            and (end is None or d <= end)
+        ]
+    return select
+
+
+# ---------------------------------------------------------------------
+# Data containers
+# ---------------------------------------------------------------------
+
+@dataclass
+class SnapshotDay:
+    """
+    One day of a snapshot archive, as columns.
+
+    `ids`, `titles` and `artists` are numpy string arrays (None-free:
+    missing ids are ""), the counters are int64 with -1 for missing.
+    """
+    date: object
+    ids: np.ndarray
+    titles: np.ndarray
+    artists: np.ndarray
+    positions: np.ndarray
+    views: np.ndarray
+    likes: np.ndarray
+    dislikes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class SnapshotStore:
+    """Columnar contents of one snapshot archive (see module docstring)."""
+    source: str
+    kind: str
+    day_dates: np.ndarray
+    day_members: np.ndarray
+    day_crc: np.ndarray
+    day_size: np.ndarray
+    day_offsets: np.ndarray
+    date: np.ndarray
+    item: np.ndarray
+    item_ids: np.ndarray
+    title: np.ndarray
+    titles: np.ndarray
+    artists: np.ndarray
+    artists_dict: np.ndarray
+    position: np.ndarray
+    views: np.ndarray
+    likes: np.ndarray
+    dislikes: np.ndarray
+    presence_dates: np.ndarray
+    presence: np.ndarray
+
+    @property
+    def num_days(self) -> int:
+        return len(self.day_dates)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.item)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the store's arrays."""
+        return sum(getattr(self, name).nbytes for name in _ARRAY_FIELDS)
+
+    def day_date(self, i: int):
+        """Return day i as a datetime.date (or None if it has no date)."""
+        d = self.day_dates[i]
+        if np.isnat(d):
+            return None
+        return d.astype(object)
+
+    def day(self, i: int) -> SnapshotDay:
+        """Return day i as a SnapshotDay (cheap: slices + dictionary lookups)."""
+        lo, hi = self.day_offsets[i], self.day_offsets[i + 1]
+        codes = self.item[lo:hi]
+        ids = np.where(codes >= 0, self.item_ids[np.maximum(codes, 0)], "")
+        return SnapshotDay(
+            date=self.day_date(i),
+            ids=ids,
+            titles=self.titles[self.title[lo:hi]],
+            artists=self.artists_dict[self.artists[lo:hi]],
+            positions=self.position[lo:hi],
+            views=self.views[lo:hi],
+            likes=self.likes[lo:hi],
+            dislikes=self.dislikes[lo:hi],
+        )
+
+    def iter_days(self) -> Iterator[SnapshotDay]:
+        for i in range(self.num_days):
+            yield self.day(i)
+
+    def dates(self) -> List:
+        """Dates of all days as datetime.date objects (None if undated)."""
+        return [self.day_date(i) for i in range(self.num_days)]
+
+    def select_days(self, selector: Optional[DaySelector] = None) -> List[int]:
+        """Return the indices of the days picked by `selector` (all if None)."""
+        if selector is None:
+            return list(range(self.num_days))
+        return selector(self.dates())
+
+    def day_on(self, date) -> Optional[SnapshotDay]:
+        """
+        Return the day with the given date, or None. If an archive has
+        several snapshots on one date, the last one wins.
+        """
+        target = np.datetime64(date, "D")
+        i = int(np.searchsorted(self.day_dates, target, side="right")) - 1
+        if i < 0 or self.day_dates[i] != target:
+            return None
+        return self.day(i)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Expand the store into a row-per-entry DataFrame with columns:
+          date, video_id, title, likes, dislikes, views, position
+        (`date` holds datetime.date objects, like the old loaders did).
+        """
+        with span("store.to_frame", archive=os.path.basename(self.source)) as sp:
+            video_id = np.where(
+                self.item >= 0, self.item_ids[np.maximum(self.item, 0)], None
+            ).astype(object)
+            video_id[self.item < 0] = None
+            dates = pd.Series(self.date).dt.date.astype(object)
+            dates[pd.isna(self.date)] = None
+            df = pd.DataFrame(
+                {
+                    "date": dates.to_numpy(),
+                    "video_id": video_id,
+                    "title": self.titles[self.title].astype(object),
+                    "likes": self.likes,
+                    "dislikes": self.dislikes,
+                    "views": self.views,
+                    "position": self.position,
+                }
+            )
+            sp.count(records=len(df))
+        return df
+
+
+# ---------------------------------------------------------------------
+# Helpers: archive members
+# ---------------------------------------------------------------------
+
+def parse_member_date(name: str, kind: str = "youtube"):
+    """
+    Extract the date from a member name such as
+    'youtube_top100/20151109_1800_data.json', using the date pattern of
+    the archive kind (by default: the file name starts with YYYYMMDD_).
+    Returns None if the name does not match.
+    """
+    pattern = snapshot_schema.format_of(kind).date_pattern
+    m = re.search(pattern, os.path.basename(name))
+    if m is None:
+        return None
+    try:
+        return datetime(int(m.group("year")), int(m.group("month")), int(m.group("day"))).date()
+    except ValueError:
+        return None
+
+
+def list_day_members(names: List[str], kind: str) -> List[str]:
+    """
+    Return the JSON members that make up the days of an archive, sorted.
+
+    YouTube archives use every JSON member. Spotify archives sometimes
+    have several files for one date (e.g. 1328 and 1800); we keep one
+    per date and prefer the '_1800_' file, to align with YouTube time.
+    """
+    json_files = sorted(n for n in names if n.lower().endswith(".json"))
+    if snapshot_schema.base_kind(kind) != "spotify":
+        return json_files
+
+    by_date: Dict[str, List[str]] = {}
+    for name in json_files:
+        day = parse_member_date(name, kind)
+        key = day.isoformat() if day is not None else os.path.basename(name).split("_")[0]
+        by_date.setdefault(key, []).append(name)
+
+    members = []
+    for key in sorted(by_date):
+        candidates = by_date[key]
+        preferred = [c for c in candidates if "_1800_" in c]
+        members.append(preferred[0] if preferred else candidates[0])
+    return members
+
+
+# ---------------------------------------------------------------------
+# Streaming access
+# ---------------------------------------------------------------------
+
+def iter_archive_days(
+    zip_path: str,
+    kind: str = "youtube",
+    days: Optional[DaySelector] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[object, Dict[str, list]]]:
+    """
+    Stream selected days straight from the archive, without a store.
+
+    Days are picked by `days` (see evenly_spaced / date_range) from the
+    member names, so only the selected members are decompressed and
+    parsed, one at a time. Each day is projected to `fields` (dotted
+    paths inside one entry, e.g. 'statistics.viewCount' for YouTube or
+    'track.name' for Spotify) and the raw JSON is dropped before the
+    next member is read, so peak memory is one day regardless of how
+    long the archive is.
+
+    Yields:
+        (date, columns)  with columns = {field: [value per entry]}
+    """
+    _check_kind(zip_path, kind)
+    fields = list(fields or ["id"])
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        members = list_day_members(zf.namelist(), kind)
+        dates = [parse_member_date(m, kind) for m in members]
+        for i in (days(dates) if days is not None else range(len(members))):
+            data = snapshot_schema.loads(zf.read(members[i]))
+            yield dates[i], snapshot_schema.project(kind, data, fields, members[i])
+
+
+# ---------------------------------------------------------------------
+# Building the store
+# ---------------------------------------------------------------------
+
+class _Dictionary:
+    """
+    Growing string dictionary. Existing codes never change, so rows that
+    were encoded in an earlier ingest stay valid when new days are added.
+    """
+
+    def __init__(self, existing: Optional[np.ndarray] = None):
+        values = existing.tolist() if existing is not None else []
+        self.lookup: Dict[str, int] = {v: i for i, v in enumerate(values)}
+
+    def encode(self, values: List[Optional[str]]) -> np.ndarray:
+        """Return int32 codes for `values`; None becomes -1."""
+        lookup = self.lookup
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is None:
+                codes[i] = MISSING
+                continue
+            code = lookup.get(v)
+            if code is None:
+                code = lookup[v] = len(lookup)
+            codes[i] = code
+        return codes
+
+    def to_array(self) -> np.ndarray:
+        if not self.lookup:
+            return np.array([], dtype="<U1")
+        return np.array(list(self.lookup), dtype=str)
+
+
+def _manifest(zf: zipfile.ZipFile, kind: str) -> List[Tuple[str, int, int]]:
+    """Return (name, CRC, size) of every day member, from the ZIP directory."""
+    infos = {info.filename: info for info in zf.infolist()}
+    return [
+        (name, infos[name].CRC, infos[name].file_size)
+        for name in list_day_members(list(infos), kind)
+    ]
+
+
+def _decode_chunk(zip_path: str, names: List[str], kind: str, fmt=None):
+    """
+    Parse a run of members into compact arrays. Runs in a worker process,
+    so it opens its own ZipFile handle (and registers `fmt`, the archive
+    format of `kind`, in case the worker did not inherit it).
+
+    Strings are dictionary-encoded against chunk-local dictionaries
+    (merged into the store's dictionaries by _assemble), so what travels
+    back to the parent is a few small arrays per day, not Python dicts.
+
+    Returns:
+        (ids, titles, artists, days)
+    where ids/titles/artists are the chunk dictionaries (lists of str)
+    and days maps member name -> (item, title, artists, views, likes,
+    dislikes) arrays.
+    """
+    if fmt is not None:
+        snapshot_schema.register_format(kind, fmt)
+    ids, titles, artists = _Dictionary(), _Dictionary(), _Dictionary()
+    days = {}
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for name in names:
+            data = snapshot_schema.loads(zf.read(name))
+            vid, title, art, vc, lc, dc = snapshot_schema.extract_columns(kind, data, name)
+            days[name] = (
+                ids.encode(vid),
+                titles.encode(title),
+                artists.encode(art),
+                np.array(vc, dtype=np.int64),
+                np.array(lc, dtype=np.int64),
+                np.array(dc, dtype=np.int64),
+            )
+    return list(ids.lookup), list(titles.lookup), list(artists.lookup), days
+
+
+def _num_workers(workers: Optional[int], num_members: int) -> int:
+    if workers is None:
+        workers = DECODE_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, num_members // MIN_MEMBERS_PER_WORKER))
+
+
+def _decode_members(zip_path: str, names: List[str], kind: str, workers: Optional[int] = None) -> List[Tuple]:
+    """
+    Parse the given members, splitting them across a process pool.
+
+    Each worker gets contiguous runs of members (a few per worker, for
+    load balancing). Small jobs are decoded in-process, where starting a
+    pool would cost more than it saves.
+    """
+    workers = _num_workers(workers, len(names))
+    if workers <= 1:
+        return [_decode_chunk(zip_path, names, kind)] if names else []
+
+    num_chunks = workers * 4
+    size = -(-len(names) // num_chunks)
+    chunks = [names[i:i + size] for i in range(0, len(names), size)]
+    fmt = snapshot_schema.format_of(kind)
+    with process_pool(workers) as pool:
+        return list(
+            pool.map(
+                _decode_chunk,
+                [zip_path] * len(chunks), chunks, [kind] * len(chunks), [fmt] * len(chunks),
+            )
+        )
+
+
+def _read_manifest(zip_path: str, kind: str) -> List[Tuple[str, int, int]]:
+    with span("store.open", archive=os.path.basename(zip_path)) as sp:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            manifest = _manifest(zf, kind)
+        sp.count(members=len(manifest))
+    if not manifest:
+        raise FileNotFoundError(f"No JSON files inside ZIP: {zip_path}")
+    return manifest
+
+
+def _decode_entries(
+    zip_path: str, entries: List[Tuple[str, int, int]], kind: str, workers: Optional[int]
+) -> List[Tuple]:
+    """_decode_members for manifest entries, as an instrumented stage."""
+    with span("store.decode", archive=os.path.basename(zip_path), kind=kind) as sp:
+        chunks = _decode_members(zip_path, [m[0] for m in entries], kind, workers)
+        sp.count(
+            members=len(entries),
+            bytes=sum(m[2] for m in entries),
+            records=sum(len(arrays[0]) for chunk in chunks for arrays in chunk[3].values()),
+        )
+    return chunks
+
+
+def _assemble(
+    zip_path: str,
+    kind: str,
+    manifest: List[Tuple[str, int, int]],
+    chunks: List[Tuple],
+    base: Optional[SnapshotStore] = None,
+) -> SnapshotStore:
+    """
+    Build a store whose days follow `manifest` (i.e. in date order).
+    Days found in the decoded `chunks` are taken from there; all other
+    days are copied from `base`.
+    """
+    ids = _Dictionary(base.item_ids if base is not None else None)
+    titles = _Dictionary(base.titles if base is not None else None)
+    artists = _Dictionary(base.artists_dict if base is not None else None)
+    base_day = (
+        {m: i for i, m in enumerate(base.day_members.tolist())} if base is not None else {}
+    )
+
+    # chunk-local code -> store code; the trailing -1 makes code -1
+    # (missing) map to itself
+    decoded = {}
+    for chunk_ids, chunk_titles, chunk_artists, days in chunks:
+        remap = (
+            np.append(ids.encode(chunk_ids), MISSING),
+            np.append(titles.encode(chunk_titles), MISSING),
+            np.append(artists.encode(chunk_artists), MISSING),
+        )
+        for name, arrays in days.items():
+            decoded[name] = (remap, arrays)
+
+    columns = {name: [] for name in _ROW_FIELDS}
+    day_dates, offsets = [], [0]
+
+    for name, _, _ in manifest:
+        date = parse_member_date(name, kind)
+        if name in decoded:
+            (id_map, title_map, artist_map), (item, title, art, vc, lc, dc) = decoded[name]
+            n = len(item)
+            columns["item"].append(id_map[item])
+            columns["title"].append(title_map[title])
+            columns["artists"].append(artist_map[art])
+            columns["position"].append(np.arange(1, n + 1, dtype=np.int32))
+            columns["views"].append(vc)
+            columns["likes"].append(lc)
+            columns["dislikes"].append(dc)
+        else:
+            i = base_day[name]
+            lo, hi = base.day_offsets[i], base.day_offsets[i + 1]
+            n = hi - lo
+            for field in _ROW_FIELDS:
+                if field != "date":
+                    columns[field].append(getattr(base, field)[lo:hi])
+        columns["date"].append(np.full(n, date, dtype="datetime64[D]"))
+        day_dates.append(date)
+        offsets.append(offsets[-1] + n)
+
+    def concat(field, dtype):
+        parts = columns[field]
+        return np.concatenate(parts).astype(dtype, copy=False) if parts else np.array([], dtype=dtype)
+
+    day_dates = np.array(day_dates, dtype="datetime64[D]")
+    offsets = np.array(offsets, dtype=np.int64)
+    item = concat("item", np.int32)
+    item_ids = ids.to_array()
+
+    # the old days are an unchanged prefix: only add the new days' bits
+    presence = None
+    if base is not None and 0 < base.num_days < len(manifest) and (
+        manifest[:base.num_days] == _store_manifest(base)
+    ):
+        presence = _extend_presence(base, day_dates, offsets, item, len(item_ids))
+    if presence is None:
+        presence = _build_presence(day_dates, offsets, item, len(item_ids))
+
+    return SnapshotStore(
+        source=zip_path,
+        kind=kind,
+        day_dates=day_dates,
+        day_members=np.array([m[0] for m in manifest], dtype=str),
+        day_crc=np.array([m[1] for m in manifest], dtype=np.int64),
+        day_size=np.array([m[2] for m in manifest], dtype=np.int64),
+        day_offsets=offsets,
+        date=concat("date", "datetime64[D]"),
+        item=item,
+        item_ids=item_ids,
+        title=concat("title", np.int32),
+        titles=titles.to_array(),
+        artists=concat("artists", np.int32),
+        artists_dict=artists.to_array(),
+        position=concat("position", np.int32),
+        views=concat("views", np.int64),
+        likes=concat("likes", np.int64),
+        dislikes=concat("dislikes", np.int64),
+        presence_dates=presence[0],
+        presence=presence[1],
+    )
+
+
+def date_columns(day_dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct snapshot dates of a store and the column of every store
+    day (-1 for undated days). Without any dates, every snapshot is its
+    own column.
+    """
+    dated = ~np.isnat(day_dates)
+    if not dated.any():
+        return day_dates.copy(), np.arange(len(day_dates))
+    dates, day_col = np.unique(day_dates[dated], return_inverse=True)
+    col_of_day = np.full(len(day_dates), -1)
+    col_of_day[dated] = day_col
+    return dates, col_of_day
+
+
+def _set_presence(
+    bits: np.ndarray,
+    day_offsets: np.ndarray,
+    item: np.ndarray,
+    col_of_day: np.ndarray,
+    first_day: int = 0,
+) -> None:
+    """Set the bits of the rows of days first_day.. (one scatter, no dense matrix)."""
+    lo = day_offsets[first_day]
+    day_of_row = np.repeat(np.arange(first_day, len(day_offsets) - 1), np.diff(day_offsets[first_day:]))
+    codes, cols = item[lo:], col_of_day[day_of_row]
+    keep = (codes >= 0) & (cols >= 0)
+    codes, cols = codes[keep], cols[keep]
+    np.bitwise_or.at(bits, (codes, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+
+
+def _build_presence(day_dates, day_offsets, item, num_items) -> Tuple[np.ndarray, np.ndarray]:
+    dates, col_of_day = date_columns(day_dates)
+    bits = np.zeros((num_items, (len(dates) + 7) // 8), dtype=np.uint8)
+    _set_presence(bits, day_offsets, item, col_of_day)
+    return dates, bits
+
+
+def _extend_presence(base: SnapshotStore, day_dates, day_offsets, item, num_items):
+    """
+    The base store's bitmap plus the days after base.num_days, or None
+    if the new days do not only add later dates (then it is rebuilt).
+    """
+    n_old = base.num_days
+    old_dated, new_dated = ~np.isnat(base.day_dates), ~np.isnat(day_dates[n_old:])
+    if old_dated.any():
+        if not new_dated.all() or day_dates[n_old:].min() < base.presence_dates[-1]:
+            return None
+        later = np.unique(day_dates[n_old:])
+        dates = np.concatenate([base.presence_dates, later[later > base.presence_dates[-1]]])
+        col_of_day = np.concatenate([np.full(n_old, -1), np.searchsorted(dates, day_dates[n_old:])])
+    else:
+        if new_dated.any():
+            return None
+        dates = np.concatenate([base.presence_dates, day_dates[n_old:]])
+        col_of_day = np.arange(len(day_dates))
+
+    bits = np.zeros((num_items, (len(dates) + 7) // 8), dtype=np.uint8)
+    old_items, old_bytes = base.presence.shape
+    bits[:old_items, :old_bytes] = base.presence
+    _set_presence(bits, day_offsets, item, col_of_day, first_day=n_old)
+    return dates, bits
+
+
+def _check_kind(zip_path: str, kind: str) -> None:
+    snapshot_schema.format_of(kind)  # ValueError for unknown kinds
+    if not os.path.exists(zip_path):
+        raise FileNotFoundError(f"ZIP file not found: {zip_path}")
+
+
+def build_store(zip_path: str, kind: str = "youtube", workers: Optional[int] = None) -> SnapshotStore:
+    """
+    Parse every day of the archive into a SnapshotStore (no caching).
+
+    `workers` is the number of decoding processes (default: one per CPU,
+    see DECODE_WORKERS).
+    """
+    _check_kind(zip_path, kind)
+    manifest = _read_manifest(zip_path, kind)
+    chunks = _decode_entries(zip_path, manifest, kind, workers)
+    with span("store.assemble", archive=os.path.basename(zip_path)) as sp:
+        store = _assemble(zip_path, kind, manifest, chunks)
+        sp.count(records=store.num_rows)
+    return store
+
+
+def update_store(
+    store: SnapshotStore,
+    zip_path: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> Tuple[SnapshotStore, int]:
+    """
+    Bring `store` up to date with its archive, parsing only the members
+    that are new or changed since the store was built.
+
+    A member counts as unchanged when its (name, CRC, size) triple from
+    ZipFile.infolist() matches the store's manifest. Days whose member
+    disappeared from the archive are dropped.
+
+    Returns:
+        (store, number of members that were parsed)
+    """
+    zip_path = zip_path or store.source
+    _check_kind(zip_path, store.kind)
+
+    manifest = _read_manifest(zip_path, store.kind)
+    if _matches(store, manifest):
+        return store, 0
+    known = set(_store_manifest(store))
+    todo = [m for m in manifest if m not in known]
+    chunks = _decode_entries(zip_path, todo, store.kind, workers)
+
+    with span("store.assemble", archive=os.path.basename(zip_path)) as sp:
+        updated = _assemble(zip_path, store.kind, manifest, chunks, base=store)
+        sp.count(records=updated.num_rows)
+    return updated, len(todo)
+
+
+def _store_manifest(store: SnapshotStore) -> List[Tuple[str, int, int]]:
+    return list(
+        zip(store.day_members.tolist(), store.day_crc.tolist(), store.day_size.tolist())
+    )
+
+
+def _matches(store: SnapshotStore, manifest: List[Tuple[str, int, int]]) -> bool:
+    return _store_manifest(store) == manifest
+
+
+def days_crc(store: SnapshotStore, last_date: Optional[str]) -> str:
+    """
+    CRC of the manifest (member, CRC, size) of the store's days up to
+    `last_date` ('YYYY-MM-DD', None for no days). Tables derived from
+    those days keep it to notice when one of them has changed.
+    """
+    crc = 0
+    if last_date is not None:
+        processed = store.day_dates <= np.datetime64(last_date, "D")
+        manifest = _store_manifest(store)
+        for i in np.flatnonzero(processed).tolist():
+            name, member_crc, size = manifest[i]
+            crc = zlib.crc32(f"{name}:{member_crc}:{size}\n".encode(), crc)
+    return f"{crc:08x}"
+
+
+def store_is_current(store: SnapshotStore, zip_path: Optional[str] = None) -> bool:
+    """True if the store was built from exactly the archive's current members."""
+    with zipfile.ZipFile(zip_path or store.source, "r") as zf:
+        return _matches(store, _manifest(zf, store.kind))
+
+
+# ---------------------------------------------------------------------
+# Cache on disk
+# ---------------------------------------------------------------------
+
+_ROW_FIELDS = (
+    "date", "item", "title", "artists", "position", "views", "likes", "dislikes",
+)
+
+_ARRAY_FIELDS = (
+    "day_dates", "day_members", "day_crc", "day_size", "day_offsets",
+    "item_ids", "titles", "artists_dict", "presence_dates", "presence",
+) + _ROW_FIELDS
+
+
+def cache_path_for(zip_path: str, kind: str = "youtube") -> str:
+    """Return the .npz cache path used for the given archive."""
+    stem = os.path.splitext(os.path.basename(zip_path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}.{kind}.npz")
+
+
+def save_store(store: SnapshotStore, path: str) -> None:
+    """Write the store to `path` (atomically, via a temporary file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with span("store.cache_save", archive=os.path.basename(store.source)) as sp:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(STORE_VERSION),
+                kind=np.array(store.kind),
+                **{name: getattr(store, name) for name in _ARRAY_FIELDS},
+            )
+        os.replace(tmp_path, path)
+        sp.count(records=store.num_rows, bytes=os.path.getsize(path))
+
+
+def read_cached_store(zip_path: str, kind: str = "youtube") -> Optional[SnapshotStore]:
+    """Return the cached store of an archive as-is (possibly stale), or None."""
+    path = cache_path_for(zip_path, kind)
+    if not os.path.exists(path):
+        return None
+    with span("store.cache_load", archive=os.path.basename(zip_path)) as sp:
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                if int(npz["version"]) != STORE_VERSION or str(npz["kind"]) != kind:
+                    return None
+                arrays = {name: npz[name] for name in _ARRAY_FIELDS}
+        except (OSError, KeyError, ValueError):
+            return None
+        sp.count(records=len(arrays["item"]), bytes=os.path.getsize(path))
+    return SnapshotStore(source=zip_path, kind=kind, **arrays)
+
+
+def load_store(
+    zip_path: str,
+    kind: str = "youtube",
+    use_cache: bool = True,
+    incremental: bool = True,
+    workers: Optional[int] = None,
+) -> SnapshotStore:
+    """
+    Return the columnar store for an archive.
+
+    On the first call the archive is parsed and written to CACHE_DIR.
+    Later calls load the .npz and, in incremental mode, only parse the
+    daily members that were added or changed since (see update_store).
+    With incremental=False any change to the archive triggers a full
+    rebuild. `workers` is passed on to the parallel decoder.
+    """
+    _check_kind(zip_path, kind)
+    if not use_cache:
+        return build_store(zip_path, kind, workers)
+
+    cached = read_cached_store(zip_path, kind)
+    if cached is not None:
+        if incremental:
+            store, parsed = update_store(cached, zip_path, workers)
+            if parsed:
+                save_store(store, cache_path_for(zip_path, kind))
+            return store
+        if store_is_current(cached, zip_path):
+            return cached
+
+    store = build_store(zip_path, kind, workers)
+    save_store(store, cache_path_for(zip_path, kind))
+    return store
+
+
+# ---------------------------------------------------------------------
+# Session cache
+# ---------------------------------------------------------------------
+
+# (absolute zip path, kind) -> store, least recently used first
+_SESSION: "OrderedDict[Tuple[str, str], SnapshotStore]" = OrderedDict()
+
+# one lock per key, so concurrent callers (pipeline.py runs stages in
+# threads) load each archive once, while different archives load in parallel
+_SESSION_LOCK = threading.Lock()
+_LOAD_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def get_store(zip_path: str, kind: str = "youtube") -> SnapshotStore:
+    """
+    Return the store for an archive, loading it at most once per process.
+
+    All analyses in a run should go through this function so they share
+    one decoded copy of each archive. Stores stay cached until
+    invalidate_session() is called; when the cached stores exceed
+    SESSION_MEMORY_BUDGET bytes, the least recently used ones are dropped.
+    The archive is not re-checked for changes while a store is cached.
+    """
+    key = (os.path.abspath(zip_path), kind)
+    with _SESSION_LOCK:
+        store = _SESSION.get(key)
+        if store is not None:
+            _SESSION.move_to_end(key)
+            return store
+        load_lock = _LOAD_LOCKS.setdefault(key, threading.Lock())
+
+    with load_lock:
+        with _SESSION_LOCK:
+            store = _SESSION.get(key)
+        if store is not None:
+            return store
+        store = load_store(zip_path, kind)
+        with _SESSION_LOCK:
+            _SESSION[key] = store
+            _evict(keep=key)
+    return store
+
+
+def _evict(keep: Tuple[str, str]) -> None:
+    total = sum(s.nbytes for s in _SESSION.values())
+    for key in list(_SESSION):
+        if total <= SESSION_MEMORY_BUDGET:
+            break
+        if key == keep:
+            continue
+        total -= _SESSION.pop(key).nbytes
+
+
+def invalidate_session(zip_path: Optional[str] = None, kind: Optional[str] = None) -> None:
+    """
+    Drop cached stores so the next get_store() reloads them.
+
+    Without arguments the whole session cache is cleared; otherwise only
+    the entries matching `zip_path` and/or `kind`.
+    """
+    path = os.path.abspath(zip_path) if zip_path is not None else None
+    with _SESSION_LOCK:
+        for key in list(_SESSION):
+            if (path is None or key[0] == path) and (kind is None or key[1] == kind):
+                del _SESSION[key]
+
+
+def session_nbytes() -> int:
+    """Memory currently held by the session cache."""
+    return sum(s.nbytes for s in _SESSION.values())
@@ -0,0 +1,55 @@
+"""
+Pipeline stages that render through render_farm must not draw at the
+same time as the pyplot stages (matplotlib is not thread-safe).
+
+Runs the s3 render stages next to s1.1a and ass2.views with several
+jobs, on archives from the benchmark generator, and forces every
+render_farm batch into the in-process branch.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pipeline  # noqa: E402
+import render_farm  # noqa: E402
+import snapshot_store  # noqa: E402
+from gen_data import generate  # noqa: E402
+
+STAGES = ["s3.3a", "s3.powerlaw", "s3.3d", "s1.1a", "ass2.views"]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    generate(str(tmp_path / "data"), days=40, chart_size=50, seed=0)
+    monkeypatch.chdir(tmp_path)
+    snapshot_store.invalidate_session()
+    yield tmp_path
+    snapshot_store.invalidate_session()
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads often, so unsynchronised drawing would interleave."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_render_stages_next_to_pyplot_stages(workdir, fast_switching, monkeypatch):
+    monkeypatch.setattr(render_farm, "MIN_JOBS_PER_WORKER", 10 ** 6)
+    names = pipeline.select(STAGES)
+    for _ in range(3):
+        for plots in ("plots", "figures"):
+            if os.path.isdir(plots):
+                for fname in os.listdir(plots):
+                    os.remove(os.path.join(plots, fname))
+        status = pipeline.run_stages(names, jobs=4)
+        assert status == {n: "ok" for n in names}
+    assert any(f.startswith("s3a_") for f in os.listdir("plots"))
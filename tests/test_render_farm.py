@@ -0,0 +1,52 @@
+"""
+render_jobs() called from several threads at once, as the pipeline
+stages do: batches small enough to be drawn in-process must not draw
+concurrently (matplotlib's mathtext breaks on log-axis tick labels).
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render_farm  # noqa: E402
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads often, so unsynchronised drawing would interleave."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_in_process_batches_from_threads(tmp_path, fast_switching):
+    errors = []
+
+    def render(t):
+        x = np.arange(1, 50)
+        jobs = [
+            render_farm.RenderJob(
+                "line", {"x": x, "y": x ** (-1.0 - 0.1 * k - t)}, {"loglog": True},
+                str(tmp_path / f"{t}_{k}.png"),
+            )
+            for k in range(6)
+        ]
+        try:
+            render_farm.render_jobs(jobs, workers=1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=render, args=(t,)) for t in range(6)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert errors == []
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".png")]) == 36
@@ -0,0 +1,40 @@
+"""
+iter_videos() tolerates a record torn by an interrupted writer at the
+end of the file, but not a corrupt record in the middle of it.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import video_dataset  # noqa: E402
+
+
+@pytest.fixture
+def lines(tmp_path):
+    path = str(tmp_path / "videos.ndjson")
+    video_dataset.write_dataset(path, {"query": "q"}, [{"id": str(i)} for i in range(5)])
+    with open(path, encoding="utf-8") as f:
+        return path, f.readlines()
+
+
+def _write(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def test_torn_last_line_is_skipped(lines):
+    path, content = lines
+    _write(path, content + ['{"id": "5", "ti'])
+    assert [v["id"] for v in video_dataset.iter_videos(path)] == ["0", "1", "2", "3", "4"]
+
+
+def test_corrupt_line_mid_file_raises(lines):
+    path, content = lines
+    content[3] = '{"id": broken\n'
+    _write(path, content)
+    with pytest.raises(ValueError, match=r":4: corrupt record"):
+        list(video_dataset.iter_videos(path))
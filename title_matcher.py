@@ -0,0 +1,147 @@
+"""
+title_matcher.py – match Spotify tracks to YouTube videos by title
+
+YouTube titles look like 'Artist - Track (Official Video) ft. Someone',
+so a track is matched by the words of its name and its artists that
+occur in the title. Instead of testing every track against every title
+with substring checks, we build an inverted index over the normalized
+YouTube titles once:
+
+    token -> [title indices that contain it]
+
+A query then only looks at titles sharing at least one informative
+token with the track, and scores each candidate (see TitleIndex.match).
+Tokens are weighted by inverse document frequency, so words such as
+'remix' count less than rare ones.
+"""
+
+import math
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+# Words in YouTube titles that never identify a song.
+NOISE_TOKENS = {
+    "official", "video", "audio", "lyric", "lyrics", "music", "hd", "hq",
+    "ft", "feat", "featuring", "vevo", "clip", "version", "live",
+}
+
+# Tokens in more than this fraction of titles are not used to find candidates.
+MAX_POSTING_FRACTION = 0.2
+
+# Score weights (they sum to 1, so scores are in [0, 1]).
+W_NAME = 0.55     # share of the track name found in the title
+W_ARTIST = 0.25   # share of the artist names found in the title
+W_PHRASE = 0.10   # track name appears as one phrase in the title
+W_TITLE = 0.10    # share of the title explained by name + artists
+
+MIN_SCORE = 0.5
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+class Match(NamedTuple):
+    video_id: str
+    title: str
+    score: float
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and turn punctuation into single spaces."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in normalize(text).split() if t not in NOISE_TOKENS]
+
+
+class TitleIndex:
+    """Inverted index over a list of YouTube titles."""
+
+    def __init__(self, video_ids: Sequence[str], titles: Sequence[str]):
+        self.video_ids = list(video_ids)
+        self.titles = list(titles)
+        self.normalized = [" " + normalize(t) + " " for t in self.titles]
+        self.tokens = [set(tokenize(t)) for t in self.titles]
+
+        postings: Dict[str, List[int]] = {}
+        for i, tokens in enumerate(self.tokens):
+            for tok in tokens:
+                postings.setdefault(tok, []).append(i)
+        self.postings = postings
+
+        n = max(len(self.titles), 1)
+        self.idf = {tok: math.log(1 + n / len(docs)) for tok, docs in postings.items()}
+        self._max_posting = max(1, int(MAX_POSTING_FRACTION * n))
+        self._default_idf = math.log(1 + n)
+        self.title_weight = [sum(self.idf[t] for t in tokens) for tokens in self.tokens]
+
+    def _weight(self, tok: str) -> float:
+        return self.idf.get(tok, self._default_idf)
+
+    def candidates(self, tokens: Sequence[str]) -> List[int]:
+        """Titles sharing a selective token with the query."""
+        postings = [self.postings[t] for t in tokens if t in self.postings]
+        selective = [p for p in postings if len(p) <= self._max_posting]
+        found = set()
+        for docs in (selective or postings):
+            found.update(docs)
+        return list(found)
+
+    def match(self, name: str, artists: str = "", min_score: float = MIN_SCORE) -> Optional[Match]:
+        """
+        Return the best-scoring title for a track, or None.
+
+        The score combines how much of the track name (W_NAME) and of the
+        artist names (W_ARTIST) occurs in the title, a bonus when the
+        whole name occurs as a phrase (W_PHRASE), and how much of the
+        title is explained by name and artists (W_TITLE, which prefers
+        'Song 1' over 'Song 17' for the track 'Song 1').
+        """
+        name_tokens = set(tokenize(name))
+        if not name_tokens:
+            return None
+        artist_tokens = set(tokenize(artists.replace(",", " "))) - name_tokens
+        phrase = " " + normalize(name) + " "
+
+        name_weight = sum(self._weight(t) for t in name_tokens)
+        artist_weight = sum(self._weight(t) for t in artist_tokens)
+
+        best, best_score = None, min_score
+        for i in self.candidates(list(name_tokens)):
+            title_tokens = self.tokens[i]
+            name_hit = sum(self._weight(t) for t in name_tokens & title_tokens)
+            artist_hit = sum(self._weight(t) for t in artist_tokens & title_tokens)
+
+            score = W_NAME * name_hit / name_weight
+            if artist_weight:
+                score += W_ARTIST * artist_hit / artist_weight
+            if phrase in self.normalized[i]:
+                score += W_PHRASE
+            if self.title_weight[i]:
+                score += W_TITLE * (name_hit + artist_hit) / self.title_weight[i]
+
+            if score > best_score:
+                best, best_score = i, score
+
+        if best is None:
+            return None
+        return Match(self.video_ids[best], self.titles[best], best_score)
+
+
+def match_tracks(
+    index: TitleIndex,
+    track_ids: Sequence[str],
+    names: Sequence[str],
+    artists: Sequence[str],
+    min_score: float = MIN_SCORE,
+) -> Dict[str, Match]:
+    """Match every track against the index; returns track_id -> Match."""
+    matches = {}
+    for track_id, name, art in zip(track_ids, names, artists):
+        m = index.match(name, art, min_score)
+        if m is not None:
+            matches[track_id] = m
+    return matches
@@ -0,0 +1,152 @@
+"""
+track_mapping.py – persistent Spotify track -> YouTube video mapping
+
+Matching titles is only needed once per track: after a Spotify track has
+been mapped to a YouTube video, the mapping does not change. This module
+keeps the mapping in a small JSON table,
+
+  data/cache/spotify_youtube_mapping.json
+
+{
+  "version": 2,
+  "sources": [                         # archives the table was built from
+    {"name": "youtube_top100.zip", "days": "1c9a03f7"},
+    {"name": "spotify_top100.zip", "days": "5e20b1d4"}
+  ],
+  "last_date": "2016-11-28",          # newest day already processed
+  "entries": {
+    "<spotify id>": {
+      "youtube_id": "...",
+      "score": 0.93,                   # title_matcher confidence
+      "mapped_on": "2015-11-09",       # day the mapping was established
+      "name": "...", "artists": "..."
+    },
+    ...
+  }
+}
+
+update_mapping() walks the days after `last_date` and only matches
+tracks that have no entry yet, against that day's YouTube chart. Tracks
+entering the charts later are therefore picked up on the first day they
+can be matched, and later runs only look at new days.
+
+`days` is a CRC of the store manifest (member name, CRC, size) of the
+days up to `last_date`. Appending new days to an archive keeps the
+table; a regenerated archive or a corrected day that was already
+processed changes the CRC, and the table is rebuilt.
+"""
+
+import os
+import json
+from datetime import date as date_type
+from typing import Dict, List, Optional, Sequence
+
+from snapshot_store import CACHE_DIR, SnapshotStore, days_crc
+from title_matcher import MIN_SCORE, TitleIndex
+
+MAPPING_PATH = os.path.join(CACHE_DIR, "spotify_youtube_mapping.json")
+
+MAPPING_VERSION = 2
+
+
+def source_fingerprints(stores: Sequence[SnapshotStore], last_date: Optional[str]) -> List[dict]:
+    """Name and manifest CRC of the days up to `last_date` of every store (see module docstring)."""
+    return [
+        {"name": os.path.basename(store.source), "days": days_crc(store, last_date)}
+        for store in stores
+    ]
+
+
+def empty_mapping(stores: Sequence[SnapshotStore] = ()) -> dict:
+    return {
+        "version": MAPPING_VERSION,
+        "sources": source_fingerprints(stores, None),
+        "last_date": None,
+        "entries": {},
+    }
+
+
+def load_mapping(path: str = MAPPING_PATH, stores: Sequence[SnapshotStore] = ()) -> dict:
+    """
+    Load the mapping table, or return an empty one if there is none yet.
+
+    `stores` are the archives the mapping is built from (YouTube and
+    Spotify); a table built from other archives, or from days that have
+    changed since, is discarded.
+    """
+    if not os.path.exists(path):
+        return empty_mapping(stores)
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if (
+        table.get("version") != MAPPING_VERSION
+        or table.get("sources") != source_fingerprints(stores, table.get("last_date"))
+    ):
+        return empty_mapping(stores)
+    return table
+
+
+def save_mapping(table: dict, path: str = MAPPING_PATH) -> None:
+    """Write the mapping table (atomically, via a temporary file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def update_mapping(
+    table: dict,
+    yt: SnapshotStore,
+    sp: SnapshotStore,
+    dates: List[date_type],
+    min_score: float = MIN_SCORE,
+) -> int:
+    """
+    Extend `table` with tracks first seen on the given days.
+
+    Only days after table['last_date'] are processed, and on each day
+    only Spotify tracks without an entry are matched (against that day's
+    YouTube titles). Returns the number of new mappings.
+    """
+    entries = table["entries"]
+    last = table["last_date"]
+    added = 0
+
+    for d in sorted(dates):
+        if last is not None and d.isoformat() <= last:
+            continue
+        yt_day, sp_day = yt.day_on(d), sp.day_on(d)
+        if yt_day is None or sp_day is None:
+            continue
+
+        todo = [
+            (sp_id, name, artists)
+            for sp_id, name, artists in zip(
+                sp_day.ids.tolist(), sp_day.titles.tolist(), sp_day.artists.tolist()
+            )
+            if sp_id not in entries
+        ]
+        if todo:
+            index = TitleIndex(yt_day.ids.tolist(), yt_day.titles.tolist())
+            for sp_id, name, artists in todo:
+                m = index.match(name, artists, min_score)
+                if m is None:
+                    continue
+                entries[sp_id] = {
+                    "youtube_id": m.video_id,
+                    "score": round(m.score, 4),
+                    "mapped_on": d.isoformat(),
+                    "name": name,
+                    "artists": artists,
+                }
+                added += 1
+        table["last_date"] = d.isoformat()
+
+    table["sources"] = source_fingerprints([yt, sp], table["last_date"])
+    return added
+
+
+def as_dict(table: dict) -> Dict[str, str]:
+    """Return the table as spotify_id -> youtube_video_id."""
+    return {sp_id: e["youtube_id"] for sp_id, e in table["entries"].items()}
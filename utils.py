@@ -0,0 +1,39 @@
+"""
+utils.py – small helpers shared by several modules
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+# ---------------------------------------------------------------------
+# Process pools
+# ---------------------------------------------------------------------
+
+# Pools are created from threads (pipeline stages, datasets.load_stores)
+# while other threads run or hold locks; forking such a process can
+# leave a worker with a lock that is never released. Workers therefore
+# start from a fresh interpreter: via a fork server where there is one,
+# else spawned.
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """A ProcessPoolExecutor whose workers do not inherit this process's threads."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT)
+
+
+# ---------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------
+
+def evenly_spaced_indices(n: int, k: int) -> List[int]:
+    """
+    Pick k indices evenly spaced from range(0, n).
+    Assumes k <= n and k >= 1.
+    """
+    if k == 1:
+        return [0]
+    return [round(i * (n - 1) / (k - 1)) for i in range(k)]
@@ -0,0 +1,348 @@
+"""
+velocity_metrics.py – incremental per-video growth metrics
+
+s1 looks at likes - dislikes per snapshot and ass2 at cumulative views;
+what we alert on is how fast those numbers move. This module keeps a
+rolling state per video and updates it one snapshot day at a time:
+
+  views, diff      last cumulative views and likes - dislikes
+  delta            views gained per day since the previous observation
+  diff_delta       change of likes - dislikes per day
+  accel            change of `delta` per day
+  ewma_fast/slow   exponentially weighted means of `delta`
+                   (half-lives of EWMA_FAST_DAYS and EWMA_SLOW_DAYS)
+  rate_7d          views gained in the last WINDOW_DAYS days, per day
+
+Updating with a new day touches only the videos of that day (plus one
+column of the rolling window), never the history before it. Gaps are
+handled per video: delta, accel and diff_delta are divided by the gap
+and the EWMAs decay by it; rate_7d counts the whole increment on the
+day it was observed.
+
+The state persists next to the store cache, so a daily run only
+processes the days that arrived since the previous run:
+
+  data/cache/velocity_<archive>.npz
+
+Usage:
+
+    state, processed = velocity_for("data/youtube_top100.zip")
+    df = metrics_frame(state)          # one row per video
+    df.nlargest(10, "ewma_fast")
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import datasets
+from instrument import span
+from snapshot_store import CACHE_DIR, SnapshotDay, SnapshotStore, get_store
+
+VELOCITY_VERSION = 1
+
+WINDOW_DAYS = 7
+EWMA_FAST_DAYS = 3.0     # half-life in days
+EWMA_SLOW_DAYS = 14.0
+
+# "never" for days and slots (the int64 value of NaT)
+NO_DAY = np.iinfo(np.int64).min
+
+
+def velocity_path_for(zip_path: str) -> str:
+    stem = os.path.splitext(os.path.basename(zip_path))[0]
+    return os.path.join(CACHE_DIR, f"velocity_{stem}.npz")
+
+
+def _decay(half_life: float, gap: np.ndarray) -> np.ndarray:
+    """Weight kept by an EWMA with the given half-life after `gap` days."""
+    return np.power(0.5, gap / half_life)
+
+
+# ---------------------------------------------------------------------
+# State
+# ---------------------------------------------------------------------
+
+@dataclass
+class VelocityState:
+    """
+    Rolling metrics of every video seen so far (one entry per video,
+    in order of first appearance). Days are int64 epoch days.
+
+    The per-video arrays have spare capacity for new videos (grown by
+    doubling, see _add_videos); only the first `length` entries are
+    videos. Use the properties / metrics_frame() rather than the raw
+    arrays.
+    """
+    source: str
+    last_day: int               # last processed snapshot day
+    video_ids: np.ndarray       # object (str)
+    seen_day: np.ndarray        # int64, last day the video had views
+    n_obs: np.ndarray           # int32
+    views: np.ndarray           # float64 (NaN = not seen yet)
+    diff: np.ndarray
+    delta: np.ndarray
+    diff_delta: np.ndarray
+    accel: np.ndarray
+    ewma_fast: np.ndarray
+    ewma_slow: np.ndarray
+    window: np.ndarray          # float64, videos × WINDOW_DAYS: views gained per slot
+    slot_day: np.ndarray        # int64, WINDOW_DAYS: day each slot holds
+    length: int = -1            # videos in use (default: all entries)
+
+    def __post_init__(self):
+        if self.length < 0:
+            self.length = len(self.video_ids)
+        self.column: Dict[str, int] = {
+            vid: j for j, vid in enumerate(self.video_ids[:self.length].tolist())
+        }
+
+    @property
+    def num_videos(self) -> int:
+        return self.length
+
+    @property
+    def capacity(self) -> int:
+        return len(self.video_ids)
+
+    def live(self, name: str) -> np.ndarray:
+        """The in-use part of a per-video array."""
+        return getattr(self, name)[:self.length]
+
+    @property
+    def last_date(self) -> Optional[np.datetime64]:
+        if self.last_day == NO_DAY:
+            return None
+        return np.datetime64(self.last_day, "D")
+
+
+_PER_VIDEO = (
+    "video_ids", "seen_day", "n_obs", "views", "diff", "delta", "diff_delta",
+    "accel", "ewma_fast", "ewma_slow", "window",
+)
+
+# value of unused / new entries per array
+_FILL = {"video_ids": None, "seen_day": NO_DAY, "n_obs": 0, "window": 0.0}
+
+MIN_CAPACITY = 64
+
+
+def empty_state(source: str) -> VelocityState:
+    nan = np.empty(0, dtype=np.float64)
+    return VelocityState(
+        source=source,
+        last_day=NO_DAY,
+        video_ids=np.empty(0, dtype=object),
+        seen_day=np.empty(0, dtype=np.int64),
+        n_obs=np.empty(0, dtype=np.int32),
+        views=nan, diff=nan.copy(), delta=nan.copy(), diff_delta=nan.copy(),
+        accel=nan.copy(), ewma_fast=nan.copy(), ewma_slow=nan.copy(),
+        window=np.zeros((0, WINDOW_DAYS)),
+        slot_day=np.full(WINDOW_DAYS, NO_DAY, dtype=np.int64),
+    )
+
+
+def _grow(state: VelocityState, needed: int) -> None:
+    """Reallocate the per-video arrays to hold `needed` videos (at least doubling)."""
+    capacity = max(needed, 2 * state.capacity, MIN_CAPACITY)
+    n = state.length
+    for name in _PER_VIDEO:
+        old = getattr(state, name)
+        new = np.full((capacity,) + old.shape[1:], _FILL.get(name, np.nan), dtype=old.dtype)
+        new[:n] = old[:n]
+        setattr(state, name, new)
+
+
+def _add_videos(state: VelocityState, new_ids: np.ndarray) -> None:
+    """Add entries for videos seen for the first time (amortised O(new videos))."""
+    start, end = state.length, state.length + len(new_ids)
+    if end > state.capacity:
+        _grow(state, end)
+    state.video_ids[start:end] = new_ids
+    state.length = end
+    state.column.update((vid, start + k) for k, vid in enumerate(new_ids.tolist()))
+
+
+# ---------------------------------------------------------------------
+# Updating
+# ---------------------------------------------------------------------
+
+def _advance_window(state: VelocityState, day: int) -> int:
+    """Clear the slots of the days between the last processed day and `day`."""
+    first = day - WINDOW_DAYS + 1
+    if state.last_day != NO_DAY:
+        first = max(first, state.last_day + 1)
+    for d in range(first, day + 1):
+        slot = d % WINDOW_DAYS
+        state.window[:, slot] = 0.0
+        state.slot_day[slot] = d
+    return day % WINDOW_DAYS
+
+
+def update_day(state: VelocityState, snapshot: SnapshotDay) -> bool:
+    """
+    Fold one snapshot day into the state. Days at or before the last
+    processed day (and undated days) are ignored. Returns True if the
+    day was applied.
+    """
+    if snapshot.date is None:
+        return False
+    day = int(np.datetime64(snapshot.date, "D").astype(np.int64))
+    if state.last_day != NO_DAY and day <= state.last_day:
+        return False
+
+    ok = (snapshot.ids != "") & (snapshot.views >= 0)
+    ids, first = np.unique(snapshot.ids[ok], return_index=True)   # first entry per id
+    views = snapshot.views[ok][first].astype(np.float64)
+    likes = snapshot.likes[ok][first]
+    dislikes = snapshot.dislikes[ok][first]
+    diff = np.where((likes >= 0) & (dislikes >= 0), likes - dislikes, np.nan).astype(np.float64)
+
+    new = np.array([vid not in state.column for vid in ids.tolist()], dtype=bool)
+    if new.any():
+        _add_videos(state, ids[new])
+    cols = np.fromiter((state.column[vid] for vid in ids.tolist()), dtype=np.int64, count=len(ids))
+    slot = _advance_window(state, day)
+
+    prev_day = state.seen_day[cols]
+    has_prev = prev_day != NO_DAY
+    gap = np.where(has_prev, day - prev_day, 1).astype(np.float64)
+
+    gained = np.where(has_prev, views - state.views[cols], np.nan)
+    delta = gained / gap
+    accel = (delta - state.delta[cols]) / gap
+    diff_delta = (diff - state.diff[cols]) / gap
+
+    for name, half_life in (("ewma_fast", EWMA_FAST_DAYS), ("ewma_slow", EWMA_SLOW_DAYS)):
+        old = getattr(state, name)[cols]
+        keep = _decay(half_life, gap)
+        updated = np.where(np.isnan(old), delta, keep * old + (1.0 - keep) * delta)
+        getattr(state, name)[cols] = np.where(np.isnan(delta), old, updated)
+
+    state.window[cols, slot] = np.nan_to_num(gained)
+    state.delta[cols] = delta
+    state.accel[cols] = accel
+    state.diff_delta[cols] = diff_delta
+    state.views[cols] = views
+    state.diff[cols] = diff
+    state.seen_day[cols] = day
+    state.n_obs[cols] += 1
+    state.last_day = day
+    return True
+
+
+def update_from_store(state: VelocityState, store: SnapshotStore) -> int:
+    """Apply every day of the store after state.last_day. Returns the number of days applied."""
+    start = 0
+    if state.last_day != NO_DAY:
+        start = int(np.searchsorted(store.day_dates, np.datetime64(state.last_day, "D"), side="right"))
+    applied = 0
+    with span("velocity.update", archive=os.path.basename(store.source)) as sp:
+        for i in range(start, store.num_days):
+            if update_day(state, store.day(i)):
+                applied += 1
+        sp.count(days=applied, videos=state.num_videos)
+    return applied
+
+
+# ---------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------
+
+def rate_7d(state: VelocityState) -> np.ndarray:
+    """Views gained per day over the WINDOW_DAYS days up to state.last_day."""
+    live = state.slot_day > state.last_day - WINDOW_DAYS
+    return state.live("window")[:, live].sum(axis=1) / WINDOW_DAYS
+
+
+def metrics_frame(state: VelocityState) -> pd.DataFrame:
+    """Current metrics as a DataFrame indexed by video id."""
+    df = pd.DataFrame(
+        {
+            "last_seen": state.live("seen_day").astype("datetime64[D]"),
+            "n_obs": state.live("n_obs"),
+            "views": state.live("views"),
+            "delta": state.live("delta"),
+            "accel": state.live("accel"),
+            "ewma_fast": state.live("ewma_fast"),
+            "ewma_slow": state.live("ewma_slow"),
+            "rate_7d": rate_7d(state),
+            "diff": state.live("diff"),
+            "diff_delta": state.live("diff_delta"),
+        },
+        index=pd.Index(state.live("video_ids").astype(str), name="video_id"),
+    )
+    return df
+
+
+# ---------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------
+
+def save_state(state: VelocityState, path: str) -> None:
+    """Write the state to `path` (atomically, via a temporary file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            version=np.array(VELOCITY_VERSION),
+            source=np.array(os.path.basename(state.source)),
+            window_days=np.array(WINDOW_DAYS),
+            last_day=np.array(state.last_day),
+            slot_day=state.slot_day,
+            video_ids=state.live("video_ids").astype(str),
+            **{name: state.live(name) for name in _PER_VIDEO if name != "video_ids"},
+        )
+    os.replace(tmp_path, path)
+
+
+def load_state(path: str, source: str) -> VelocityState:
+    """Load a saved state, or an empty one if missing, outdated or from another archive."""
+    if not os.path.exists(path):
+        return empty_state(source)
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            if (
+                int(npz["version"]) != VELOCITY_VERSION
+                or int(npz["window_days"]) != WINDOW_DAYS
+                or str(npz["source"]) != os.path.basename(source)
+            ):
+                return empty_state(source)
+            arrays = {name: npz[name] for name in _PER_VIDEO}
+            arrays["video_ids"] = arrays["video_ids"].astype(object)
+            last_day, slot_day = int(npz["last_day"]), npz["slot_day"]
+    except (OSError, KeyError, ValueError):
+        return empty_state(source)
+    return VelocityState(source=source, last_day=last_day, slot_day=slot_day, **arrays)
+
+
+def velocity_for(zip_path: str, kind: str = "youtube") -> Tuple[VelocityState, int]:
+    """Load, update (from the session store) and save the state of an archive."""
+    path = velocity_path_for(zip_path)
+    state = load_state(path, zip_path)
+    applied = update_from_store(state, get_store(zip_path, kind))
+    if applied:
+        save_state(state, path)
+    return state, applied
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    ds = datasets.get(argv[0] if argv else "youtube_top100")
+    zip_path = ds.path
+    state, applied = velocity_for(zip_path, ds.kind)
+    print(f"{os.path.basename(zip_path)}: {applied} new days, state up to {state.last_date}, "
+          f"{state.num_videos} videos")
+    df = metrics_frame(state)
+    current = df[df["last_seen"] == state.last_date]
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(current.nlargest(10, "ewma_fast").to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+video_dataset.py – streaming dataset format for collected videos
+
+The a5 dataset used to be one indented JSON document, written at the
+end of a collection run and read back with json.load – both sides held
+every video in memory. This module stores it as newline-delimited JSON:
+
+    {"format": "youtube-videos-ndjson", "version": 1, "query": ..., ...}
+    {"id": "...", "title": "...", "viewCount": 123, ...}
+    {"id": "...", ...}
+
+The first line is a small header record with the collection settings;
+every further line is one video. Writers append videos as they arrive
+and readers iterate over them one line at a time, so memory use does not
+grow with the dataset. Files in the old single-document format are still
+readable through the same functions.
+"""
+
+import os
+import json
+from typing import Dict, Iterable, Iterator, Optional
+
+FORMAT = "youtube-videos-ndjson"
+FORMAT_VERSION = 1
+
+
+class DatasetWriter:
+    """
+    Append videos to an NDJSON dataset.
+
+    A new file starts with the header record. With `resume_offset` an
+    existing file is reopened, cut back to that byte offset (dropping
+    anything written after the last checkpoint) and appended to.
+    """
+
+    def __init__(self, path: str, header: Dict[str, object], resume_offset: Optional[int] = None):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume_offset is not None and os.path.exists(path):
+            self._file = open(path, "r+b")
+            self._file.truncate(resume_offset)
+            self._file.seek(resume_offset)
+        else:
+            self._file = open(path, "wb")
+            self._write_line({"format": FORMAT, "version": FORMAT_VERSION, **header})
+
+    def _write_line(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def write(self, video: dict) -> None:
+        self._write_line(video)
+
+    def write_many(self, videos: Iterable[dict]) -> None:
+        for video in videos:
+            self._write_line(video)
+
+    def sync(self) -> int:
+        """Flush to disk; returns the file size (a safe resume offset)."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _is_ndjson_header(line: str) -> Optional[dict]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(record, dict) and record.get("format") == FORMAT:
+        return record
+    return None
+
+
+def read_header(path: str) -> dict:
+    """
+    Header of a dataset. For the legacy JSON format this is the
+    top-level document without its 'items'.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = _is_ndjson_header(f.readline())
+    if header is not None:
+        return header
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {k: v for k, v in data.items() if k != "items"}
+
+
+def iter_videos(path: str) -> Iterator[dict]:
+    """
+    Yield the videos of a dataset one by one.
+
+    NDJSON files are streamed line by line. A torn last line (an
+    unterminated record left by an interrupted writer) is skipped; a line
+    that does not parse anywhere else raises ValueError with its line
+    number. Legacy JSON documents have to be loaded as a whole.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = _is_ndjson_header(f.readline())
+        if header is not None:
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported dataset version {header.get('version')} in {path}")
+            for lineno, line in enumerate(f, start=2):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    if not line.endswith("\n") and not f.readline():
+                        return  # torn last line
+                    raise ValueError(f"{path}:{lineno}: corrupt record") from None
+            return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data["items"]
+
+
+def write_dataset(path: str, header: Dict[str, object], videos: Iterable[dict]) -> int:
+    """Write a complete dataset (atomically). Returns the number of videos."""
+    tmp_path = path + ".tmp"
+    count = 0
+    with DatasetWriter(tmp_path, header) as writer:
+        for video in videos:
+            writer.write(video)
+            count += 1
+        writer.sync()
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,253 @@
+"""
+youtube_api.py – asyncio client for the YouTube Data API v3
+
+a5_collect.py used the blocking googleapiclient, one request at a time.
+This module provides what a concurrent collector needs:
+
+- HttpTransport: plain HTTPS GETs against the API (or any base URL, e.g.
+  a local fake server in tests). Anything with an async
+  `get(endpoint, params) -> dict` method can be used instead.
+- TokenBucket: rate limiter counted in API *quota units*, not requests
+  (search.list costs 100 units, videos.list 1 unit).
+- AsyncYouTubeClient: bounded concurrency, quota-aware scheduling and
+  retries with exponential backoff for transient errors.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional
+
+API_BASE = "https://www.googleapis.com/youtube/v3"
+
+# Quota cost per call, from the API documentation.
+QUOTA_COST = {
+    "search": 100,
+    "videos": 1,
+}
+
+# Default pacing: spread the project's daily quota (10,000 units for a
+# standard project; YOUTUBE_DAILY_QUOTA overrides it) evenly over the
+# day, after an initial burst of a tenth of it. A run that would spend
+# more than that is slowed down instead of running into QuotaExceeded.
+# The bucket starts full in every process, so it does not account for
+# units spent by earlier runs on the same day.
+SECONDS_PER_DAY = 86_400
+DAILY_QUOTA = int(os.environ.get("YOUTUBE_DAILY_QUOTA", "10000"))
+QUOTA_UNITS_PER_SECOND = DAILY_QUOTA / SECONDS_PER_DAY
+QUOTA_BURST = max(DAILY_QUOTA / 10, max(QUOTA_COST.values()))
+
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+
+
+class ApiError(Exception):
+    """HTTP error returned by the API."""
+
+    def __init__(self, status: int, reason: str = "", message: str = ""):
+        super().__init__(f"HTTP {status} {reason}: {message}".strip())
+        self.status = status
+        self.reason = reason
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRY_STATUS or self.reason in RETRY_REASONS
+
+
+class QuotaExceeded(ApiError):
+    """The daily quota is used up – retrying will not help until it resets."""
+
+
+# ---------------------------------------------------------------------
+# Transport
+# ---------------------------------------------------------------------
+
+class HttpTransport:
+    """
+    GET requests against the API via urllib, run in a worker thread so
+    they do not block the event loop.
+
+    `base_url` can point to a local fake server for offline testing.
+    """
+
+    def __init__(self, api_key: str, base_url: str = API_BASE, timeout: float = 30.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    async def get(self, endpoint: str, params: Dict[str, object]) -> dict:
+        return await asyncio.to_thread(self._get, endpoint, params)
+
+    def _get(self, endpoint: str, params: Dict[str, object]) -> dict:
+        query = {k: v for k, v in params.items() if v is not None}
+        query["key"] = self.api_key
+        url = f"{self.base_url}/{endpoint}?{urllib.parse.urlencode(query)}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            raise _api_error(e.code, e.read()) from None
+
+
+def _api_error(status: int, body: bytes) -> ApiError:
+    """Turn an API error response into ApiError / QuotaExceeded."""
+    reason, message = "", ""
+    try:
+        error = json.loads(body)["error"]
+        message = error.get("message", "")
+        reason = (error.get("errors") or [{}])[0].get("reason", "")
+    except (ValueError, KeyError, TypeError, IndexError):
+        pass
+    cls = QuotaExceeded if reason in ("quotaExceeded", "dailyLimitExceeded") else ApiError
+    return cls(status, reason, message)
+
+
+# ---------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Token bucket measured in quota units: refills at `rate` units per
+    second up to `capacity`; acquire(n) waits until n units are available.
+    """
+
+    @classmethod
+    def for_daily_quota(cls, units: float, burst: Optional[float] = None) -> "TokenBucket":
+        """Bucket that spends `units` per day, after an initial `burst` (default: a tenth)."""
+        if burst is None:
+            burst = max(units / 10, max(QUOTA_COST.values()))
+        return cls(rate=units / SECONDS_PER_DAY, capacity=burst)
+
+    def __init__(self, rate: float = QUOTA_UNITS_PER_SECOND, capacity: float = QUOTA_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, units: float) -> None:
+        if units > self.capacity:
+            raise ValueError(f"Request of {units} units exceeds bucket capacity {self.capacity}")
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return
+                await asyncio.sleep((units - self.tokens) / self.rate)
+
+
+# ---------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------
+
+class AsyncYouTubeClient:
+    """
+    Concurrent, quota-aware API client.
+
+    At most `concurrency` requests are in flight; every request first
+    takes its quota cost from `bucket`. Transient errors (HTTP 429/5xx,
+    rate-limit reasons) are retried up to `max_retries` times with
+    exponential backoff and jitter; QuotaExceeded is raised immediately.
+    After a QuotaExceeded, later calls fail the same way without sending
+    a request, so concurrent callers can let their in-flight requests
+    finish and keep those results.
+    """
+
+    def __init__(
+        self,
+        transport,
+        bucket: Optional[TokenBucket] = None,
+        concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_SECONDS,
+    ):
+        self.transport = transport
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.units_used = 0
+        self.quota_error: Optional[QuotaExceeded] = None
+        self._slots = asyncio.Semaphore(concurrency)
+
+    def _check_quota(self) -> None:
+        if self.quota_error is not None:
+            e = self.quota_error
+            raise QuotaExceeded(e.status, e.reason, "quota used up earlier in this run")
+
+    async def call(self, endpoint: str, params: Dict[str, object]) -> dict:
+        cost = QUOTA_COST.get(endpoint, 1)
+        for attempt in range(self.max_retries + 1):
+            self._check_quota()
+            await self.bucket.acquire(cost)
+            async with self._slots:
+                self._check_quota()
+                try:
+                    self.units_used += cost
+                    return await self.transport.get(endpoint, params)
+                except QuotaExceeded as e:
+                    self.quota_error = e
+                    raise
+                except ApiError as e:
+                    if not e.retryable or attempt == self.max_retries:
+                        raise
+                except (OSError, asyncio.TimeoutError):
+                    if attempt == self.max_retries:
+                        raise
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        raise AssertionError("unreachable")
+
+    async def search_page(self, page_token: Optional[str] = None, **params) -> dict:
+        """One page of search.list (100 quota units)."""
+        return await self.call(
+            "search", {"part": "id", "maxResults": 50, "pageToken": page_token, **params}
+        )
+
+    async def videos(self, video_ids: List[str], part: str = "snippet,statistics") -> List[dict]:
+        """videos.list for up to 50 ids (1 quota unit)."""
+        if len(video_ids) > 50:
+            raise ValueError("videos.list accepts at most 50 ids per call")
+        response = await self.call(
+            "videos", {"part": part, "id": ",".join(video_ids), "maxResults": 50}
+        )
+        return response.get("items", [])
+
+    async def videos_batched(self, video_ids: List[str], part: str = "snippet,statistics") -> List[dict]:
+        """
+        videos.list for any number of ids: 50-id batches run concurrently
+        (bounded by the client's concurrency). Items come back in batch order.
+        If a batch fails, the others still finish before the first error
+        is raised, so no request is left running in the background.
+        """
+        batches = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+        results = await asyncio.gather(*(self.videos(b, part) for b in batches), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [item for items in results for item in items]
+
+
+def api_key_from_env() -> str:
+    """Read YOUTUBE_API_KEY from the environment / .env file."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("YOUTUBE_API_KEY")
+    if not api_key:
+        raise RuntimeError("YOUTUBE_API_KEY not found in environment (.env file).")
+    return api_key